@@ -0,0 +1,74 @@
+"""
+Regression check of the microbenchmarks against the committed baseline.
+
+Runs the benchmarks and fails (exit status 1) when the mean of any of them
+regressed by more than the threshold compared with benchmarks/baseline.json::
+
+    python -m benchmarks.check
+    python -m benchmarks.check --threshold 10
+
+Timings depend on the machine: record the baseline again on the machine
+that runs the check (CI runner or your laptop) and commit it::
+
+    python -m benchmarks.check --save
+
+Extra arguments are passed to pytest, e.g. ``-k contacts``.
+"""
+import argparse
+import json
+import os
+import sys
+
+import pytest
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(BENCHMARKS, "baseline.json")
+
+
+def save_baseline(path: str, pytest_args: list) -> int:
+    """
+    The save_baseline function runs the benchmarks and stores their results
+    as the baseline, without the raw timings of every round.
+
+    :param path: Baseline file
+    :param pytest_args: Extra pytest arguments
+    :return: pytest exit status
+    """
+    status = pytest.main([BENCHMARKS, f"--benchmark-json={path}", *pytest_args])
+    if status == 0:
+        with open(path) as f:
+            baseline = json.load(f)
+        for benchmark in baseline["benchmarks"]:
+            benchmark["stats"].pop("data", None)
+        with open(path, "w") as f:
+            json.dump(baseline, f, indent=2)
+    return status
+
+
+def check(path: str, threshold: float, pytest_args: list) -> int:
+    """
+    The check function runs the benchmarks and compares them with the
+    baseline, failing on a mean regression above the threshold.
+
+    :param path: Baseline file
+    :param threshold: Allowed mean regression in percent
+    :param pytest_args: Extra pytest arguments
+    :return: pytest exit status
+    """
+    return pytest.main([BENCHMARKS, f"--benchmark-compare={path}",
+                        f"--benchmark-compare-fail=mean:{threshold:g}%", *pytest_args])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", action="store_true", help="Record a new baseline instead of checking")
+    parser.add_argument("--baseline", default=BASELINE, help="Baseline file (benchmarks/baseline.json)")
+    parser.add_argument("--threshold", type=float, default=15.0, help="Allowed mean regression in percent")
+    args, pytest_args = parser.parse_known_args(argv)
+    if args.save:
+        return save_baseline(args.baseline, pytest_args)
+    return check(args.baseline, args.threshold, pytest_args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Microbenchmarks for the repository functions and auth primitives.
+
+They are not part of the test suite (pytest only collects ``tests/`` by
+default) and are run explicitly with pytest-benchmark. The regression check
+compares them with the committed benchmarks/baseline.json and fails on a
+mean regression above 15%::
+
+    python -m benchmarks.check
+
+    # record the baseline again after an intended change or on a new machine
+    python -m benchmarks.check --save
+
+Repository benchmarks run on SQLite and, when BENCH_POSTGRES_URL is set, on
+Postgres too. BENCH_CONTACTS sets the number of contacts seeded for the
+benchmarked user.
+"""
+import asyncio
+import itertools
+import os
+from datetime import date, timedelta
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from src.database.models import Base, Contact, User
+
+BENCH_CONTACTS = int(os.environ.get("BENCH_CONTACTS", 2000))
+OTHER_USERS = 4
+
+
+def _database_url(name: str) -> str:
+    if name == "sqlite":
+        return "sqlite:///./bench.db"
+    url = os.environ.get("BENCH_POSTGRES_URL")
+    if not url:
+        pytest.skip("BENCH_POSTGRES_URL is not set")
+    return url
+
+
+@pytest.fixture(scope="module", params=["sqlite", "postgres"])
+def engine(request):
+    engine = create_engine(_database_url(request.param))
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": user_id, "username": f"bench{user_id}", "email": f"bench{user_id}@example.com",
+             "password": "hash", "confirmed": True}
+            for user_id in range(1, OTHER_USERS + 2)
+        ])
+        rows = [
+            {"first_name": f"First{index % 50}", "last_name": f"Last{index % 80}",
+             "email": f"contact{index}@example.com", "phone_number": f"+1{index:010d}",
+             "phone_e164": f"+1{index:010d}",
+             "birthday": date(1970, 1, 1) + timedelta(days=index % 10000),
+             "user_id": index % (OTHER_USERS + 1) + 1}
+            for index in range(BENCH_CONTACTS * (OTHER_USERS + 1))
+        ]
+        for start in range(0, len(rows), 10000):
+            conn.execute(insert(Contact), rows[start:start + 10000])
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user(db):
+    return db.get(User, 1)
+
+
+@pytest.fixture(scope="session")
+def run():
+    """Runs a coroutine to completion, the repository functions are async."""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def unique():
+    """Unique suffixes for emails and phone numbers of created contacts."""
+    counter = itertools.count()
+    return lambda: next(counter)
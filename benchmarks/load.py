@@ -0,0 +1,272 @@
+"""
+End-to-end load benchmark for the contacts API.
+
+Seeds a database with users and contacts, then runs a mixed workload against
+the app in-process (httpx ASGI transport). Stand-ins replace the external
+services: fakeredis for the user cache and an in-memory sink instead of
+SMTP. The report gives throughput and p50/p95/p99 latency per endpoint and
+can be saved as JSON and compared with an earlier run::
+
+    python -m benchmarks.load --users 100 --contacts 100000 --requests 5000 \\
+        --concurrency 32 --output run.json --compare baseline.json
+
+Use --database-url to run against Postgres instead of the default SQLite
+file. Use --reuse to skip seeding when the database is already seeded with
+the same sizes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+DEFAULT_MIX = "login=1,list=6,search=3,birthdays=2,create=1,update=1"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./bench.db")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--contacts", type=int, default=1000, help="Total contacts, spread over the users")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Endpoint weights, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reuse", action="store_true", help="Don't re-seed the database")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare with")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args) -> None:
+    """
+    Settings are read when src modules are imported, so the database URL and
+    a usable JWT configuration are put into the environment first.
+    """
+    os.environ["SQLALCHEMY_DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("ALGORITHM", "HS256")
+
+
+def user_email(index: int) -> str:
+    return f"bench-user-{index}@example.com"
+
+
+def seed(args, password: str) -> None:
+    from sqlalchemy import insert
+    from src.database.db import engine, SessionLocal
+    from src.database.models import Base, Contact, User
+    from src.services.auth import auth_service
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    hashed = auth_service.get_password_hash(password)
+    rnd = random.Random(args.seed)
+    with SessionLocal() as db:
+        db.execute(insert(User), [
+            {"id": index, "username": f"bench{index}", "email": user_email(index), "password": hashed,
+             "confirmed": True}
+            for index in range(1, args.users + 1)
+        ])
+        chunk = []
+        for index in range(args.contacts):
+            chunk.append({
+                "first_name": rnd.choice(FIRST_NAMES),
+                "last_name": rnd.choice(LAST_NAMES),
+                "email": f"contact-{index}@example.com",
+                "phone_number": f"+1{index:010d}",
+                "phone_e164": f"+1{index:010d}",
+                "birthday": date(1960, 1, 1) + timedelta(days=rnd.randrange(365 * 45)),
+                "user_id": index % args.users + 1,
+            })
+            if len(chunk) == 10000:
+                db.execute(insert(Contact), chunk)
+                chunk = []
+        if chunk:
+            db.execute(insert(Contact), chunk)
+        db.commit()
+
+
+FIRST_NAMES = ["Olena", "Taras", "Iryna", "Andrii", "Maria", "Bohdan", "Sofia", "Dmytro", "Anna", "Oleh"]
+LAST_NAMES = ["Shevchenko", "Kovalenko", "Bondarenko", "Tkachenko", "Kravchenko", "Melnyk", "Boyko", "Koval"]
+
+
+def build_app(mail_sink: list):
+    """
+    Builds the app with fakeredis and the mail sink in place of Redis and SMTP.
+    Rate limiting is switched off: it would throttle the benchmark itself.
+    """
+    import fakeredis
+    from fastapi_limiter.depends import RateLimiter
+
+    from main import app
+    from src.routes import auth as auth_routes
+    from src.services.auth import auth_service
+
+    auth_service.r = fakeredis.FakeRedis()
+
+    async def send_email(email, username, host):
+        mail_sink.append((email, username, str(host)))
+
+    auth_routes.send_email = send_email
+
+    async def no_rate_limit():
+        return None
+
+    for route in app.routes:
+        for dependency in getattr(route, "dependencies", []):
+            if isinstance(dependency.dependency, RateLimiter):
+                app.dependency_overrides[dependency.dependency] = no_rate_limit
+    return app
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+
+class Workload:
+    def __init__(self, args, client, password: str):
+        self.args = args
+        self.client = client
+        self.password = password
+        self.rnd = random.Random(args.seed)
+        self.tokens = {}
+        self.created = 0
+        self.mix = []
+        for item in args.mix.split(","):
+            name, weight = item.split("=")
+            self.mix.append((name.strip(), float(weight)))
+
+    async def login(self, user: int):
+        response = await self.client.post("/api/auth/login",
+                                          data={"username": user_email(user), "password": self.password})
+        if response.status_code == 200:
+            self.tokens[user] = response.json()["access_token"]
+        return response
+
+    def headers(self, user: int) -> dict:
+        return {"Authorization": f"Bearer {self.tokens[user]}"}
+
+    async def run_one(self, name: str, user: int):
+        if name == "login":
+            return await self.login(user)
+        if name == "list":
+            skip = self.rnd.randrange(max(1, self.args.contacts // self.args.users))
+            return await self.client.get("/api/contacts/", params={"skip": skip, "limit": self.args.page_size},
+                                         headers=self.headers(user))
+        if name == "search":
+            return await self.client.get("/api/contacts/search/",
+                                         params={"last_name": self.rnd.choice(LAST_NAMES)},
+                                         headers=self.headers(user))
+        if name == "birthdays":
+            return await self.client.get("/api/contacts/birthdays/", headers=self.headers(user))
+        if name == "create":
+            self.created += 1
+            number = f"{user:04d}{self.created:08d}"
+            return await self.client.post("/api/contacts/", json=self.contact_body(number), headers=self.headers(user))
+        if name == "update":
+            contact_id = self.rnd.randrange(user, self.args.contacts + 1, self.args.users) if self.args.contacts else 1
+            self.created += 1
+            body = {**self.contact_body(f"9{user:03d}{self.created:08d}"), "completed": True}
+            return await self.client.put(f"/api/contacts/{contact_id}", json=body, headers=self.headers(user))
+        raise ValueError(f"Unknown workload item: {name}")
+
+    def contact_body(self, number: str) -> dict:
+        return {"first_name": self.rnd.choice(FIRST_NAMES), "last_name": self.rnd.choice(LAST_NAMES),
+                "email": f"new-{number}@example.com", "phone_number": f"+{number}",
+                "birthday": "1990-05-17"}
+
+    async def run(self) -> dict:
+        for user in range(1, self.args.users + 1):
+            await self.login(user)
+        names = [name for name, _ in self.mix]
+        weights = [weight for _, weight in self.mix]
+        plan = self.rnd.choices(names, weights=weights, k=self.args.requests)
+        latencies = defaultdict(list)
+        statuses = defaultdict(lambda: defaultdict(int))
+        queue = iter(plan)
+
+        async def worker():
+            for name in queue:
+                user = self.rnd.randrange(1, self.args.users + 1)
+                start = time.perf_counter()
+                response = await self.run_one(name, user)
+                latencies[name].append(time.perf_counter() - start)
+                statuses[name][response.status_code] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+        elapsed = time.perf_counter() - started
+        return report(latencies, statuses, elapsed)
+
+
+def report(latencies: dict, statuses: dict, elapsed: float) -> dict:
+    endpoints = {}
+    for name, values in latencies.items():
+        values.sort()
+        endpoints[name] = {
+            "requests": len(values),
+            "errors": sum(count for code, count in statuses[name].items() if code >= 400),
+            "statuses": {str(code): count for code, count in statuses[name].items()},
+            "throughput": len(values) / elapsed,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+        }
+    total = sum(len(values) for values in latencies.values())
+    return {"elapsed_s": elapsed, "requests": total, "throughput": total / elapsed if elapsed else 0.0,
+            "endpoints": endpoints}
+
+
+def print_report(result: dict, baseline: dict = None) -> None:
+    print(f"{result['requests']} requests in {result['elapsed_s']:.2f}s, {result['throughput']:.1f} req/s")
+    print(f"{'endpoint':<10} {'req':>6} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, stats in sorted(result["endpoints"].items()):
+        line = (f"{name:<10} {stats['requests']:>6} {stats['errors']:>5} {stats['throughput']:>8.1f} "
+                f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+        old = (baseline or {}).get("endpoints", {}).get(name)
+        if old and old["p95_ms"]:
+            line += f"   p95 {100 * (stats['p95_ms'] / old['p95_ms'] - 1):+.1f}% vs baseline"
+        print(line)
+
+
+async def main(argv=None) -> dict:
+    args = parse_args(argv)
+    configure_environment(args)
+    password = "bench-pass"
+    if not args.reuse:
+        seed(args, password)
+        # the seed inserts contacts directly, the counters are filled in
+        # afterwards; they are all missing, that is not drift
+        from src.services.counters import reconcile_all
+        await reconcile_all(report_drift=False)
+    import httpx
+
+    mail_sink = []
+    app = build_app(mail_sink)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        result = await Workload(args, client, password).run()
+    result["config"] = {"database_url": args.database_url.split("@")[-1], "users": args.users,
+                        "contacts": args.contacts, "concurrency": args.concurrency, "mix": args.mix}
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return result
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    asyncio.run(main())
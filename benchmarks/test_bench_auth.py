@@ -0,0 +1,46 @@
+import fakeredis
+import pytest
+from jose import jwt
+
+from src.services.auth import auth_service
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    redis = fakeredis.FakeRedis()
+    monkeypatch.setattr(auth_service, "r", redis)
+    return redis
+
+
+@pytest.fixture
+def access_token(run):
+    return run(auth_service.create_access_token(data={"sub": "bench1@example.com"}))
+
+
+def test_create_access_token(benchmark, run):
+    benchmark(lambda: run(auth_service.create_access_token(data={"sub": "bench1@example.com"})))
+
+
+def test_decode_access_token(benchmark, access_token):
+    benchmark(lambda: jwt.decode(access_token, auth_service.SECRET_KEY, algorithms=[auth_service.ALGORITHM]))
+
+
+def test_get_current_user_cache_hit(benchmark, run, db, cache, access_token):
+    run(auth_service.get_current_user(access_token, db))
+    benchmark(lambda: run(auth_service.get_current_user(access_token, db)))
+
+
+def test_get_current_user_cache_miss(benchmark, run, db, cache, access_token):
+    def setup():
+        cache.flushall()
+
+    benchmark.pedantic(lambda: run(auth_service.get_current_user(access_token, db)), setup=setup, rounds=200)
+
+
+def test_get_password_hash(benchmark):
+    benchmark.pedantic(auth_service.get_password_hash, args=("password",), rounds=5)
+
+
+def test_verify_password(benchmark):
+    hashed = auth_service.get_password_hash("password")
+    benchmark.pedantic(auth_service.verify_password, args=("password", hashed), rounds=5)
@@ -0,0 +1,32 @@
+import random
+from collections import namedtuple
+from datetime import date, timedelta
+
+import pytest
+
+from src.services.dedup import find_duplicates
+
+Row = namedtuple("Row", "id first_name last_name email phone_e164 birthday")
+
+ACCOUNT_SIZE = 100000
+FIRST_NAMES = ["Olena", "Taras", "Iryna", "Andrii", "Maria", "Bohdan", "Sofia", "Dmytro", "Anna", "Oleh"]
+LAST_NAMES = ["Shevchenko", "Kovalenko", "Bondarenko", "Tkachenko", "Kravchenko", "Melnyk", "Boyko", "Koval"]
+
+
+@pytest.fixture(scope="module")
+def account():
+    """A 100k-contact account with 1% near-duplicates."""
+    rnd = random.Random(42)
+    rows = [
+        Row(index, f"{rnd.choice(FIRST_NAMES)}{rnd.randrange(300)}", f"{rnd.choice(LAST_NAMES)}{rnd.randrange(26)}",
+            f"contact{index}@example.com", f"+1{index:010d}", date(1960, 1, 1) + timedelta(days=rnd.randrange(20000)))
+        for index in range(ACCOUNT_SIZE)
+    ]
+    rows += [Row(ACCOUNT_SIZE + index, row.first_name, row.last_name, row.email.upper(), None, row.birthday)
+             for index, row in enumerate(rows[:ACCOUNT_SIZE // 100])]
+    return rows
+
+
+def test_find_duplicates_100k(benchmark, account):
+    candidates = benchmark.pedantic(find_duplicates, args=(account,), rounds=3)
+    assert len(candidates) >= ACCOUNT_SIZE // 100
@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+
+from src.repository import contacts
+from src.schemas import ContactBase, ContactUpdate
+
+
+def contact_body(number: int) -> dict:
+    return dict(first_name="Bench", last_name="Mark", email=f"bench-new-{number}@example.com",
+                phone_number=f"+9{number:010d}", birthday=date(1990, 5, 17))
+
+
+def test_get_contact(benchmark, run, db, user):
+    contact_id = run(contacts.get_contacts_rows(db, user, limit=1))[0]["id"]
+    benchmark(lambda: run(contacts.get_contact(db, user, contact_id)))
+
+
+def test_get_contact_by_email(benchmark, run, db, user):
+    benchmark(lambda: run(contacts.get_contact_by_email(db, user, "contact5@example.com")))
+
+
+def test_get_contact_by_phone(benchmark, run, db, user):
+    benchmark(lambda: run(contacts.get_contact_by_phone(db, user, "+10000000005")))
+
+
+def test_get_contact_by_caller(benchmark, run, db, user):
+    benchmark(lambda: run(contacts.get_contact_by_caller(db, user, "+10000000005")))
+
+
+def test_get_contacts(benchmark, run, db, user):
+    benchmark(lambda: run(contacts.get_contacts(db, user, skip=0, limit=100)))
+
+
+def test_get_contacts_rows(benchmark, run, db, user):
+    benchmark(lambda: run(contacts.get_contacts_rows(db, user, skip=0, limit=100)))
+
+
+def test_get_contacts_by_ids(benchmark, run, db, user):
+    ids = [row["id"] for row in run(contacts.get_contacts_rows(db, user, limit=100))]
+    benchmark(lambda: run(contacts.get_contacts_by_ids(db, user, ids)))
+
+
+def test_search_contacts(benchmark, run, db, user):
+    benchmark(lambda: run(contacts.search_contacts(db, user, last_name="Last5")))
+
+
+def test_get_upcoming_birthdays(benchmark, run, db, user):
+    today = date.today()
+    benchmark(lambda: run(contacts.get_upcoming_birthdays(db, user, today, today + timedelta(days=7))))
+
+
+def test_create_contact(benchmark, run, db, user, unique):
+    benchmark(lambda: run(contacts.create_contact(db, user, ContactBase(**contact_body(unique())))))
+
+
+def test_update_contact(benchmark, run, db, user, unique):
+    db_contact = run(contacts.create_contact(db, user, ContactBase(**contact_body(unique()))))
+    benchmark(lambda: run(contacts.update_contact(
+        db, user, db_contact, ContactUpdate(completed=True, **contact_body(unique())))))
+
+
+def test_delete_contact(benchmark, run, db, user, unique):
+    def setup():
+        contact = run(contacts.create_contact(db, user, ContactBase(**contact_body(unique()))))
+        return (contact.id,), {}
+
+    benchmark.pedantic(lambda contact_id: run(contacts.delete_contact(db, user, contact_id)),
+                       setup=setup, rounds=50)
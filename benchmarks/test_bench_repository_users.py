@@ -0,0 +1,25 @@
+from src.repository import users
+from src.schemas import UserModel
+
+
+def test_get_user_by_email(benchmark, run, db):
+    benchmark(lambda: run(users.get_user_by_email("bench1@example.com", db)))
+
+
+def test_create_user(benchmark, run, db, unique, monkeypatch):
+    # Gravatar only builds a URL, but keep the benchmark about the database
+    monkeypatch.setattr(users, "Gravatar", lambda email: None)
+    benchmark(lambda: run(users.create_user(
+        UserModel(username=f"bench{unique():06d}", email=f"bench-new-{unique()}@example.com", password="secret"), db)))
+
+
+def test_update_token(benchmark, run, db, user):
+    benchmark(lambda: run(users.update_token(user, "token", db)))
+
+
+def test_confirmed_email(benchmark, run, db):
+    benchmark(lambda: run(users.confirmed_email("bench1@example.com", db)))
+
+
+def test_update_avatar(benchmark, run, db):
+    benchmark(lambda: run(users.update_avatar("bench1@example.com", "https://example.com/avatar.png", db)))
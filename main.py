@@ -1,34 +1,75 @@
+import time
+
+STARTED = time.perf_counter()
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
 
 import redis.asyncio as redis
-from fastapi import FastAPI, HTTPException
-from fastapi_limiter import FastAPILimiter
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from src.routes import contacts, auth, users
+from src.routes import contacts, auth, users, tags, events
 from src.conf.config import settings
+from src.database.db import engine
+from src.services.auth import auth_service
+from src.services.metrics import MetricsMiddleware, STARTUP_SECONDS, instrument_engine, metrics_response
+from src.services.tracing import TracingMiddleware, setup_tracing, trace_engine
+from src.services.profiling import ProfilingMiddleware
+from src.services.shedding import LoadSheddingMiddleware
+from src.services.limiter import init_limiter
+from src.services.events import event_broker
+from src.services.purge import purge_pending
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
 
 origins = ["*"]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.include_router(contacts.router, prefix='/api')
-app.include_router(auth.router, prefix='/api')
-app.include_router(users.router, prefix='/api')
-
-@app.on_event("startup")
-async def startup():
-    r = await redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0, encoding="utf-8",
-                          decode_responses=True)
-    await FastAPILimiter.init(r)
-
-@app.get("/")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    The lifespan function creates the resources shared by all requests of a
+    worker once at startup and releases them at shutdown: the async Redis
+    pool of the rate limiter and the contact events broker, the sync Redis
+    pool of the user cache and the database engine. It records how long the
+    worker took to become ready and resumes interrupted account purges in
+    the background.
+
+    :param app: The application
+    :return: None
+    """
+    r = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0, encoding="utf-8",
+                    decode_responses=True, socket_timeout=settings.redis_socket_timeout,
+                    socket_connect_timeout=settings.redis_connect_timeout)
+    await init_limiter(r)
+    app.state.redis = r
+    await event_broker.start(r)
+    startup = time.perf_counter() - STARTED
+    STARTUP_SECONDS.set(startup)
+    logger.info("application ready in %.3fs", startup)
+    purges = asyncio.create_task(purge_pending()) if settings.purge_on_startup else None
+    yield
+    if purges is not None:
+        purges.cancel()
+        with suppress(asyncio.CancelledError):
+            await purges
+    await event_broker.stop()
+    await r.aclose()
+    auth_service.close()
+    engine.dispose()
+
+
+def metrics():
+    """
+    The metrics function exposes request and SQL metrics in the Prometheus
+    text format.
+
+    :return: A plain text response
+    """
+    return metrics_response()
+
+
 def read_root():
     """
     The read_root function returns a dictionary with the key 'message' and
@@ -37,3 +78,42 @@ def read_root():
     :return: A dictionary
     """
     return {"message": "Hello World"}
+
+
+def create_app() -> FastAPI:
+    """
+    The create_app function builds the application: middleware, routers and
+    instrumentation. Resources that need a running event loop are created in
+    lifespan.
+
+    :return: The application
+    """
+    app = FastAPI(lifespan=lifespan)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Total-Count"],
+    )
+    app.add_middleware(LoadSheddingMiddleware)
+    app.add_middleware(ProfilingMiddleware)
+    app.add_middleware(TracingMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(engine)
+    setup_tracing()
+    if settings.tracing_enabled:
+        trace_engine(engine)
+
+    app.include_router(contacts.router, prefix='/api')
+    app.include_router(auth.router, prefix='/api')
+    app.include_router(users.router, prefix='/api')
+    app.include_router(tags.router, prefix='/api')
+    app.include_router(events.router, prefix='/api')
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/", read_root, methods=["GET"])
+    return app
+
+
+app = create_app()
@@ -0,0 +1,83 @@
+"""Fill upcoming birthdays
+
+Revision ID: 2ae10c156d23
+Revises: 6bf35234a199
+Create Date: 2026-10-20 09:14:27.530118
+
+"""
+from datetime import date, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.database import backfill
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2ae10c156d23'
+down_revision: Union[str, None] = '6bf35234a199'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Frozen copy of the window and of next_birthday at the time of this
+# revision, so later changes to the application don't change what it does.
+WINDOW_DAYS = 7
+
+contacts = sa.table('contacts', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                    sa.column('birthday', sa.Date))
+users = sa.table('users', sa.column('id', sa.Integer), sa.column('disabled', sa.Boolean))
+upcoming_birthdays = sa.table('upcoming_birthdays', sa.column('contact_id', sa.Integer),
+                              sa.column('user_id', sa.Integer), sa.column('next_birthday', sa.Date))
+
+
+def _next_birthday(birthday: date, today: date) -> date:
+    for year in (today.year, today.year + 1):
+        try:
+            upcoming = birthday.replace(year=year)
+        except ValueError:
+            upcoming = date(year, 3, 1)
+        if upcoming >= today:
+            return upcoming
+
+
+class UpcomingBirthdaysBackfill(backfill.Backfill):
+    """
+    The birthdays in the window of a range of contact ids, for users that
+    are not disabled.
+    """
+
+    def apply(self, conn, after, upto):
+        today = date.today()
+        end = today + timedelta(days=WINDOW_DAYS)
+        rows = conn.execute(
+            sa.select(contacts.c.id, contacts.c.user_id, contacts.c.birthday)
+            .join(users, users.c.id == contacts.c.user_id)
+            .where(*self._range(after, upto), sa.or_(users.c.disabled.is_(None), users.c.disabled.is_(False)))
+        ).all()
+        values = []
+        for row in rows:
+            upcoming = _next_birthday(row.birthday, today)
+            if upcoming <= end:
+                values.append({'contact_id': row.id, 'user_id': row.user_id, 'next_birthday': upcoming})
+        conn.execute(upcoming_birthdays.delete().where(upcoming_birthdays.c.contact_id > after,
+                                                       upcoming_birthdays.c.contact_id <= upto))
+        if values:
+            conn.execute(upcoming_birthdays.insert(), values)
+        return len(values)
+
+
+UPCOMING_BIRTHDAYS = UpcomingBirthdaysBackfill('2ae10c156d23_upcoming_birthdays', contacts,
+                                               where=contacts.c.birthday.is_not(None))
+
+
+def upgrade() -> None:
+    # d41b7e9a0c58 created the table empty; without this the birthdays
+    # endpoint returns nothing until the daily refresh first runs.
+    backfill.run_in_migration(UPCOMING_BIRTHDAYS)
+
+
+def downgrade() -> None:
+    op.execute(upcoming_birthdays.delete())
+    backfill.forget_in_migration(UPCOMING_BIRTHDAYS.name)
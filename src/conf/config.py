@@ -16,9 +16,67 @@ class Settings(BaseSettings):
     mail_server: str = 'mail.server.com'
     redis_host: str = 'localhost'
     redis_port: int = 6379
+    redis_socket_timeout: float = 0.1
+    redis_connect_timeout: float = 0.1
+    redis_breaker_failures: int = 3
+    redis_breaker_reset_timeout: float = 10.0
+    singleflight_redis_lock: bool = False
+    singleflight_lock_ttl: int = 2000
+    singleflight_wait: float = 0.5
+    singleflight_poll_interval: float = 0.02
     cloudinary_name: str = 'name'
     cloudinary_api_key: str = 'api'
     cloudinary_api_secret: str = 'api_secret'
+    contacts_batch_limit: int = 500
+    purge_batch_size: int = 1000
+    purge_batch_pause: float = 0.05
+    purge_status_ttl: int = 86400
+    purge_lock_ttl: int = 600000
+    purge_on_startup: bool = True
+    backfill_batch_size: int = 1000
+    backfill_batch_pause: float = 0.1
+    backfill_batch_seconds: float = 1.0
+    phone_country_code: str = '380'
+    callerid_cache_ttl: int = 300
+    dedup_min_score: float = 0.6
+    dedup_max_block: int = 100
+    dedup_max_candidates: int = 1000
+    dedup_ttl: int = 3600
+    birthdays_window_days: int = 7
+    birthdays_chunk_size: int = 500
+    birthdays_digest_enabled: bool = False
+    birthdays_digest_concurrency: int = 10
+    counters_chunk_size: int = 500
+    autocomplete_max_users: int = 1000
+    autocomplete_limit: int = 10
+    idempotency_ttl: int = 86400
+    idempotency_lock_ttl: int = 30000
+    events_queue_size: int = 100
+    events_heartbeat: float = 15.0
+    events_max_connections: int = 20000
+    # statements per request sharing a shape counted as repeated (N+1 suspects)
+    metrics_repeated_query_threshold: int = 2
+    # each route and shape is logged at most once per interval, the counter sees all
+    metrics_repeated_query_log_interval: float = 300.0
+    tracing_enabled: bool = False
+    tracing_service_name: str = 'contacts-api'
+    tracing_sample_ratio: float = 1.0
+    tracing_exporter: str = 'file'
+    tracing_file: str = 'traces.jsonl'
+    tracing_otlp_endpoint: str = 'http://localhost:4318/v1/traces'
+    profiling_enabled: bool = False
+    profiling_token: str = ''
+    profiling_dir: str = 'profiles'
+    profiling_text_lines: int = 50
+    shedding_enabled: bool = True
+    # together no more than the database pool (5 connections + 10 overflow)
+    shedding_limits: dict = {"auth": 3, "writes": 4, "reads": 8}
+    shedding_min_limit: int = 1
+    shedding_queue_size: int = 100
+    shedding_queue_timeout: float = 2.0
+    shedding_target_latency: float = 0.5
+    shedding_backoff: float = 0.1
+    shedding_retry_after: int = 1
 
     class Config:
         env_file = ".env"
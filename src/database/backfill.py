@@ -0,0 +1,361 @@
+"""
+Online data backfills: bounded batches in primary key order, each batch in
+its own short transaction, with a pause between batches and the position
+stored in the backfill_progress table so an interrupted run resumes where
+it stopped. Backfills must be idempotent, a batch may run twice.
+
+An Alembic revision defines its backfill inline, next to its schema change,
+and only imports the runner: Backfill, SQLBackfill, PythonBackfill,
+run_in_migration, forget_in_migration and the index helpers are a stable
+API. What the revision does then never changes with the application code.
+The registered BACKFILLS below are for the command line only, revisions
+must not use them (revisions released before this module keep their own
+loops). For example::
+
+    from src.database import backfill
+
+    contacts = sa.table('contacts', sa.column('id', sa.Integer), sa.column('first_name', sa.String),
+                        sa.column('nickname', sa.String))
+    NICKNAME = backfill.SQLBackfill('c0ffee123456_contacts_nickname', contacts,
+                                    {'nickname': contacts.c.first_name}, where=contacts.c.nickname.is_(None))
+
+    def upgrade():
+        op.add_column('contacts', sa.Column('nickname', sa.String(50)))
+        backfill.run_in_migration(NICKNAME)
+        backfill.create_index_concurrently('ix_contacts_user_id_nickname', 'contacts', ['user_id', 'nickname'])
+
+    def downgrade():
+        backfill.drop_index_concurrently('ix_contacts_user_id_nickname', 'contacts')
+        op.drop_column('contacts', 'nickname')
+        backfill.forget_in_migration(NICKNAME.name)
+
+Or online, while the application keeps serving::
+
+    python -m src.database.backfill list
+    python -m src.database.backfill run contacts_phone_e164 --batch-size 5000 --pause 0.5
+"""
+import abc
+import argparse
+import logging
+import time
+from typing import Callable, Dict, Optional, Sequence
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection, Engine
+
+from src.conf.config import settings
+from src.database.models import BackfillProgress
+from src.services.phones import normalize_phone
+
+logger = logging.getLogger(__name__)
+
+progress_table = BackfillProgress.__table__
+
+
+class Backfill(abc.ABC):
+    """
+    The Backfill class describes a backfill of one table. Subclasses update
+    the rows whose key is in (after, upto] and return how many they changed.
+    """
+
+    def __init__(self, name: str, table: sa.TableClause, key: str = "id", where=None):
+        self.name = name
+        self.table = table
+        self.key = table.c[key]
+        self.where = where
+
+    def _range(self, after: int, upto: int) -> list:
+        conditions = [self.key > after, self.key <= upto]
+        if self.where is not None:
+            conditions.append(self.where)
+        return conditions
+
+    @abc.abstractmethod
+    def apply(self, conn: Connection, after: int, upto: int) -> int:
+        """
+        The apply function backfills one batch in the caller's transaction.
+
+        :param conn: Database connection
+        :param after: Keys greater than this
+        :param upto: Keys up to and including this
+        :return: Number of changed rows
+        """
+
+
+class SQLBackfill(Backfill):
+    """
+    The SQLBackfill class sets columns to SQL expressions with one UPDATE
+    per batch.
+    """
+
+    def __init__(self, name: str, table: sa.TableClause, values: dict, key: str = "id", where=None):
+        super().__init__(name, table, key=key, where=where)
+        self.values = values
+
+    def apply(self, conn: Connection, after: int, upto: int) -> int:
+        return conn.execute(self.table.update().where(*self._range(after, upto)).values(self.values)).rowcount
+
+
+class PythonBackfill(Backfill):
+    """
+    The PythonBackfill class computes the new values in Python: it reads the
+    columns of a batch and writes back what compute returns for each row.
+    """
+
+    def __init__(self, name: str, table: sa.TableClause, columns: Sequence[str], compute: Callable[[sa.Row], dict],
+                 key: str = "id", where=None):
+        super().__init__(name, table, key=key, where=where)
+        self.columns = [table.c[column] for column in columns]
+        self.compute = compute
+
+    def apply(self, conn: Connection, after: int, upto: int) -> int:
+        rows = conn.execute(sa.select(self.key, *self.columns).where(*self._range(after, upto))).all()
+        if not rows:
+            return 0
+        values = [{"_key": row[0], **self.compute(row)} for row in rows]
+        conn.execute(self.table.update().where(self.key == sa.bindparam("_key")), values)
+        return len(values)
+
+
+BACKFILLS: Dict[str, Backfill] = {}
+
+
+def register(backfill: Backfill) -> Backfill:
+    """
+    The register function makes a backfill available by name to Alembic
+    revisions and the command line.
+
+    :param backfill: The backfill
+    :return: The same backfill
+    """
+    BACKFILLS[backfill.name] = backfill
+    return backfill
+
+
+_contacts = sa.table("contacts", sa.column("id", sa.Integer), sa.column("phone_number", sa.String),
+                     sa.column("phone_e164", sa.String), sa.column("created_at", sa.DateTime))
+
+register(PythonBackfill("contacts_phone_e164", _contacts, ["phone_number"],
+                        lambda row: {"phone_e164": normalize_phone(row.phone_number)},
+                        where=_contacts.c.phone_e164.is_(None)))
+# the creation time of existing contacts is unknown, they get the time of the backfill
+register(SQLBackfill("contacts_created_at", _contacts, {"created_at": sa.func.now()},
+                     where=_contacts.c.created_at.is_(None)))
+
+
+def get_progress(conn: Connection, name: str) -> Optional[sa.Row]:
+    """
+    The get_progress function reads the stored position of a backfill.
+
+    :param conn: Database connection
+    :param name: Name of the backfill
+    :return: The progress row or None if the backfill never ran
+    """
+    return conn.execute(sa.select(progress_table).where(progress_table.c.name == name)).first()
+
+
+def save_progress(conn: Connection, name: str, last_key: int, rows: int, done: bool = False) -> None:
+    """
+    The save_progress function stores the position of a backfill in the
+    transaction of the batch it follows.
+
+    :param conn: Database connection
+    :param name: Name of the backfill
+    :param last_key: Highest key processed
+    :param rows: Rows changed so far
+    :param done: The backfill reached the end of the table
+    :return: None
+    """
+    values = {"last_key": last_key, "rows": rows, "done": done, "updated_at": sa.func.now()}
+    if not conn.execute(progress_table.update().where(progress_table.c.name == name).values(values)).rowcount:
+        conn.execute(progress_table.insert().values(name=name, **values))
+
+
+def reset_progress(engine: Engine, name: str) -> None:
+    """
+    The reset_progress function forgets the position of a backfill, so the
+    next run starts from the beginning of the table.
+
+    :param engine: Database engine
+    :param name: Name of the backfill
+    :return: None
+    """
+    with engine.begin() as conn:
+        conn.execute(progress_table.delete().where(progress_table.c.name == name))
+
+
+def _next_upto(conn: Connection, backfill: Backfill, after: int, batch_size: int) -> Optional[int]:
+    """
+    The _next_upto function finds the last key of the next batch with an
+    index seek, without counting the rows before it.
+    """
+    upto = conn.scalar(sa.select(backfill.key).where(backfill.key > after).order_by(backfill.key)
+                       .offset(batch_size - 1).limit(1))
+    if upto is None:
+        upto = conn.scalar(sa.select(sa.func.max(backfill.key)).where(backfill.key > after))
+    return upto
+
+
+def run_backfill(engine: Engine, backfill: Backfill, batch_size: int = None, pause: float = None,
+                 track_progress: bool = True, max_batches: int = None) -> int:
+    """
+    The run_backfill function runs a backfill to the end of the table, or for
+    max_batches batches. Each batch and its progress are one transaction.
+    A batch that takes longer than backfill_batch_seconds halves the batch
+    size, so lock times stay short when the database is busy; quick batches
+    grow it back to batch_size.
+
+    :param engine: Database engine; every batch takes a connection of its own
+    :param backfill: The backfill to run
+    :param batch_size: Largest number of keys per batch
+    :param pause: Seconds to sleep between batches
+    :param track_progress: Resume from and record to backfill_progress; off in
+        revisions older than the progress table
+    :param max_batches: Stop after this many batches
+    :return: Number of rows changed by this run
+    """
+    batch_size = batch_size or settings.backfill_batch_size
+    pause = settings.backfill_batch_pause if pause is None else pause
+    last_key, total = 0, 0
+    if track_progress:
+        with engine.connect() as conn:
+            progress = get_progress(conn, backfill.name)
+        if progress is not None:
+            if progress.done:
+                logger.info("backfill %s is done", backfill.name)
+                return 0
+            last_key, total = progress.last_key, progress.rows
+    size, changed, batches = batch_size, 0, 0
+    while max_batches is None or batches < max_batches:
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            upto = _next_upto(conn, backfill, last_key, size)
+            if upto is None:
+                if track_progress:
+                    save_progress(conn, backfill.name, last_key, total, done=True)
+                break
+            count = backfill.apply(conn, last_key, upto)
+            changed, total, last_key = changed + count, total + count, upto
+            if track_progress:
+                save_progress(conn, backfill.name, last_key, total)
+        batches += 1
+        elapsed = time.perf_counter() - started
+        logger.info("backfill %s: up to key %s, %s rows, batch of %s took %.3fs",
+                    backfill.name, last_key, total, size, elapsed)
+        if elapsed > settings.backfill_batch_seconds:
+            size = max(1, size // 2)
+        elif elapsed < settings.backfill_batch_seconds / 2:
+            size = min(batch_size, size * 2)
+        if pause:
+            time.sleep(pause)
+    return changed
+
+
+def run_in_migration(backfill: Backfill, **kwargs) -> int:
+    """
+    The run_in_migration function runs a backfill from an Alembic revision.
+    The revision's transaction is committed first, so the schema change
+    before it is not held open while the batches run.
+
+    :param backfill: The backfill to run
+    :param kwargs: Passed to run_backfill
+    :return: Number of rows changed
+    """
+    from alembic import op
+
+    with op.get_context().autocommit_block():
+        return run_backfill(op.get_bind().engine, backfill, **kwargs)
+
+
+def forget_in_migration(name: str) -> None:
+    """
+    The forget_in_migration function removes the progress of a backfill from
+    an Alembic downgrade, so upgrading again runs it from the beginning.
+
+    :param name: Name of the backfill
+    :return: None
+    """
+    from alembic import op
+
+    op.execute(progress_table.delete().where(progress_table.c.name == name))
+
+
+def create_index_concurrently(name: str, table: str, columns: Sequence[str], **kwargs) -> None:
+    """
+    The create_index_concurrently function creates an index from an Alembic
+    revision without blocking writes on Postgres (CREATE INDEX CONCURRENTLY,
+    outside the revision's transaction). An invalid index left by an earlier
+    failed attempt is dropped first. Other databases get a plain CREATE INDEX.
+
+    :param name: Index name
+    :param table: Table name
+    :param columns: Indexed columns
+    :param kwargs: Passed to op.create_index, e.g. unique
+    :return: None
+    """
+    from alembic import op
+
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        op.create_index(name, table, columns, **kwargs)
+        return
+    with op.get_context().autocommit_block():
+        invalid = bind.scalar(sa.text("SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                                      "WHERE c.relname = :name"), {"name": name})
+        if invalid:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **kwargs)
+
+
+def drop_index_concurrently(name: str, table: str) -> None:
+    """
+    The drop_index_concurrently function drops an index from an Alembic
+    revision without blocking writes on Postgres.
+
+    :param name: Index name
+    :param table: Table name
+    :return: None
+    """
+    from alembic import op
+
+    if op.get_bind().dialect.name != "postgresql":
+        op.drop_index(name, table_name=table)
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Show the backfills and their progress")
+    run = commands.add_parser("run", help="Run a backfill, resuming where it stopped")
+    run.add_argument("name", choices=sorted(BACKFILLS))
+    run.add_argument("--batch-size", type=int, help="Keys per batch (backfill_batch_size by default)")
+    run.add_argument("--pause", type=float, help="Seconds between batches (backfill_batch_pause by default)")
+    run.add_argument("--max-batches", type=int, help="Stop after this many batches")
+    run.add_argument("--restart", action="store_true", help="Forget the progress and start from the beginning")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    from src.database.db import engine
+
+    if args.command == "list":
+        with engine.connect() as conn:
+            for name in sorted(BACKFILLS):
+                progress = get_progress(conn, name)
+                if progress is None:
+                    print(f"{name}: not started")
+                else:
+                    state = "done" if progress.done else f"at key {progress.last_key}"
+                    print(f"{name}: {state}, {progress.rows} rows, updated {progress.updated_at}")
+        return
+    if args.restart:
+        reset_progress(engine, args.name)
+    changed = run_backfill(engine, BACKFILLS[args.name], batch_size=args.batch_size, pause=args.pause,
+                           max_batches=args.max_batches)
+    print(f"{args.name}: {changed} rows changed")
+
+
+if __name__ == "__main__":
+    main()
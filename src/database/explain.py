@@ -0,0 +1,133 @@
+import json
+import re
+from contextlib import contextmanager
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+@contextmanager
+def capture_statements(engine: Engine):
+    """
+    The capture_statements function is a context manager that collects every
+    statement (with its parameters) the engine executes inside the block.
+
+    :param engine: Engine to listen on
+    :return: A list that is filled with (statement, parameters) tuples
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def explain(conn: Connection, statement: str, parameters) -> list:
+    """
+    The explain function returns the query plan of a statement: the rows of
+    ``EXPLAIN QUERY PLAN`` on SQLite, the plan tree of
+    ``EXPLAIN (FORMAT JSON)`` on Postgres.
+
+    :param conn: Connection to run EXPLAIN on
+    :param statement: SQL statement as sent to the driver
+    :param parameters: Parameters of the statement
+    :return: The plan
+    """
+    cursor = conn.connection.cursor()
+    try:
+        if conn.dialect.name == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = cursor.fetchone()[0]
+        return json.loads(plan) if isinstance(plan, str) else plan
+    finally:
+        cursor.close()
+
+
+def _postgres_nodes(node: dict) -> Iterable[dict]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from _postgres_nodes(child)
+
+
+def full_scans(dialect: str, plan: list, tables: Iterable[str]) -> List[str]:
+    """
+    The full_scans function returns the watched tables the plan reads with a
+    full table scan instead of an index.
+
+    :param dialect: sqlite or postgresql
+    :param plan: Plan returned by explain
+    :param tables: Names of the tables that must not be scanned
+    :return: A list of scanned table names
+    """
+    tables = set(tables)
+    scanned = []
+    if dialect == "sqlite":
+        for detail in plan:
+            match = _SQLITE_SCAN.match(detail)
+            if match and match.group(1) in tables and "USING" not in detail:
+                scanned.append(match.group(1))
+        return scanned
+    for root in plan:
+        for node in _postgres_nodes(root["Plan"]):
+            if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in tables:
+                scanned.append(node["Relation Name"])
+    return scanned
+
+
+def sorts(dialect: str, plan: list) -> bool:
+    """
+    The sorts function tells whether the plan sorts rows itself instead of
+    reading them in index order.
+
+    :param dialect: sqlite or postgresql
+    :param plan: Plan returned by explain
+    :return: True if the plan has a sort step
+    """
+    if dialect == "sqlite":
+        return any("TEMP B-TREE FOR ORDER BY" in detail for detail in plan)
+    return any(node.get("Node Type") in ("Sort", "Incremental Sort")
+               for root in plan for node in _postgres_nodes(root["Plan"]))
+
+
+def check_plans(engine: Engine, statements: List[Tuple[str, object]], tables: Iterable[str],
+                no_sorts: bool = False) -> List[dict]:
+    """
+    The check_plans function explains captured statements and reports the
+    ones that scan a watched table, or with no_sorts the ones that sort
+    rows instead of reading an index in order. INSERT statements have no
+    plan to check.
+    On Postgres sequential scans are disabled for the session first, so the
+    planner only picks one when no usable index exists, even on a small
+    seeded database.
+
+    :param engine: Engine the statements were captured on
+    :param statements: Statements returned by capture_statements
+    :param tables: Names of the tables that must not be scanned
+    :param no_sorts: Also report statements that sort
+    :return: A list of dicts with statement, plan, scanned tables and whether it sorts
+    """
+    problems = []
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SET enable_seqscan = off"))
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+            plan = explain(conn, statement, parameters)
+            scanned = full_scans(conn.dialect.name, plan, tables)
+            sorted_ = no_sorts and sorts(conn.dialect.name, plan)
+            if scanned or sorted_:
+                problems.append({"statement": statement, "plan": plan, "tables": scanned, "sorts": sorted_})
+        conn.rollback()
+    return problems
@@ -1,6 +1,6 @@
 
-from sqlalchemy import Column, Integer, String, func, Date, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, func, Date, Boolean, Index, UniqueConstraint
+from sqlalchemy.orm import relationship, backref
 from sqlalchemy.sql.schema import ForeignKey
 from sqlalchemy.sql.sqltypes import DateTime
 from sqlalchemy.ext.declarative import declarative_base
@@ -17,9 +17,23 @@ class Contact(Base):
     last_name = Column(String)
     email = Column(String, unique=True, index=True)
     phone_number = Column(String, unique=True)
+    # phone_number in E.164, set by the repository on every write
+    phone_e164 = Column(String(16))
     birthday = Column(Date)
-    user_id = Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), default=None)
-    user = relationship('User', backref="contacts")
+    created_at = Column(DateTime, default=func.now())
+    user_id = Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), default=None, index=True)
+    # passive_deletes: never load every contact of a user just to delete them,
+    # large accounts are purged in batches by src.services.purge
+    user = relationship('User', backref=backref("contacts", passive_deletes=True))
+
+    __table_args__ = (
+        Index('ix_contacts_user_id_phone_e164', 'user_id', 'phone_e164'),
+        # one per sort key of src.repository.filters.SORTS
+        Index('ix_contacts_user_id_first_name_id', 'user_id', 'first_name', 'id'),
+        Index('ix_contacts_user_id_last_name_id', 'user_id', 'last_name', 'id'),
+        Index('ix_contacts_user_id_birthday_id', 'user_id', 'birthday', 'id'),
+        Index('ix_contacts_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+    )
     
 
 
@@ -35,4 +49,79 @@ class User(Base):
     created_at = Column('crated_at', DateTime, default=func.now())
     avatar = Column(String(255), nullable=True) 
     refresh_token = Column(String(255), nullable=True)
-    confirmed = Column(Boolean, default=False)
\ No newline at end of file
+    confirmed = Column(Boolean, default=False)
+    disabled = Column(Boolean, default=False)
+    birthday_digest = Column(Boolean, default=False)
+
+
+class UpcomingBirthday(Base):
+    """
+    The UpcomingBirthday class is used to create a table of the contacts whose
+    birthday is within the next days, refreshed daily by src.services.birthdays
+    """
+    __tablename__ = 'upcoming_birthdays'
+    contact_id = Column(Integer, ForeignKey('contacts.id', ondelete='CASCADE'), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    next_birthday = Column(Date, nullable=False)
+
+    __table_args__ = (
+        Index('ix_upcoming_birthdays_user_id_next_birthday', 'user_id', 'next_birthday'),
+    )
+
+
+class Tag(Base):
+    """
+    The Tag class is used to create a table of the tags a user groups
+    contacts with
+    """
+    __tablename__ = 'tags'
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    name = Column(String(50), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'name', name='uq_tags_user_id_name'),
+    )
+
+
+class ContactTag(Base):
+    """
+    The ContactTag class is used to create the table linking tags and
+    contacts. user_id is repeated here so a tag filter is a seek on
+    (user_id, tag_id, contact_id)
+    """
+    __tablename__ = 'contact_tags'
+    contact_id = Column(Integer, ForeignKey('contacts.id', ondelete='CASCADE'), primary_key=True)
+    tag_id = Column(Integer, ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+
+    __table_args__ = (
+        Index('ix_contact_tags_user_id_tag_id_contact_id', 'user_id', 'tag_id', 'contact_id'),
+    )
+
+
+class ContactCounter(Base):
+    """
+    The ContactCounter class is used to create the table of per-user contact
+    counts (total and birthdays per month). The repository changes them in
+    the transaction of every contact write; src.services.counters repairs
+    drift
+    """
+    __tablename__ = 'contact_counters'
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    name = Column(String(16), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+class BackfillProgress(Base):
+    """
+    The BackfillProgress class is used to create the table where
+    src.database.backfill records how far each data backfill got, so an
+    interrupted backfill resumes after the last committed batch
+    """
+    __tablename__ = 'backfill_progress'
+    name = Column(String(100), primary_key=True)
+    last_key = Column(Integer, nullable=False, default=0)
+    rows = Column(Integer, nullable=False, default=0)
+    done = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, nullable=False, default=func.now(), onupdate=func.now())
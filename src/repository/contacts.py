@@ -1,18 +1,90 @@
-from sqlalchemy import and_, cast, String
+from sqlalchemy import and_, or_, insert, update, delete
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from src.schemas import ContactBase, ContactUpdate, ContactResponse
-from src.database.models import Contact
+from src.schemas import ContactBase, ContactUpdate, ContactResponse, ContactOperation
+from src.database.models import Contact, UpcomingBirthday
 from src.database.models import User
-from datetime import date
+from src.services.tracing import traced
+from src.repository.tags import tag_conditions, move_tags
+from src.repository.filters import compile_sort, compile_filters
+from src.repository.counters import stage_counters, count_contacts, change_birthday
+from src.services.phones import normalize_phone
+from src.conf.config import settings
+from collections import Counter
+from datetime import date, timedelta
 from sqlalchemy import select
 from sqlalchemy import func
 from fastapi import HTTPException
 from starlette import status
-from typing import List, Optional
+from typing import List, Optional, Sequence
 
 class ResponseValidationError(Exception):
     pass
 
+
+CONTACT_FIELDS = tuple(ContactResponse.model_fields)
+CONTACT_COLUMNS = tuple(getattr(Contact, name) for name in CONTACT_FIELDS)
+
+
+def contact_columns(fields: Optional[Sequence[str]] = None) -> tuple:
+    """
+    The contact_columns function maps a sparse fieldset onto Contact columns.
+    The id column is always selected so clients can still address the contact.
+
+    :param fields: Names of the requested fields, None for all of them
+    :return: A tuple of Contact columns
+    """
+    if not fields:
+        return CONTACT_COLUMNS
+    return tuple(column for column in CONTACT_COLUMNS if column.key == 'id' or column.key in fields)
+
+def next_birthday(birthday: Optional[date], today: date) -> Optional[date]:
+    """
+    The next_birthday function returns the date of the next birthday on or
+    after today. A 29 February birthday falls on 1 March in other years.
+
+    :param birthday: Date of birth
+    :param today: The current date
+    :return: The date of the next birthday or None without a birthday
+    """
+    if birthday is None:
+        return None
+    for year in (today.year, today.year + 1):
+        try:
+            upcoming = birthday.replace(year=year)
+        except ValueError:
+            upcoming = date(year, 3, 1)
+        if upcoming >= today:
+            return upcoming
+
+
+def stage_upcoming_birthdays(db: Session, user_id: int, birthdays: dict, today: Optional[date] = None) -> None:
+    """
+    The stage_upcoming_birthdays function brings the upcoming_birthdays rows
+    of written contacts up to date in the current transaction, so the
+    birthdays endpoint doesn't have to wait for the daily refresh.
+
+    :param db: Access the database
+    :param user_id: Owner of the contacts
+    :param birthdays: Birthdays by contact id
+    :param today: The current date
+    :return: None
+    """
+    if not birthdays:
+        return
+    today = today or date.today()
+    end = today + timedelta(days=settings.birthdays_window_days)
+    db.execute(delete(UpcomingBirthday).where(UpcomingBirthday.contact_id.in_(birthdays)))
+    rows = []
+    for contact_id, birthday in birthdays.items():
+        upcoming = next_birthday(birthday, today)
+        if upcoming is not None and upcoming <= end:
+            rows.append({"contact_id": contact_id, "user_id": user_id, "next_birthday": upcoming})
+    if rows:
+        db.execute(insert(UpcomingBirthday), rows)
+
+
+@traced()
 async def get_contact(db: Session, user: User, contact_id: int) -> Contact:
     """
     The get_contact function returns a single contact from the database.
@@ -28,6 +100,29 @@ async def get_contact(db: Session, user: User, contact_id: int) -> Contact:
     return res
 
 
+@traced()
+async def get_contacts_by_ids(db: Session, user: User, contact_ids: Sequence[int],
+                              fields: Optional[Sequence[str]] = None) -> List[dict]:
+    """
+    The get_contacts_by_ids function resolves a list of contact ids with a
+    single ``WHERE user_id = ? AND id IN (...)`` query.
+    Contacts are returned in the order of contact_ids; ids that don't exist
+    or belong to another user are left out.
+
+    :param db: Access the database
+    :param user: Restrict the lookup to the contacts of this user
+    :param contact_ids: Ids of the contacts to get
+    :param fields: Select only these fields (plus id)
+    :return: A list of dicts in the ContactResponse shape
+    """
+    if not contact_ids:
+        return []
+    stmt = select(*contact_columns(fields)).where(and_(Contact.user_id == user.id, Contact.id.in_(set(contact_ids))))
+    found = {row['id']: dict(row) for row in db.execute(stmt).mappings()}
+    return [found[contact_id] for contact_id in dict.fromkeys(contact_ids) if contact_id in found]
+
+
+@traced()
 async def get_contact_by_email(db: Session, user: User, email: str) -> List[Contact]:
     """
     The get_contact_by_email function returns a list of contacts that match
@@ -46,11 +141,14 @@ async def get_contact_by_email(db: Session, user: User, email: str) -> List[Cont
     return result
 
 
+@traced()
 async def get_contact_by_phone(db: Session, user: User, phone_number: str) -> List[Contact]:
     """
     The get_contact_by_phone function returns a list of contacts that match
     the phone number provided
     If no phone number is provided, all contacts are returned.
+    Numbers are compared in E.164, so ``+380 50 123 4567`` finds a contact
+    saved as ``0501234567``.
 
     :param db: Connect to the database
     :param user: Get the user id of the logged in user
@@ -59,11 +157,33 @@ async def get_contact_by_phone(db: Session, user: User, phone_number: str) -> Li
     
     :return: A list of contacts
     """
-    result = db.query(Contact).filter(and_(Contact.phone_number == phone_number, Contact.user_id == user.id)).first()
+    phone_e164 = normalize_phone(phone_number)
+    if phone_e164 is None:
+        condition = Contact.phone_number == phone_number
+    else:
+        condition = Contact.phone_e164 == phone_e164
+    result = db.query(Contact).filter(and_(Contact.user_id == user.id, condition)).first()
 
     return result
 
 
+@traced()
+async def get_contact_by_caller(db: Session, user: User, phone_e164: str) -> Optional[dict]:
+    """
+    The get_contact_by_caller function resolves an incoming call to a contact
+    with a lookup on the (user_id, phone_e164) index.
+
+    :param db: Connect to the database
+    :param user: Owner of the contacts
+    :param phone_e164: Number of the caller in E.164
+    :return: A dict in the ContactResponse shape or None
+    """
+    stmt = select(*CONTACT_COLUMNS).where(and_(Contact.user_id == user.id, Contact.phone_e164 == phone_e164)).limit(1)
+    row = db.execute(stmt).mappings().first()
+    return dict(row) if row else None
+
+
+@traced()
 async def get_contacts(db: Session, user: User, skip: int = 0, limit: int = 100) -> List[Contact]:
     """
     The get_contacts function returns a list of contacts for the user.
@@ -85,6 +205,36 @@ async def get_contacts(db: Session, user: User, skip: int = 0, limit: int = 100)
     return db.query(Contact).filter(Contact.user_id == user.id).offset(skip).limit(limit).all()
 
 
+@traced()
+async def get_contacts_rows(db: Session, user: User, skip: int = 0, limit: int = 100,
+                            fields: Optional[Sequence[str]] = None, all_tags: Optional[Sequence[int]] = None,
+                            any_tags: Optional[Sequence[int]] = None, sort: Optional[str] = None,
+                            filters: Optional[Sequence[str]] = None) -> List[dict]:
+    """
+    The get_contacts_rows function returns the same page as get_contacts,
+    but selects only the columns of ContactResponse and returns plain dicts
+    instead of ORM objects, so the route can encode them directly.
+    Sorting and filtering are done by the database, see
+    src.repository.filters for the accepted sort keys and filters.
+
+    :param db: Pass the database session to the function
+    :param user: Get the user_id from the user object
+    :param skip: Skip the first n contacts
+    :param limit: Limit the number of contacts returned
+    :param fields: Select only these fields (plus id)
+    :param all_tags: Only contacts with all of these tags
+    :param any_tags: Only contacts with at least one of these tags
+    :param sort: Sort key, e.g. ``last_name`` or ``-birthday``
+    :param filters: Filter expressions, e.g. ``birthday:gte:1990-01-01``
+    :return: A list of dicts in the ContactResponse shape
+    """
+    conditions = [Contact.user_id == user.id, *tag_conditions(user.id, all_tags, any_tags), *compile_filters(filters)]
+    stmt = (select(*contact_columns(fields)).where(and_(*conditions)).order_by(*compile_sort(sort))
+            .offset(skip).limit(limit))
+    return [dict(row) for row in db.execute(stmt).mappings()]
+
+
+@traced()
 async def create_contact(db: Session, user: User, contact: ContactBase) -> Contact:
     """
     The create_contact function creates a new contact in the database.
@@ -95,13 +245,17 @@ async def create_contact(db: Session, user: User, contact: ContactBase) -> Conta
     
     :return: A contact response object, that was created
     """
-    db_contact = Contact(**contact.dict(), user_id=user.id)
+    db_contact = Contact(**contact.dict(), phone_e164=normalize_phone(contact.phone_number), user_id=user.id)
     db.add(db_contact)
+    db.flush()
+    stage_upcoming_birthdays(db, user.id, {db_contact.id: db_contact.birthday})
+    stage_counters(db, user.id, count_contacts(Counter(), [db_contact.birthday]))
     db.commit()
     db.refresh(db_contact)
     return db_contact
 
 
+@traced()
 async def update_contact(db: Session, user: User, db_contact: Contact, contact: ContactUpdate) -> Contact:
     """
     The update_contact function updates a contact in the database.
@@ -124,13 +278,18 @@ async def update_contact(db: Session, user: User, db_contact: Contact, contact:
         db_contact.email = contact.email
     if contact.phone_number:
         db_contact.phone_number = contact.phone_number
+        db_contact.phone_e164 = normalize_phone(contact.phone_number)
     if contact.birthday:
+        if contact.birthday != db_contact.birthday:
+            stage_counters(db, user.id, change_birthday(Counter(), db_contact.birthday, contact.birthday))
         db_contact.birthday = contact.birthday
+        stage_upcoming_birthdays(db, user.id, {db_contact.id: contact.birthday})
     db.commit()
     db.refresh(db_contact)
     return db_contact
 
 
+@traced()
 async def delete_contact(db: Session, user: User, contact_id: int) -> None:
     """
     The delete_contact function deletes a contact from the database.
@@ -146,19 +305,246 @@ async def delete_contact(db: Session, user: User, contact_id: int) -> None:
         raise HTTPException
     
     db.delete(contact)
+    stage_counters(db, user.id, count_contacts(Counter(), [contact.birthday], sign=-1))
+    db.commit()
+
+
+@traced()
+async def apply_contact_operations(db: Session, user: User, operations: Sequence[ContactOperation]) -> List[dict]:
+    """
+    The apply_contact_operations function runs a batch of create, update and
+    delete operations in one transaction.
+    Operations are grouped by type and executed as set-based statements: one
+    ``DELETE ... WHERE id IN``, one bulk UPDATE by primary key and one
+    multi-row INSERT, followed by a single commit.
+    Operations that can't be applied (unknown contact, the same contact twice,
+    email or phone number already registered) are skipped and reported in the
+    results, the others are still applied.
+
+    :param db: Access the database
+    :param user: Owner of the contacts
+    :param operations: Operations in the order they were sent
+    :return: One result dict per operation, in the same order
+    """
+    results = [{"index": index, "op": operation.op, "id": operation.id, "detail": None}
+               for index, operation in enumerate(operations)]
+
+    target_ids = {operation.id for operation in operations if operation.op != "create"}
+    owned_ids = {}
+    if target_ids:
+        owned_ids = dict(db.execute(select(Contact.id, Contact.birthday)
+                                    .where(and_(Contact.user_id == user.id, Contact.id.in_(target_ids)))).all())
+
+    accepted, seen_ids = [], set()
+    for index, operation in enumerate(operations):
+        if operation.op != "create" and operation.id not in owned_ids:
+            results[index].update(status=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+        elif operation.op != "create" and operation.id in seen_ids:
+            results[index].update(status=status.HTTP_400_BAD_REQUEST, detail="Contact appears more than once in the batch")
+        else:
+            seen_ids.add(operation.id)
+            accepted.append(index)
+
+    delete_ids = {operations[index].id for index in accepted if operations[index].op == "delete"}
+    writes = [index for index in accepted if operations[index].op != "delete"]
+
+    # One query for the duplicate checks of the whole batch; contacts deleted
+    # in this batch free their email and phone number. Phone numbers are
+    # compared in E.164, numbers that can't be normalized as written.
+    phone_keys, raw_phones = {}, set()
+    for index in writes:
+        phone_number = operations[index].contact.phone_number
+        phone_keys[index] = normalize_phone(phone_number)
+        if phone_keys[index] is None:
+            phone_keys[index] = phone_number
+            raw_phones.add(phone_number)
+    taken_emails, taken_phones = {}, {}
+    if writes:
+        emails = {operations[index].contact.email for index in writes}
+        phones = set(phone_keys.values()) - raw_phones
+        conditions = [Contact.email.in_(emails), Contact.phone_e164.in_(phones)]
+        if raw_phones:
+            conditions.append(Contact.phone_number.in_(raw_phones))
+        stmt = select(Contact.id, Contact.email, Contact.phone_number, Contact.phone_e164).where(
+            and_(Contact.user_id == user.id, or_(*conditions))
+        )
+        for row in db.execute(stmt):
+            if row.id not in delete_ids:
+                taken_emails[row.email] = row.id
+                phone_key = row.phone_e164 or row.phone_number
+                if phone_key is not None:
+                    taken_phones[phone_key] = row.id
+
+    inserts, updates = [], []
+    for index in writes:
+        operation = operations[index]
+        owner = operation.id if operation.op == "update" else ("create", index)
+        if taken_emails.get(operation.contact.email, owner) != owner:
+            results[index].update(status=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+            continue
+        if taken_phones.get(phone_keys[index], owner) != owner:
+            results[index].update(status=status.HTTP_400_BAD_REQUEST, detail="Phone number already registered")
+            continue
+        taken_emails[operation.contact.email] = owner
+        taken_phones[phone_keys[index]] = owner
+        if operation.op == "create":
+            inserts.append(index)
+        else:
+            updates.append(index)
+            results[index]["status"] = status.HTTP_200_OK
+
+    try:
+        if delete_ids:
+            db.execute(delete(Contact).where(and_(Contact.user_id == user.id, Contact.id.in_(delete_ids))))
+        if updates:
+            db.execute(update(Contact), [{"id": operations[index].id, **operations[index].contact.model_dump(),
+                                          "phone_e164": normalize_phone(operations[index].contact.phone_number)}
+                                         for index in updates])
+        if inserts:
+            new_ids = db.scalars(
+                insert(Contact).returning(Contact.id, sort_by_parameter_order=True),
+                [{**operations[index].contact.model_dump(), "user_id": user.id,
+                  "phone_e164": normalize_phone(operations[index].contact.phone_number)} for index in inserts]
+            ).all()
+            for index, contact_id in zip(inserts, new_ids):
+                results[index].update(id=contact_id, status=status.HTTP_201_CREATED)
+        stage_upcoming_birthdays(db, user.id, {results[index]["id"]: operations[index].contact.birthday
+                                               for index in updates + inserts})
+        deltas = count_contacts(Counter(), [operations[index].contact.birthday for index in inserts])
+        count_contacts(deltas, [owned_ids[contact_id] for contact_id in delete_ids], sign=-1)
+        for index in updates:
+            change_birthday(deltas, owned_ids[operations[index].id], operations[index].contact.birthday)
+        stage_counters(db, user.id, deltas)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Batch conflicts with existing contacts, nothing was applied")
+
+    for index in accepted:
+        if operations[index].op == "delete":
+            results[index]["status"] = status.HTTP_204_NO_CONTENT
+    return results
+
+
+@traced()
+async def get_contacts_for_dedup(db: Session, user_id: int) -> list:
+    """
+    The get_contacts_for_dedup function selects the columns the duplicate
+    detection needs for all contacts of a user, without loading ORM objects.
+
+    :param db: Access the database
+    :param user_id: Id of the user
+    :return: A list of rows with id, first_name, last_name, email, phone_e164 and birthday
+    """
+    stmt = select(Contact.id, Contact.first_name, Contact.last_name, Contact.email, Contact.phone_e164,
+                  Contact.birthday).where(Contact.user_id == user_id)
+    return db.execute(stmt).all()
+
+
+@traced()
+async def get_contacts_for_autocomplete(db: Session, user_id: int) -> list:
+    """
+    The get_contacts_for_autocomplete function selects the names and emails
+    of all contacts of a user for the autocomplete index.
+
+    :param db: Access the database
+    :param user_id: Id of the user
+    :return: A list of rows with id, first_name, last_name and email
+    """
+    stmt = select(Contact.id, Contact.first_name, Contact.last_name, Contact.email).where(Contact.user_id == user_id)
+    return db.execute(stmt).all()
+
+
+# phone_e164 is not merged on its own, it is derived from the merged phone_number
+MERGED_FIELDS = ("first_name", "last_name", "email", "phone_number", "birthday")
+
+
+@traced()
+async def merge_contacts(db: Session, user: User, keep_id: int, merge_ids: Sequence[int]) -> Contact:
+    """
+    The merge_contacts function merges duplicates into one contact in a
+    single transaction. The kept contact keeps its values; fields it doesn't
+    have are taken from the merged contacts, and it gets their tags. The
+    merged contacts are then deleted.
+
+    :param db: Access the database
+    :param user: Owner of the contacts
+    :param keep_id: Id of the contact that stays
+    :param merge_ids: Ids of the contacts merged into it
+    :return: The kept contact
+    """
+    merge_ids = [contact_id for contact_id in dict.fromkeys(merge_ids) if contact_id != keep_id]
+    if not merge_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nothing to merge")
+    found = {contact.id: contact for contact in db.scalars(
+        select(Contact).where(and_(Contact.user_id == user.id, Contact.id.in_([keep_id, *merge_ids])))
+    )}
+    missing = [contact_id for contact_id in [keep_id, *merge_ids] if contact_id not in found]
+    if missing:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"Contacts not found: {', '.join(map(str, missing))}")
+    keep = found[keep_id]
+    values = {}
+    for field in MERGED_FIELDS:
+        if getattr(keep, field) is None:
+            values[field] = next((getattr(found[contact_id], field) for contact_id in merge_ids
+                                  if getattr(found[contact_id], field) is not None), None)
+    if "phone_number" in values:
+        values["phone_e164"] = normalize_phone(values["phone_number"])
+    await move_tags(db, user, merge_ids, keep_id)
+    # The merged rows go first: the kept contact may take over their unique
+    # email or phone number.
+    db.execute(delete(Contact).where(and_(Contact.user_id == user.id, Contact.id.in_(merge_ids))))
+    for field, value in values.items():
+        setattr(keep, field, value)
+    deltas = count_contacts(Counter(), [found[contact_id].birthday for contact_id in merge_ids], sign=-1)
+    if "birthday" in values:
+        stage_upcoming_birthdays(db, user.id, {keep.id: keep.birthday})
+        change_birthday(deltas, None, keep.birthday)
+    stage_counters(db, user.id, deltas)
     db.commit()
+    db.refresh(keep)
+    return keep
 
 
-async def search_contacts(db: Session, user: User, first_name: str = None, last_name: str = None, email: str = None)-> List[Contact]:
+@traced()
+async def purge_contacts_batch(db: Session, user_id: int, batch_size: int) -> int:
+    """
+    The purge_contacts_batch function deletes up to batch_size contacts of a
+    user and commits, so every batch holds its locks only briefly.
+
+    :param db: Access the database
+    :param user_id: Id of the user whose contacts are purged
+    :param batch_size: Maximum number of contacts to delete
+    :return: Number of deleted contacts, 0 when there is nothing left
+    """
+    rows = db.execute(select(Contact.id, Contact.birthday).where(Contact.user_id == user_id).limit(batch_size)).all()
+    if not rows:
+        return 0
+    db.execute(delete(Contact).where(Contact.id.in_([row.id for row in rows])))
+    stage_counters(db, user_id, count_contacts(Counter(), [row.birthday for row in rows], sign=-1))
+    db.commit()
+    return len(rows)
+
+
+@traced()
+async def search_contacts(db: Session, user: User, first_name: str = None, last_name: str = None, email: str = None,
+                          fields: Optional[Sequence[str]] = None, all_tags: Optional[Sequence[int]] = None,
+                          any_tags: Optional[Sequence[int]] = None) -> List[Contact]:
     """
     The search_contacts function returns a list of contacts with the
     given first_name, last_name or email.
+    If fields are given, only those columns are selected and plain dicts
+    are returned instead of Contact objects.
 
     :param db: Pass the database session to the function
     :param user: Get the user id from the database
     :param first_name: First name of contact
     :param last_name: Last name of contact
     :param email: Email of contact
+    :param fields: Select only these fields (plus id)
+    :param all_tags: Only contacts with all of these tags
+    :param any_tags: Only contacts with at least one of these tags
     :return: A list of ContactResponse objects
     """
     conditions = [Contact.user_id == user.id]  # Додали умову для user_id
@@ -168,58 +554,90 @@ async def search_contacts(db: Session, user: User, first_name: str = None, last_
         conditions.append(Contact.last_name == last_name)
     if email:
         conditions.append(Contact.email == email)
+    conditions.extend(tag_conditions(user.id, all_tags, any_tags))
     if not conditions:
         raise ResponseValidationError("Please provide at least one search condition.")
+    if fields:
+        return [row._asdict() for row in db.query(*contact_columns(fields)).filter(and_(*conditions)).all()]
     query = db.query(Contact).filter(and_(*conditions)).all()
     return query
 
 
-# for postgres
-
-async def get_contacts_by_birthday(db: Session, user: User, start_date: date, end_date: date) -> Optional[List[Contact]]:
+@traced()
+async def get_upcoming_birthdays(db: Session, user: User, start_date: date, end_date: date,
+                                 fields: Optional[Sequence[str]] = None) -> List[dict]:
     """
-    The get_birthdays function returns a list of contacts with birthdays in
-    the next 7 days.
+    The get_upcoming_birthdays function returns the contacts with a birthday
+    between start_date and end_date from the precomputed upcoming_birthdays
+    table, soonest first. The window can't be longer than
+    birthdays_window_days.
 
     :param db: Pass the database session into the function
     :param user: Get the user id
-    :param start_date: current date
-    :param end_date: date after 7 days
-    :return: A list of contacts that have a birthday within the next 7 days
-    """
-        # result = db.query(Contact).filter(and_(Contact.email == email, Contact.user_id == user.id)).all()
-    result = db.query(Contact).where(
-        and_(
-            cast(func.strftime('%m%d', Contact.birthday), String) >= start_date.strftime('%m%d'),
-            cast(func.strftime('%m%d', Contact.birthday), String) <= end_date.strftime('%m%d'),
-            (Contact.user_id == user.id)
-        )
-    ).all()
-    
-    
-    return result
+    :param start_date: First day of the window
+    :param end_date: Last day of the window
+    :param fields: Select only these fields (plus id)
+    :return: A list of dicts in the ContactResponse shape
+    """
+    stmt = (
+        select(*contact_columns(fields))
+        .join(UpcomingBirthday, UpcomingBirthday.contact_id == Contact.id)
+        .where(and_(UpcomingBirthday.user_id == user.id, UpcomingBirthday.next_birthday.between(start_date, end_date)))
+        .order_by(UpcomingBirthday.next_birthday, Contact.id)
+    )
+    return [dict(row) for row in db.execute(stmt).mappings()]
 
 
-#for sqlite
-# async def get_contacts_by_birthday(db: Session, user: User, start_date: date, end_date: date):
+@traced()
+async def refresh_upcoming_birthdays(db: Session, user_ids: Sequence[int], today: date, days: int) -> int:
     """
-    The get_birthdays function returns a list of contacts with birthdays in
-    the next 7 days.
+    The refresh_upcoming_birthdays function rebuilds the upcoming_birthdays
+    rows of a chunk of users and commits. Contacts are streamed, only the
+    ones with a birthday in the window are kept in memory.
 
-    :param db: Pass the database session into the function
-    :param user: Get the user id
-    :param start_date: current date
-    :param end_date: date after 7 days
-    :return: A list of contacts that have a birthday within the next 7 days
+    :param db: Access the database
+    :param user_ids: Ids of the users to refresh
+    :param today: First day of the window
+    :param days: Length of the window in days
+    :return: Number of stored upcoming birthdays
     """
-#     query = select(Contact).where(
-#         and_(
-#             cast(func.strftime('%m%d', Contact.birthday), String) >= start_date.strftime('%m%d'),
-#             cast(func.strftime('%m%d', Contact.birthday), String) <= end_date.strftime('%m%d'),
-#             (Contact.user_id == user.id)
-#         )
-#     )
-#     result = db.execute(query)
-#     return result.scalars().all()
+    end = today + timedelta(days=days)
+    stmt = (select(Contact.id, Contact.user_id, Contact.birthday)
+            .where(and_(Contact.user_id.in_(user_ids), Contact.birthday.isnot(None)))
+            .execution_options(yield_per=1000))
+    rows = []
+    for contact in db.execute(stmt):
+        upcoming = next_birthday(contact.birthday, today)
+        if upcoming <= end:
+            rows.append({"contact_id": contact.id, "user_id": contact.user_id, "next_birthday": upcoming})
+    db.execute(delete(UpcomingBirthday).where(UpcomingBirthday.user_id.in_(user_ids)))
+    if rows:
+        db.execute(insert(UpcomingBirthday), rows)
+    db.commit()
+    return len(rows)
+
 
+@traced()
+async def get_digest_birthdays(db: Session, user_ids: Sequence[int], start_date: date, end_date: date) -> dict:
+    """
+    The get_digest_birthdays function collects the upcoming birthdays of a
+    chunk of users with one query, for the digest emails.
 
+    :param db: Access the database
+    :param user_ids: Ids of the users
+    :param start_date: First day of the window
+    :param end_date: Last day of the window
+    :return: Lists of dicts with first_name, last_name and next_birthday, by user id
+    """
+    stmt = (
+        select(UpcomingBirthday.user_id, Contact.first_name, Contact.last_name, UpcomingBirthday.next_birthday)
+        .join(Contact, UpcomingBirthday.contact_id == Contact.id)
+        .where(and_(UpcomingBirthday.user_id.in_(user_ids),
+                    UpcomingBirthday.next_birthday.between(start_date, end_date)))
+        .order_by(UpcomingBirthday.user_id, UpcomingBirthday.next_birthday)
+    )
+    digests = {}
+    for row in db.execute(stmt):
+        digests.setdefault(row.user_id, []).append(
+            {"first_name": row.first_name, "last_name": row.last_name, "next_birthday": row.next_birthday})
+    return digests
@@ -0,0 +1,142 @@
+from collections import Counter
+from datetime import date
+from typing import Dict, Iterable, Optional, Sequence
+
+from sqlalchemy import and_, select, func, update, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from src.database.models import Contact, ContactCounter, User
+from src.services.tracing import traced
+
+TOTAL = "total"
+
+
+def month_counter(month: int) -> str:
+    return f"birthdays:{month:02d}"
+
+
+def count_contacts(deltas: Counter, birthdays: Iterable[Optional[date]], sign: int = 1) -> Counter:
+    """
+    The count_contacts function adds created (sign 1) or deleted (sign -1)
+    contacts to the counter changes of a write.
+
+    :param deltas: Counter changes of the write
+    :param birthdays: Birthdays of the contacts, None if unknown
+    :param sign: 1 for created, -1 for deleted contacts
+    :return: deltas
+    """
+    for birthday in birthdays:
+        deltas[TOTAL] += sign
+        if birthday is not None:
+            deltas[month_counter(birthday.month)] += sign
+    return deltas
+
+
+def change_birthday(deltas: Counter, old: Optional[date], new: Optional[date]) -> Counter:
+    """
+    The change_birthday function adds a changed birthday to the counter
+    changes of a write.
+
+    :param deltas: Counter changes of the write
+    :param old: Birthday before the write
+    :param new: Birthday after the write
+    :return: deltas
+    """
+    if old is not None:
+        deltas[month_counter(old.month)] -= 1
+    if new is not None:
+        deltas[month_counter(new.month)] += 1
+    return deltas
+
+
+def _upsert(db: Session, rows: Sequence[dict], increment: bool) -> None:
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        stmt = (postgresql if dialect == "postgresql" else sqlite).insert(ContactCounter)
+        value = ContactCounter.value + stmt.excluded.value if increment else stmt.excluded.value
+        db.execute(stmt.on_conflict_do_update(index_elements=["user_id", "name"], set_={"value": value}), rows)
+        return
+    for row in rows:
+        value = ContactCounter.value + row["value"] if increment else row["value"]
+        if not db.execute(update(ContactCounter).where(and_(ContactCounter.user_id == row["user_id"],
+                                                            ContactCounter.name == row["name"]))
+                          .values(value=value)).rowcount:
+            db.execute(insert(ContactCounter).values(**row))
+
+
+def stage_counters(db: Session, user_id: int, deltas: Counter) -> None:
+    """
+    The stage_counters function adds the counter changes of a write to the
+    user's counters without committing, so they are committed together
+    with the write.
+
+    :param db: Access the database
+    :param user_id: Owner of the contacts
+    :param deltas: Counter changes of the write
+    :return: None
+    """
+    rows = [{"user_id": user_id, "name": name, "value": value} for name, value in sorted(deltas.items()) if value]
+    if rows:
+        _upsert(db, rows, increment=True)
+
+
+@traced()
+async def get_counters(db: Session, user: User) -> Dict[str, int]:
+    """
+    The get_counters function reads all counters of a user.
+
+    :param db: Access the database
+    :param user: Owner of the contacts
+    :return: Counter values by name
+    """
+    return dict(db.execute(select(ContactCounter.name, ContactCounter.value)
+                           .where(ContactCounter.user_id == user.id)).all())
+
+
+@traced()
+async def get_total(db: Session, user: User) -> int:
+    """
+    The get_total function returns the number of contacts of a user from the
+    counters, without counting the contacts.
+
+    :param db: Access the database
+    :param user: Owner of the contacts
+    :return: Number of contacts
+    """
+    return db.scalar(select(ContactCounter.value).where(and_(ContactCounter.user_id == user.id,
+                                                             ContactCounter.name == TOTAL))) or 0
+
+
+@traced()
+async def reconcile_counters(db: Session, user_ids: Sequence[int]) -> Dict[int, Dict[str, tuple]]:
+    """
+    The reconcile_counters function recounts the contacts of a chunk of users
+    and overwrites the counters that drifted. The counter rows are locked
+    first (on Postgres), so a contact write running at the same time either
+    committed before the recount or changes the repaired value after it.
+
+    :param db: Access the database
+    :param user_ids: Ids of the users
+    :return: The repaired counters as (stored, actual) by name, by user id
+    """
+    stored = {(row.user_id, row.name): row.value for row in db.execute(
+        select(ContactCounter.user_id, ContactCounter.name, ContactCounter.value)
+        .where(ContactCounter.user_id.in_(user_ids)).with_for_update()
+    )}
+    month = func.extract("month", Contact.birthday)
+    actual = Counter()
+    for row in db.execute(select(Contact.user_id, month.label("month"), func.count().label("count"))
+                          .where(Contact.user_id.in_(user_ids)).group_by(Contact.user_id, month)):
+        actual[(row.user_id, TOTAL)] += row.count
+        if row.month is not None:
+            actual[(row.user_id, month_counter(int(row.month)))] += row.count
+    repaired = {}
+    for key in sorted(set(stored) | set(actual)):
+        if stored.get(key, 0) != actual.get(key, 0):
+            repaired.setdefault(key[0], {})[key[1]] = (stored.get(key, 0), actual.get(key, 0))
+    if repaired:
+        _upsert(db, [{"user_id": user_id, "name": name, "value": values[1]}
+                     for user_id, names in repaired.items() for name, values in names.items()], increment=False)
+    db.commit()
+    return repaired
@@ -0,0 +1,109 @@
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import Column
+
+from src.database.models import Contact
+from src.services.phones import normalize_phone
+
+# Sort keys clients may use and the columns they order by. Every key has a
+# (user_id, column, id) index, see Contact.__table_args__.
+SORTS: Dict[str, Column] = {
+    "first_name": Contact.first_name,
+    "last_name": Contact.last_name,
+    "birthday": Contact.birthday,
+    "created": Contact.created_at,
+}
+
+
+def _like_pattern(value: str, prefix_only: bool) -> str:
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%" if prefix_only else f"%{escaped}%"
+
+
+_TEXT_OPERATORS = {
+    "eq": lambda column, value: column == value,
+    "contains": lambda column, value: column.ilike(_like_pattern(value, False), escape="\\"),
+    "startswith": lambda column, value: column.ilike(_like_pattern(value, True), escape="\\"),
+}
+_RANGE_OPERATORS = {
+    "eq": lambda column, value: column == value,
+    "lt": lambda column, value: column < value,
+    "lte": lambda column, value: column <= value,
+    "gt": lambda column, value: column > value,
+    "gte": lambda column, value: column >= value,
+}
+
+
+def _parse_phone(value: str) -> str:
+    phone = normalize_phone(value)
+    if phone is None:
+        raise ValueError(f"'{value}' is not a phone number")
+    return phone
+
+
+# field: (column, value parser, allowed operators)
+FILTERS: Dict[str, tuple] = {
+    "first_name": (Contact.first_name, str, _TEXT_OPERATORS),
+    "last_name": (Contact.last_name, str, _TEXT_OPERATORS),
+    "email": (Contact.email, str, _TEXT_OPERATORS),
+    "phone": (Contact.phone_e164, _parse_phone, {"eq": _TEXT_OPERATORS["eq"]}),
+    "birthday": (Contact.birthday, date.fromisoformat, _RANGE_OPERATORS),
+    "created": (Contact.created_at, datetime.fromisoformat, _RANGE_OPERATORS),
+}
+
+
+def compile_sort(sort: Optional[str]) -> list:
+    """
+    The compile_sort function turns a sort key into ORDER BY clauses.
+    A leading ``-`` sorts in descending order; the contact id breaks ties so
+    pages don't overlap.
+
+    :param sort: One of SORTS, e.g. ``last_name`` or ``-birthday``
+    :return: A list of ORDER BY clauses, empty without a sort key
+    """
+    if not sort:
+        return []
+    descending = sort.startswith("-")
+    column = SORTS.get(sort.lstrip("-"))
+    if column is None:
+        raise ValueError(f"Unknown sort key '{sort}', use one of: {', '.join(SORTS)}")
+    if descending:
+        return [column.desc(), Contact.id.desc()]
+    return [column, Contact.id]
+
+
+def compile_filter(expression: str) -> object:
+    """
+    The compile_filter function turns a ``field:operator:value`` expression
+    into a condition on Contact, e.g. ``last_name:startswith:Ko`` or
+    ``birthday:gte:1990-01-01``. Only the fields and operators of FILTERS are
+    accepted.
+
+    :param expression: Filter expression
+    :return: A SQLAlchemy condition
+    """
+    field, operator, value = (expression.split(":", 2) + ["", ""])[:3]
+    if field not in FILTERS:
+        raise ValueError(f"Unknown filter field '{field}', use one of: {', '.join(FILTERS)}")
+    column, parse, operators = FILTERS[field]
+    if operator not in operators:
+        raise ValueError(f"Unknown operator '{operator}' for '{field}', use one of: {', '.join(operators)}")
+    if not value:
+        raise ValueError(f"Filter '{expression}' has no value")
+    try:
+        value = parse(value)
+    except ValueError as e:
+        raise ValueError(f"Invalid value in filter '{expression}': {e}")
+    return operators[operator](column, value)
+
+
+def compile_filters(expressions: Optional[Sequence[str]]) -> List:
+    """
+    The compile_filters function compiles a list of filter expressions; all
+    of them must hold.
+
+    :param expressions: Filter expressions
+    :return: A list of SQLAlchemy conditions
+    """
+    return [compile_filter(expression) for expression in expressions or ()]
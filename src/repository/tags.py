@@ -0,0 +1,173 @@
+from typing import List, Optional, Sequence
+
+from sqlalchemy import and_, select, insert, delete, exists, literal
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from fastapi import HTTPException
+from starlette import status
+
+from src.database.models import Contact, ContactTag, Tag, User
+from src.schemas import TagModel
+from src.services.tracing import traced
+
+
+@traced()
+async def get_tags(db: Session, user: User) -> List[Tag]:
+    """
+    The get_tags function returns the tags of a user ordered by name.
+
+    :param db: Access the database
+    :param user: Owner of the tags
+    :return: A list of tags
+    """
+    return db.scalars(select(Tag).where(Tag.user_id == user.id).order_by(Tag.name)).all()
+
+
+@traced()
+async def get_tag(db: Session, user: User, tag_id: int) -> Optional[Tag]:
+    """
+    The get_tag function returns a single tag of a user.
+
+    :param db: Access the database
+    :param user: Owner of the tag
+    :param tag_id: Id of the tag
+    :return: The tag or None
+    """
+    return db.scalars(select(Tag).where(and_(Tag.id == tag_id, Tag.user_id == user.id))).first()
+
+
+@traced()
+async def create_tag(db: Session, user: User, body: TagModel) -> Tag:
+    """
+    The create_tag function creates a tag. Tag names are unique per user.
+
+    :param db: Access the database
+    :param user: Owner of the tag
+    :param body: Name of the tag
+    :return: The created tag
+    """
+    tag = Tag(user_id=user.id, name=body.name)
+    db.add(tag)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Tag already exists")
+    db.refresh(tag)
+    return tag
+
+
+@traced()
+async def delete_tag(db: Session, tag: Tag) -> None:
+    """
+    The delete_tag function deletes a tag; its assignments go with it.
+
+    :param db: Access the database
+    :param tag: The tag to delete
+    :return: None
+    """
+    db.execute(delete(ContactTag).where(and_(ContactTag.user_id == tag.user_id, ContactTag.tag_id == tag.id)))
+    db.execute(delete(Tag).where(Tag.id == tag.id))
+    db.commit()
+
+
+@traced()
+async def assign_tag(db: Session, user: User, tag: Tag, contact_ids: Sequence[int]) -> int:
+    """
+    The assign_tag function tags contacts with one INSERT ... SELECT: ids of
+    other users' contacts and contacts that already have the tag are skipped
+    by the SELECT.
+
+    :param db: Access the database
+    :param user: Owner of the contacts
+    :param tag: The tag to assign
+    :param contact_ids: Ids of the contacts
+    :return: Number of newly tagged contacts
+    """
+    already_tagged = exists().where(and_(ContactTag.user_id == user.id, ContactTag.tag_id == tag.id,
+                                         ContactTag.contact_id == Contact.id))
+    stmt = insert(ContactTag).from_select(
+        ["user_id", "tag_id", "contact_id"],
+        select(literal(user.id), literal(tag.id), Contact.id).where(
+            and_(Contact.user_id == user.id, Contact.id.in_(set(contact_ids)), ~already_tagged)
+        )
+    )
+    count = db.execute(stmt).rowcount
+    db.commit()
+    return count
+
+
+@traced()
+async def unassign_tag(db: Session, user: User, tag: Tag, contact_ids: Sequence[int]) -> int:
+    """
+    The unassign_tag function removes a tag from contacts with one DELETE.
+
+    :param db: Access the database
+    :param user: Owner of the contacts
+    :param tag: The tag to remove
+    :param contact_ids: Ids of the contacts
+    :return: Number of contacts the tag was removed from
+    """
+    count = db.execute(delete(ContactTag).where(and_(
+        ContactTag.user_id == user.id, ContactTag.tag_id == tag.id, ContactTag.contact_id.in_(set(contact_ids))
+    ))).rowcount
+    db.commit()
+    return count
+
+
+def tag_conditions(user_id: int, all_tags: Optional[Sequence[int]] = None,
+                   any_tags: Optional[Sequence[int]] = None) -> list:
+    """
+    The tag_conditions function turns tag filters into conditions on Contact:
+    the contact has every tag of all_tags and at least one tag of any_tags.
+    Every condition is answered from the (user_id, tag_id, contact_id) index.
+
+    :param user_id: Owner of the contacts
+    :param all_tags: Ids of tags the contact must all have
+    :param any_tags: Ids of tags the contact must have at least one of
+    :return: A list of conditions to AND with the query's own
+    """
+    all_tags = list(dict.fromkeys(all_tags or ()))
+    conditions = []
+    if all_tags:
+        # the first tag drives the query as a seek on the tag index, the
+        # others are checked per contact
+        conditions.append(Contact.id.in_(
+            select(ContactTag.contact_id).where(and_(ContactTag.user_id == user_id, ContactTag.tag_id == all_tags[0]))
+        ))
+    conditions.extend(
+        exists().where(and_(ContactTag.user_id == user_id, ContactTag.tag_id == tag_id,
+                            ContactTag.contact_id == Contact.id))
+        for tag_id in all_tags[1:]
+    )
+    if any_tags:
+        conditions.append(Contact.id.in_(
+            select(ContactTag.contact_id).where(and_(ContactTag.user_id == user_id, ContactTag.tag_id.in_(set(any_tags))))
+        ))
+    return conditions
+
+
+@traced()
+async def move_tags(db: Session, user: User, from_ids: Sequence[int], to_id: int) -> None:
+    """
+    The move_tags function gives contact to_id the tags of the contacts
+    from_ids, without committing, so a merge can move tags in its own
+    transaction.
+
+    :param db: Access the database
+    :param user: Owner of the contacts
+    :param from_ids: Ids of the contacts the tags are taken from
+    :param to_id: Id of the contact that gets the tags
+    :return: None
+    """
+    already_tagged = exists().where(and_(ContactTag.user_id == user.id, ContactTag.contact_id == to_id,
+                                         ContactTag.tag_id == Tag.id))
+    db.execute(insert(ContactTag).from_select(
+        ["user_id", "tag_id", "contact_id"],
+        select(literal(user.id), Tag.id, literal(to_id)).where(and_(
+            Tag.user_id == user.id,
+            Tag.id.in_(select(ContactTag.tag_id).where(and_(ContactTag.user_id == user.id,
+                                                            ContactTag.contact_id.in_(from_ids)))),
+            ~already_tagged,
+        ))
+    ))
@@ -1,10 +1,15 @@
 from libgravatar import Gravatar
+from typing import List
+
+from sqlalchemy import delete, select, or_
 from sqlalchemy.orm import Session
 
 from src.database.models import User
 from src.schemas import UserModel
+from src.services.tracing import traced
 
 
+@traced()
 async def get_user_by_email(email: str, db: Session) -> User:
     """
     The get_user_by_email function returns a user object from the database
@@ -17,6 +22,7 @@ async def get_user_by_email(email: str, db: Session) -> User:
     return db.query(User).filter(User.email == email).first()
 
 
+@traced()
 async def create_user(body: UserModel, db: Session) -> User:
     """
     The create_user function creates a new user in the database.
@@ -38,6 +44,7 @@ async def create_user(body: UserModel, db: Session) -> User:
     return new_user
 
 
+@traced()
 async def update_token(user: User, token: str | None, db: Session) -> None:
     """
     The update_token function updates the refresh token for a user.
@@ -50,6 +57,7 @@ async def update_token(user: User, token: str | None, db: Session) -> None:
     user.refresh_token = token
     db.commit()
 
+@traced()
 async def confirmed_email(email: str, db: Session) -> None:
     """
     The confirmed_email function marks a user as confirmed in the database.
@@ -63,6 +71,7 @@ async def confirmed_email(email: str, db: Session) -> None:
     db.commit()
 
 
+@traced()
 async def update_avatar(email, url: str, db: Session) -> User:
     """
     The update_avatar function updates the avatar of a user.
@@ -76,3 +85,79 @@ async def update_avatar(email, url: str, db: Session) -> User:
     user.avatar = url
     db.commit()
     return user
+
+
+@traced()
+async def disable_user(user: User, db: Session) -> None:
+    """
+    The disable_user function marks a user as disabled, so the user can't
+    log in or use issued tokens while the account is being deleted.
+
+    :param user: The user to disable
+    :param db: Commit the changes to the database
+    :return: None
+    """
+    user.disabled = True
+    user.refresh_token = None
+    db.commit()
+
+
+@traced()
+async def delete_user(user_id: int, db: Session) -> None:
+    """
+    The delete_user function deletes the user row with a plain DELETE
+    statement, so the session doesn't load the user's contacts.
+
+    :param user_id: Id of the user to delete
+    :param db: Access the database
+    :return: None
+    """
+    db.execute(delete(User).where(User.id == user_id))
+    db.commit()
+
+
+@traced()
+async def set_birthday_digest(user: User, enabled: bool, db: Session) -> None:
+    """
+    The set_birthday_digest function turns the daily birthday digest email
+    of a user on or off.
+
+    :param user: The user to change
+    :param enabled: Whether the digest is sent
+    :param db: Commit the changes to the database
+    :return: None
+    """
+    user.birthday_digest = enabled
+    db.commit()
+
+
+@traced()
+async def get_active_users(db: Session, after_id: int, limit: int) -> List:
+    """
+    The get_active_users function returns the next chunk of users that are
+    not disabled, in id order, for jobs that walk over all users.
+
+    :param db: Access the database
+    :param after_id: Return users with a greater id
+    :param limit: Maximum number of users
+    :return: A list of rows with id, username, email and birthday_digest
+    """
+    stmt = (select(User.id, User.username, User.email, User.birthday_digest)
+            .where(User.id > after_id, or_(User.disabled.is_(None), User.disabled.is_(False)))
+            .order_by(User.id).limit(limit))
+    return db.execute(stmt).all()
+
+
+@traced()
+async def get_disabled_user_ids(db: Session, after_id: int, limit: int) -> List[int]:
+    """
+    The get_disabled_user_ids function returns the next chunk of ids of
+    disabled users, the accounts whose purge hasn't finished yet.
+
+    :param db: Access the database
+    :param after_id: Return users with a greater id
+    :param limit: Maximum number of users
+    :return: A list of user ids
+    """
+    stmt = select(User.id).where(User.id > after_id, User.disabled.is_(True)).order_by(User.id).limit(limit)
+    return list(db.scalars(stmt))
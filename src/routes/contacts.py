@@ -1,48 +1,325 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Query, BackgroundTasks, Response, Header
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date, timedelta
 from src import schemas
 from src.repository import contacts
+from src.repository import counters
 from src.database.db import get_db
 from src.services.auth import auth_service
+from src.services import serializers
+from src.services.callerid import lookup_caller
+from src.services.phones import normalize_phone
+from src.services.idempotency import run_idempotent
+from src.services.events import publish_contact_events
+from src.services.versions import bump_contacts_version
+from src.services.autocomplete import autocomplete_indexes
+from src.services import dedup
+from src.conf.config import settings
 from src.database.models import User
 from src.repository import contacts
-from fastapi_limiter.depends import RateLimiter
+from src.services.limiter import ResilientRateLimiter
+from src.repository.filters import compile_sort, compile_filters
 
 router = APIRouter()
 
 
-@router.post("/contacts/", response_model=schemas.ContactResponse, status_code=status.HTTP_201_CREATED, description='No more than 10 requests per minute', dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def create_contact(contact: schemas.ContactCreate, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+def _contacts_changed(user_id: int, created=(), updated=(), deleted=(), rebuild: bool = False) -> None:
+    """
+    The _contacts_changed function is called after every committed contact
+    write: it sets a new contacts version, which invalidates cached caller
+    lookups and the autocomplete indexes of other workers, updates the
+    autocomplete index of this worker and publishes the change to the user's
+    event streams.
+
+    :param user_id: Id of the user
+    :param created: Created contacts
+    :param updated: Updated contacts
+    :param deleted: Ids of deleted contacts
+    :param rebuild: The write can't be applied to the index piecewise
+    :return: None
+    """
+    previous, version = bump_contacts_version(user_id)
+    autocomplete_indexes.contacts_changed(user_id, previous, version, upserted=[*created, *updated],
+                                          deleted=deleted, rebuild=rebuild)
+    publish_contact_events(user_id, version, created=created, updated=updated, deleted=deleted, resync=rebuild)
+
+
+def parse_fields(fields: Optional[str] = Query(None, description='Comma separated list of fields to return, e.g. first_name,last_name')) -> Optional[List[str]]:
+    """
+    The parse_fields function turns the ``fields`` query parameter into a list
+    of contact field names, rejecting the ones ContactResponse doesn't have.
+
+    :param fields: Comma separated field names
+    :return: A list of field names or None if all fields are requested
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = sorted(set(names) - set(contacts.CONTACT_FIELDS))
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+IDEMPOTENCY_KEY_DESCRIPTION = 'Unique key of the write; a retry with the same key gets the stored response instead of repeating the write'
+
+
+@router.post("/contacts/", response_model=schemas.ContactResponse, status_code=status.HTTP_201_CREATED, description='No more than 10 requests per minute', dependencies=[Depends(ResilientRateLimiter(times=10, seconds=60))])
+async def create_contact(contact: schemas.ContactCreate, request: Request, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user),
+                         idempotency_key: Optional[str] = Header(None, max_length=255, description=IDEMPOTENCY_KEY_DESCRIPTION)):
     """
     The create_contact function creates a new contact in the database.
 
     :param contact: Get the data from the request body
+    :param request: Incoming request, used for content negotiation
     :param db: Pass the database session to the repository layer
     :param current_user: Get the user that is currently logged in
+    :param idempotency_key: Optional key that makes retries of the request safe
     :return: Created contact object
     """
-    db_contact_by_email = await contacts.get_contact_by_email(db, user=current_user, email=contact.email)
-    db_contact_by_phone = await contacts.get_contact_by_phone(db, user=current_user, phone_number=contact.phone_number)
-    if db_contact_by_email or db_contact_by_phone:
-        raise HTTPException(status_code=400, detail="Email or phone number already registered")
-    return await contacts.create_contact(db=db, user=current_user, contact=contact)
+    async def create():
+        db_contact_by_email = await contacts.get_contact_by_email(db, user=current_user, email=contact.email)
+        db_contact_by_phone = await contacts.get_contact_by_phone(db, user=current_user, phone_number=contact.phone_number)
+        if db_contact_by_email or db_contact_by_phone:
+            raise HTTPException(status_code=400, detail="Email or phone number already registered")
+        db_contact = await contacts.create_contact(db=db, user=current_user, contact=contact)
+        _contacts_changed(current_user.id, created=[db_contact])
+        return schemas.ContactResponse.model_validate(db_contact).model_dump(mode="json")
+
+    return await run_idempotent(request, current_user.id, idempotency_key, contact.model_dump_json().encode(), create,
+                                status_code=status.HTTP_201_CREATED)
+
+
+@router.post("/contacts/bulk", response_model=schemas.ContactOperationsResponse, description='No more than 10 requests per minute', dependencies=[Depends(ResilientRateLimiter(times=10, seconds=60))])
+async def apply_contact_operations(body: schemas.ContactOperations, request: Request, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user),
+                                   idempotency_key: Optional[str] = Header(None, max_length=255, description=IDEMPOTENCY_KEY_DESCRIPTION)):
+    """
+    The apply_contact_operations function applies a list of create, update and
+    delete operations in one transaction, so a device sync is one request.
+
+    :param body: Operations to apply, in order
+    :param request: Incoming request, used for content negotiation
+    :param db: Pass the database session to the repository layer
+    :param current_user: Get the user that is currently logged in
+    :param idempotency_key: Optional key that makes retries of the request safe
+    :return: Per-operation results in the order of the request
+    """
+    if len(body.operations) > settings.contacts_batch_limit:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"No more than {settings.contacts_batch_limit} operations per request")
+
+    async def apply():
+        results = await contacts.apply_contact_operations(db, user=current_user, operations=body.operations)
+        _contacts_changed(current_user.id, rebuild=True)
+        return schemas.ContactOperationsResponse(results=results).model_dump(mode="json")
+
+    return await run_idempotent(request, current_user.id, idempotency_key, body.model_dump_json().encode(), apply)
+
+
+def parse_sort(sort: Optional[str] = Query(None, description='Sort by first_name, last_name, birthday or created; prefix with - for descending order')) -> Optional[str]:
+    """
+    The parse_sort function checks the ``sort`` query parameter.
+
+    :param sort: Sort key
+    :return: The sort key
+    """
+    try:
+        compile_sort(sort)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return sort
+
+
+def parse_filters(filter: Optional[List[str]] = Query(None, description='field:operator:value, e.g. last_name:startswith:Ko or birthday:gte:1990-01-01; text fields take eq, contains and startswith, birthday and created take eq, lt, lte, gt and gte')) -> Optional[List[str]]:
+    """
+    The parse_filters function checks the ``filter`` query parameters.
+
+    :param filter: Filter expressions
+    :return: The filter expressions
+    """
+    try:
+        compile_filters(filter)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return filter
+
+
+TAG_DESCRIPTION = 'Only contacts with all of these tag ids, e.g. tag=1&tag=2'
+ANY_TAG_DESCRIPTION = 'Only contacts with at least one of these tag ids'
 
 
 @router.get("/contacts/", response_model=List[schemas.ContactResponse])
-async def read_contacts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+async def read_contacts(request: Request, skip: int = 0, limit: int = 100, fields: Optional[List[str]] = Depends(parse_fields), tag: Optional[List[int]] = Query(None, description=TAG_DESCRIPTION), any_tag: Optional[List[int]] = Query(None, description=ANY_TAG_DESCRIPTION), sort: Optional[str] = Depends(parse_sort), filters: Optional[List[str]] = Depends(parse_filters), db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
     """
     The read_contacts function returns a list of contacts for the current user.
+    Rows are encoded with orjson, or with MessagePack when the client sends
+    ``Accept: application/x-msgpack``.
 
+    :param request: Negotiate the response encoding
     :param skip: Skip a certain amount of contacts
     :param limit: Limit the number of contacts returned
+    :param fields: Return only these fields (id is always included)
+    :param tag: Only contacts with all of these tags
+    :param any_tag: Only contacts with at least one of these tags
+    :param sort: Sort key
+    :param filters: Filter expressions, all of them must match
     :param db: Pass the database session to the repository layer
     :param current_user: Get the current user from the auth_service
-    :return: A list of contactresponse objects
+    :return: A list of contactresponse objects, with the number of all
+        contacts in X-Total-Count when the list isn't filtered
     """
-    contacts_list = await contacts.get_contacts(db, user=current_user, skip=skip, limit=limit)
-    return contacts_list
+    contacts_list = await contacts.get_contacts_rows(db, user=current_user, skip=skip, limit=limit, fields=fields,
+                                                     all_tags=tag, any_tags=any_tag, sort=sort, filters=filters)
+    headers = None
+    if not (tag or any_tag or filters):
+        headers = {"X-Total-Count": str(await counters.get_total(db, current_user))}
+    return serializers.render(request, contacts_list, headers=headers)
+
+
+async def _read_contacts_batch(request: Request, ids: List[int], fields: Optional[List[str]], db: Session, current_user: User):
+    """
+    The _read_contacts_batch function resolves the ids for both batch routes
+    and reports the ones that were not found.
+
+    :param request: Negotiate the response encoding
+    :param ids: Ids of the contacts to get
+    :param fields: Return only these fields (id is always included)
+    :param db: Pass the database session to the repository layer
+    :param current_user: Get the current user
+    :return: A response with found contacts and missing ids
+    """
+    if len(ids) > settings.contacts_batch_limit:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"No more than {settings.contacts_batch_limit} ids per request")
+    contacts_list = await contacts.get_contacts_by_ids(db, user=current_user, contact_ids=ids, fields=fields)
+    found = {contact['id'] for contact in contacts_list}
+    missing = [contact_id for contact_id in dict.fromkeys(ids) if contact_id not in found]
+    return serializers.render(request, {"contacts": contacts_list, "missing": missing})
+
+
+@router.get("/contacts/batch", response_model=schemas.ContactBatchResponse)
+async def read_contacts_batch(request: Request, ids: List[int] = Query(...), fields: Optional[List[str]] = Depends(parse_fields), db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The read_contacts_batch function returns several contacts by id in one
+    request, e.g. ``/contacts/batch?ids=1&ids=2``.
+
+    :param request: Negotiate the response encoding
+    :param ids: Ids of the contacts to get, in the order they should be returned
+    :param fields: Return only these fields (id is always included)
+    :param db: Pass the database session to the repository layer
+    :param current_user: Get the current user
+    :return: Found contacts in request order and the ids that were not found
+    """
+    return await _read_contacts_batch(request, ids, fields, db, current_user)
+
+
+@router.post("/contacts/batch", response_model=schemas.ContactBatchResponse)
+async def read_contacts_batch_body(request: Request, body: schemas.ContactIds, fields: Optional[List[str]] = Depends(parse_fields), db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The read_contacts_batch_body function is the same as read_contacts_batch,
+    but takes the ids from the request body for lists too long for a URL.
+
+    :param request: Negotiate the response encoding
+    :param body: Ids of the contacts to get
+    :param fields: Return only these fields (id is always included)
+    :param db: Pass the database session to the repository layer
+    :param current_user: Get the current user
+    :return: Found contacts in request order and the ids that were not found
+    """
+    return await _read_contacts_batch(request, body.ids, fields, db, current_user)
+
+
+@router.get("/contacts/stats", response_model=schemas.ContactStats)
+async def read_contact_stats(db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The read_contact_stats function returns the number of contacts of the
+    current user and their birthdays per month, read from the counters the
+    contact writes keep up to date instead of counting the contacts.
+
+    :param db: Pass the database session to the repository layer
+    :param current_user: Get the current user
+    :return: Total and birthdays by month (1-12)
+    """
+    values = await counters.get_counters(db, current_user)
+    return {"total": values.get(counters.TOTAL, 0),
+            "birthdays_by_month": {month: values.get(counters.month_counter(month), 0) for month in range(1, 13)}}
+
+
+@router.get("/contacts/duplicates", response_model=schemas.DuplicatesResponse)
+async def read_duplicates(background_tasks: BackgroundTasks, response: Response, rescan: bool = False, current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The read_duplicates function returns likely duplicate contacts found by
+    the last background scan. When there is no scan yet, or rescan is set,
+    a scan is scheduled and the response is 202 with state "scanning".
+
+    :param background_tasks: Schedule the scan
+    :param response: Set the status code while the scan is running
+    :param rescan: Start a new scan even if there is a result
+    :param current_user: Get the current user
+    :return: Scan state and candidate pairs, best first
+    """
+    result = dedup.get_candidates(current_user.id)
+    if result is None or (rescan and result["state"] != "scanning"):
+        dedup.mark_scanning(current_user.id)
+        background_tasks.add_task(dedup.scan_duplicates, current_user.id)
+        result = {"state": "scanning", "candidates": []}
+    if result["state"] == "scanning":
+        response.status_code = status.HTTP_202_ACCEPTED
+    return result
+
+
+@router.post("/contacts/merge", response_model=schemas.ContactResponse, description='No more than 10 requests per minute', dependencies=[Depends(ResilientRateLimiter(times=10, seconds=60))])
+async def merge_contacts(body: schemas.ContactMerge, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The merge_contacts function merges duplicate contacts into the one with
+    keep_id; the others are deleted in the same transaction.
+
+    :param body: Id of the contact to keep and ids of the ones to merge into it
+    :param db: Pass the database session to the repository layer
+    :param current_user: Get the current user
+    :return: The merged contact
+    """
+    contact = await contacts.merge_contacts(db, user=current_user, keep_id=body.keep_id, merge_ids=body.merge_ids)
+    dedup.forget_contacts(current_user.id, body.merge_ids)
+    _contacts_changed(current_user.id, updated=[contact], deleted=body.merge_ids)
+    return contact
+
+
+@router.get("/contacts/autocomplete", response_model=List[schemas.AutocompleteItem])
+async def autocomplete_contacts(request: Request, prefix: str = Query(..., min_length=1, max_length=100), limit: int = Query(None, ge=1, le=50), db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The autocomplete_contacts function suggests contacts while the user
+    types: contacts whose first name, last name, full name or email starts
+    with prefix, case-insensitively. Suggestions come from an in-memory
+    prefix index of the user's contacts.
+
+    :param request: Negotiate the response encoding
+    :param prefix: Typed text
+    :param limit: Maximum number of suggestions
+    :param db: Pass the database session to build the index
+    :param current_user: Get the current user
+    :return: A list of contacts with id, names and email
+    """
+    index = await autocomplete_indexes.get(db, current_user)
+    return serializers.render(request, index.search(prefix, limit or settings.autocomplete_limit))
+
+
+@router.get("/contacts/lookup", response_model=schemas.ContactResponse)
+async def lookup_contact(phone: str = Query(..., description='Number of the caller in any format, e.g. +380501234567'), db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The lookup_contact function answers "who is calling": it resolves an
+    incoming phone number to a contact of the current user.
+
+    :param phone: Number of the caller
+    :param db: Pass the database session to the repository layer
+    :param current_user: Get the current user
+    :return: The contact with this number
+    """
+    contact = await lookup_caller(db, user=current_user, phone=phone)
+    if contact is None:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    return contact
 
 
 @router.get("/contacts/{contact_id}", response_model=schemas.ContactResponse)
@@ -63,9 +340,13 @@ async def read_contact(contact_id: int, db: Session = Depends(get_db), current_u
 
 @router.get("/contacts/search/", response_model=List[schemas.ContactResponse])
 async def search_contacts(
+    request: Request,
     first_name: Optional[str] = None,
     last_name: Optional[str] = None,
     email: Optional[str] = None,
+    fields: Optional[List[str]] = Depends(parse_fields),
+    tag: Optional[List[int]] = Query(None, description=TAG_DESCRIPTION),
+    any_tag: Optional[List[int]] = Query(None, description=ANY_TAG_DESCRIPTION),
     db: Session = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user)
 ):
@@ -76,28 +357,38 @@ async def search_contacts(
     :param first_name: Specify that the first_name parameter is optional
     :param last_name: Get the last_name from the query string
     :param email: Search for a contact by email
+    :param request: Negotiate the response encoding
+    :param fields: Return only these fields (id is always included)
+    :param tag: Only contacts with all of these tags
+    :param any_tag: Only contacts with at least one of these tags
     :param db: Pass the database session to the function
     :param current_user: Get the current user
     :return: A list of contactresponse objects, depending on the query parameters
     """
-    contacts_list = await contacts.search_contacts(db, user=current_user, first_name=first_name, last_name=last_name, email=email)
+    contacts_list = await contacts.search_contacts(db, user=current_user, first_name=first_name, last_name=last_name, email=email, fields=fields,
+                                                   all_tags=tag, any_tags=any_tag)
+    if fields:
+        return serializers.render(request, contacts_list)
     return contacts_list
 
 
 @router.get("/contacts/birthdays/", response_model=List[schemas.ContactResponse])
-async def get_upcoming_birthdays(db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+async def get_upcoming_birthdays(request: Request, fields: Optional[List[str]] = Depends(parse_fields), db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
     """
     The get_upcoming_birthdays function returns a list of contacts that have birthdays
-    in the current week.
+    in the current week, soonest first. They are read from the upcoming_birthdays
+    table kept by src.services.birthdays.
 
+    :param request: Negotiate the response encoding
+    :param fields: Return only these fields (id is always included)
     :param db: Pass the database connection to the repository layer
     :param current_user: Get the current user
     :return: A list of contactresponse objects
     """
     today = date.today()
-    week_later = today + timedelta(days=7)
-    contacts_list = await contacts.get_contacts_by_birthday(db, user=current_user, start_date=today, end_date=week_later)
-    return contacts_list
+    week_later = today + timedelta(days=settings.birthdays_window_days)
+    contacts_list = await contacts.get_upcoming_birthdays(db, user=current_user, start_date=today, end_date=week_later, fields=fields)
+    return serializers.render(request, contacts_list)
 
 
 
@@ -119,11 +410,15 @@ async def update_contact(contact_id: int, contact: schemas.ContactUpdate, db: Se
         db_duplicate_email = await contacts.get_contact_by_email(db, user=current_user, email=contact.email)
         if db_duplicate_email:
             raise HTTPException(status_code=400, detail="Email already registered")
-    if contact.phone_number and contact.phone_number != db_contact.phone_number:
+    # "+380 50 123 4567" and "0501234567" are the same number, and the lookup finds the contact itself
+    if contact.phone_number and (normalize_phone(contact.phone_number) or contact.phone_number) != \
+            (normalize_phone(db_contact.phone_number) or db_contact.phone_number):
         db_duplicate_phone = await contacts.get_contact_by_phone(db, user=current_user, phone_number=contact.phone_number)
-        if db_duplicate_phone:
+        if db_duplicate_phone and db_duplicate_phone.id != db_contact.id:
             raise HTTPException(status_code=400, detail="Phone number already registered")
-    return await contacts.update_contact(db=db, user=current_user, db_contact=db_contact, contact=contact)
+    db_contact = await contacts.update_contact(db=db, user=current_user, db_contact=db_contact, contact=contact)
+    _contacts_changed(current_user.id, updated=[db_contact])
+    return db_contact
 
 
 
@@ -140,4 +435,6 @@ async def delete_contact(contact_id: int, db: Session = Depends(get_db), current
     db_contact = await contacts.get_contact(db, user=current_user, contact_id=contact_id)
     if db_contact is None:
         raise HTTPException(status_code=404, detail="Contact not found")
-    return await contacts.delete_contact(db=db, user=current_user,contact_id=contact_id) 
\ No newline at end of file
+    result = await contacts.delete_contact(db=db, user=current_user,contact_id=contact_id)
+    _contacts_changed(current_user.id, deleted=[contact_id])
+    return result
@@ -0,0 +1,96 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Depends, status, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from src.conf.config import settings
+from src.database.db import SessionLocal
+from src.database.models import User
+from src.services.auth import auth_service
+from src.services.events import PING, TooManyConnections, event_broker
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+
+async def _authenticate(token: str) -> User:
+    """
+    The _authenticate function resolves the user of an event stream with a
+    session of its own: a stream stays open for hours and must not hold a
+    database connection all that time.
+
+    :param token: Access token
+    :return: The user
+    """
+    with SessionLocal() as db:
+        return await auth_service.get_current_user(token, db)
+
+
+async def _subscribe(user: User) -> asyncio.Queue:
+    try:
+        return await event_broker.subscribe(user.id)
+    except (TooManyConnections, ConnectionError):
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Contact events are not available, try again later",
+                            headers={"Retry-After": "5"})
+
+
+async def _next_event(queue: asyncio.Queue) -> str:
+    try:
+        return await asyncio.wait_for(queue.get(), settings.events_heartbeat)
+    except asyncio.TimeoutError:
+        return PING
+
+
+@router.get("/", description='Server-sent events of contact changes: created, updated, deleted, resync and ping')
+async def contact_events(token: str = Depends(auth_service.oauth2_scheme)):
+    """
+    The contact_events function streams the contact changes of the current
+    user as server-sent events. A ping is sent after events_heartbeat idle
+    seconds, which also notices clients that went away.
+
+    :param token: Access token from the authorization header
+    :return: An event stream
+    """
+    user = await _authenticate(token)
+    queue = await _subscribe(user)
+
+    async def stream():
+        try:
+            while True:
+                yield f"data: {await _next_event(queue)}\n\n"
+        finally:
+            await event_broker.unsubscribe(user.id, queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.websocket("/ws")
+async def contact_events_ws(websocket: WebSocket, token: str = Query(...)):
+    """
+    The contact_events_ws function sends the same events as contact_events
+    over a WebSocket. Browsers can't set headers on a WebSocket, so the
+    access token is passed in the query string.
+
+    :param websocket: The connection
+    :param token: Access token
+    :return: None
+    """
+    try:
+        user = await _authenticate(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    try:
+        queue = await event_broker.subscribe(user.id)
+    except (TooManyConnections, ConnectionError):
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+    try:
+        await websocket.accept()
+        while True:
+            await websocket.send_text(await _next_event(queue))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await event_broker.unsubscribe(user.id, queue)
@@ -0,0 +1,101 @@
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Depends, status, Query
+from sqlalchemy.orm import Session
+
+from src import schemas
+from src.database.db import get_db
+from src.database.models import User
+from src.repository import tags as repository_tags
+from src.services.auth import auth_service
+from src.conf.config import settings
+
+router = APIRouter(prefix="/tags", tags=["tags"])
+
+
+async def _get_tag(tag_id: int, db: Session, current_user: User):
+    tag = await repository_tags.get_tag(db, user=current_user, tag_id=tag_id)
+    if tag is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
+    return tag
+
+
+def _check_batch(contact_ids: List[int]) -> None:
+    if len(contact_ids) > settings.contacts_batch_limit:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"No more than {settings.contacts_batch_limit} ids per request")
+
+
+@router.get("/", response_model=List[schemas.TagResponse])
+async def read_tags(db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The read_tags function returns the tags of the current user.
+
+    :param db: Pass the database session to the repository layer
+    :param current_user: Get the current user
+    :return: A list of tags ordered by name
+    """
+    return await repository_tags.get_tags(db, user=current_user)
+
+
+@router.post("/", response_model=schemas.TagResponse, status_code=status.HTTP_201_CREATED)
+async def create_tag(body: schemas.TagModel, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The create_tag function creates a tag for grouping contacts.
+
+    :param body: Name of the tag
+    :param db: Pass the database session to the repository layer
+    :param current_user: Get the current user
+    :return: The created tag
+    """
+    return await repository_tags.create_tag(db, user=current_user, body=body)
+
+
+@router.delete("/{tag_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_tag(tag_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The delete_tag function deletes a tag and removes it from all contacts.
+
+    :param tag_id: Id of the tag
+    :param db: Pass the database session to the repository layer
+    :param current_user: Get the current user
+    :return: None
+    """
+    tag = await _get_tag(tag_id, db, current_user)
+    await repository_tags.delete_tag(db, tag)
+
+
+@router.post("/{tag_id}/contacts", response_model=schemas.TagAssignmentResponse)
+async def assign_tag(tag_id: int, body: schemas.ContactIds, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The assign_tag function adds a tag to many contacts in one statement.
+    Unknown ids and contacts that already have the tag are skipped.
+
+    :param tag_id: Id of the tag
+    :param body: Ids of the contacts
+    :param db: Pass the database session to the repository layer
+    :param current_user: Get the current user
+    :return: The number of newly tagged contacts
+    """
+    _check_batch(body.ids)
+    tag = await _get_tag(tag_id, db, current_user)
+    count = await repository_tags.assign_tag(db, user=current_user, tag=tag, contact_ids=body.ids)
+    return {"tag_id": tag.id, "count": count}
+
+
+@router.delete("/{tag_id}/contacts", response_model=schemas.TagAssignmentResponse)
+async def unassign_tag(tag_id: int, ids: List[int] = Query(...), db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The unassign_tag function removes a tag from contacts, e.g.
+    ``DELETE /tags/1/contacts?ids=2&ids=3``.
+
+    :param tag_id: Id of the tag
+    :param ids: Ids of the contacts
+    :param db: Pass the database session to the repository layer
+    :param current_user: Get the current user
+    :return: The number of contacts the tag was removed from
+    """
+    _check_batch(ids)
+    tag = await _get_tag(tag_id, db, current_user)
+    count = await repository_tags.unassign_tag(db, user=current_user, tag=tag, contact_ids=ids)
+    return {"tag_id": tag.id, "count": count}
@@ -1,14 +1,14 @@
-from fastapi import APIRouter, Depends, status, UploadFile, File
+from fastapi import APIRouter, Depends, status, UploadFile, File, BackgroundTasks
 from sqlalchemy.orm import Session
-import cloudinary
-import cloudinary.uploader
 
 from src.database.db import get_db
 from src.database.models import User
 from src.repository import users as repository_users
 from src.services.auth import auth_service
+from src.services.purge import purge_user
+from src.services.tracing import tracer
 from src.conf.config import settings
-from src.schemas import UserDb
+from src.schemas import UserDb, BirthdayDigest
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -24,6 +24,44 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
     return current_user
 
 
+@router.delete("/me/", status_code=status.HTTP_202_ACCEPTED)
+async def delete_users_me(background_tasks: BackgroundTasks, current_user: User = Depends(auth_service.get_current_user),
+                          db: Session = Depends(get_db)):
+    """
+    The delete_users_me function deletes the current user's account.
+    The account is disabled right away and its contacts are purged in batches
+    by a background task, so large accounts don't lock the contacts table.
+
+    :param background_tasks: Add the purge task to the background tasks queue
+    :param current_user: Get the current user
+    :param db: Pass the database session to the repository layer
+    :return: A dictionary with a message
+    """
+    user = await repository_users.get_user_by_email(current_user.email, db)
+    await repository_users.disable_user(user, db)
+    auth_service.cache_delete(f"user:{user.email}")
+    background_tasks.add_task(purge_user, user.id)
+    return {"message": "Account disabled, contacts are being deleted"}
+
+
+@router.put("/me/birthday_digest", response_model=BirthdayDigest)
+async def update_birthday_digest(body: BirthdayDigest, current_user: User = Depends(auth_service.get_current_user),
+                                 db: Session = Depends(get_db)):
+    """
+    The update_birthday_digest function turns the daily email with upcoming
+    birthdays of the user's contacts on or off.
+
+    :param body: Whether the digest is sent
+    :param current_user: Get the current user
+    :param db: Pass the database session to the repository layer
+    :return: The new setting
+    """
+    user = await repository_users.get_user_by_email(current_user.email, db)
+    await repository_users.set_birthday_digest(user, body.enabled, db)
+    auth_service.cache_delete(f"user:{user.email}")
+    return body
+
+
 @router.patch('/avatar', response_model=UserDb)
 async def update_avatar_user(file: UploadFile = File(), current_user: User = Depends(auth_service.get_current_user),
                              db: Session = Depends(get_db)):
@@ -35,6 +73,10 @@ async def update_avatar_user(file: UploadFile = File(), current_user: User = Dep
     :param db: Pass the database session to the repository layer
     :return: The user object with updated avatar
     """
+    # imported here, avatar uploads are rare and cloudinary is slow to import
+    import cloudinary
+    import cloudinary.uploader
+
     cloudinary.config(
         cloud_name=settings.cloudinary_name,
         api_key=settings.cloudinary_api_key,
@@ -42,7 +84,8 @@ async def update_avatar_user(file: UploadFile = File(), current_user: User = Dep
         secure=True
     )
 
-    r = cloudinary.uploader.upload(file.file, public_id=f'NotesApp/{current_user.username}', overwrite=True)
+    with tracer.start_as_current_span("cloudinary upload"):
+        r = cloudinary.uploader.upload(file.file, public_id=f'NotesApp/{current_user.username}', overwrite=True)
     src_url = cloudinary.CloudinaryImage(f'NotesApp/{current_user.username}')\
                         .build_url(width=250, height=250, crop='fill', version=r.get('version'))
     user = await repository_users.update_avatar(current_user.email, src_url, db)
@@ -1,13 +1,13 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, model_validator
 from datetime import date, datetime
-from typing import Optional
+from typing import Dict, List, Literal, Optional
 
 
 class ContactBase(BaseModel):
     first_name: str = Field(min_length=1, max_length=50)
     last_name: str = Field(min_length=1, max_length=50)
     email: EmailStr
-    phone_number: str = Field(min_length=10, max_length=15)
+    phone_number: str = Field(min_length=10, max_length=20)
     birthday: date
     
 
@@ -27,6 +27,89 @@ class ContactResponse(ContactBase):
         from_attributes = True
 
 
+class ContactIds(BaseModel):
+    ids: List[int] = Field(min_length=1)
+
+
+class ContactBatchResponse(BaseModel):
+    contacts: List[ContactResponse]
+    missing: List[int]
+
+
+class ContactOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[int] = None
+    contact: Optional[ContactCreate] = None
+
+    @model_validator(mode="after")
+    def check_arguments(self):
+        if self.op != "create" and self.id is None:
+            raise ValueError(f"'{self.op}' operation requires id")
+        if self.op != "delete" and self.contact is None:
+            raise ValueError(f"'{self.op}' operation requires contact")
+        return self
+
+
+class ContactOperations(BaseModel):
+    operations: List[ContactOperation] = Field(min_length=1)
+
+
+class ContactOperationResult(BaseModel):
+    index: int
+    op: str
+    id: Optional[int] = None
+    status: int
+    detail: Optional[str] = None
+
+
+class ContactOperationsResponse(BaseModel):
+    results: List[ContactOperationResult]
+
+
+class TagModel(BaseModel):
+    name: str = Field(min_length=1, max_length=50)
+
+
+class TagResponse(TagModel):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+
+class TagAssignmentResponse(BaseModel):
+    tag_id: int
+    count: int
+
+
+class AutocompleteItem(BaseModel):
+    id: int
+    first_name: str
+    last_name: str
+    email: str
+
+
+class DuplicateCandidate(BaseModel):
+    ids: List[int]
+    score: float
+    reasons: List[str]
+
+
+class DuplicatesResponse(BaseModel):
+    state: str
+    candidates: List[DuplicateCandidate]
+
+
+class ContactStats(BaseModel):
+    total: int
+    birthdays_by_month: Dict[int, int]
+
+
+class ContactMerge(BaseModel):
+    keep_id: int
+    merge_ids: List[int] = Field(min_length=1)
+
+
 class UserModel(BaseModel):
     username: str = Field(min_length=5, max_length=16)
     email: str
@@ -49,6 +132,10 @@ class UserResponse(BaseModel):
     detail: str = "User successfully created"
 
 
+class BirthdayDigest(BaseModel):
+    enabled: bool
+
+
 class TokenModel(BaseModel):
     access_token: str
     refresh_token: str
@@ -1,4 +1,5 @@
 from typing import Optional
+import asyncio
 import pickle
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
@@ -11,6 +12,9 @@ from src.conf.config import settings
 
 from src.database.db import get_db
 from src.repository import users as repository_users
+from src.services.tracing import traced, tracer
+from src.services.breaker import redis_breaker
+from src.services.singleflight import SingleFlight
 
 
 
@@ -22,8 +26,165 @@ class Auth:
     SECRET_KEY = settings.secret_key
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    r = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
+    user_loads = SingleFlight()
+    _redis = None
 
+    @property
+    def r(self) -> redis.Redis:
+        """
+        The r property returns the Redis client of the user cache, creating
+        it on first use instead of when the module is imported.
+
+        :param self: Represent the instance of the class
+        :return: A Redis client
+        """
+        if self._redis is None:
+            self._redis = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0,
+                                      socket_timeout=settings.redis_socket_timeout,
+                                      socket_connect_timeout=settings.redis_connect_timeout)
+        return self._redis
+
+    @r.setter
+    def r(self, client: redis.Redis) -> None:
+        self._redis = client
+
+    def close(self) -> None:
+        """
+        The close function closes the Redis connection pool of the user cache.
+
+        :param self: Represent the instance of the class
+        :return: None
+        """
+        if self._redis is not None:
+            self._redis.close()
+            self._redis = None
+
+    def cache_get(self, key: str) -> Optional[bytes]:
+        """
+        The cache_get function reads a key from Redis through the circuit
+        breaker. A Redis error or an open breaker counts as a cache miss.
+
+        :param self: Represent the instance of the class
+        :param key: Redis key
+        :return: The cached value or None
+        """
+        if not redis_breaker.allow():
+            return None
+        try:
+            with tracer.start_as_current_span("redis GET"):
+                value = self.r.get(key)
+        except redis.RedisError:
+            redis_breaker.record_failure()
+            return None
+        redis_breaker.record_success()
+        return value
+
+    def cache_set(self, key: str, value: bytes, ttl: int) -> None:
+        """
+        The cache_set function stores a key in Redis through the circuit
+        breaker. A failed write is skipped, the value is just not cached.
+
+        :param self: Represent the instance of the class
+        :param key: Redis key
+        :param value: Value to store
+        :param ttl: Time to live in seconds
+        :return: None
+        """
+        if not redis_breaker.allow():
+            return
+        try:
+            with tracer.start_as_current_span("redis SET"):
+                self.r.set(key, value, ex=ttl)
+        except redis.RedisError:
+            redis_breaker.record_failure()
+            return
+        redis_breaker.record_success()
+
+    def cache_swap(self, key: str, value: bytes, ttl: int) -> Optional[bytes]:
+        """
+        The cache_swap function stores a key in Redis and returns its previous
+        value in one atomic step (SET GET) through the circuit breaker.
+
+        :param self: Represent the instance of the class
+        :param key: Redis key
+        :param value: Value to store
+        :param ttl: Time to live in seconds
+        :return: The previous value, None if there was none or Redis failed
+        """
+        if not redis_breaker.allow():
+            return None
+        try:
+            with tracer.start_as_current_span("redis SET GET"):
+                previous = self.r.set(key, value, ex=ttl, get=True)
+        except redis.RedisError:
+            redis_breaker.record_failure()
+            return None
+        redis_breaker.record_success()
+        return previous
+
+    def cache_lock(self, key: str, ttl: int) -> bool:
+        """
+        The cache_lock function takes a short-lived lock in Redis (SET NX PX)
+        so only one worker loads a missing cache entry. If Redis can't be
+        used the lock is treated as taken by us, every worker loads for itself.
+
+        :param self: Represent the instance of the class
+        :param key: Lock key
+        :param ttl: Lock lifetime in milliseconds
+        :return: True if this worker should load the value
+        """
+        if not redis_breaker.allow():
+            return True
+        try:
+            with tracer.start_as_current_span("redis SET NX"):
+                acquired = self.r.set(key, 1, nx=True, px=ttl)
+        except redis.RedisError:
+            redis_breaker.record_failure()
+            return True
+        redis_breaker.record_success()
+        return bool(acquired)
+
+    def cache_delete(self, key: str) -> None:
+        """
+        The cache_delete function removes a key from Redis through the
+        circuit breaker.
+
+        :param self: Represent the instance of the class
+        :param key: Redis key
+        :return: None
+        """
+        if not redis_breaker.allow():
+            return
+        try:
+            with tracer.start_as_current_span("redis DEL"):
+                self.r.delete(key)
+        except redis.RedisError:
+            redis_breaker.record_failure()
+            return
+        redis_breaker.record_success()
+
+    def publish(self, channel: str, message: bytes) -> None:
+        """
+        The publish function sends a message to a Redis pub/sub channel
+        through the circuit breaker. A failed publish is skipped, subscribers
+        just miss the message.
+
+        :param self: Represent the instance of the class
+        :param channel: Channel name
+        :param message: Message to send
+        :return: None
+        """
+        if not redis_breaker.allow():
+            return
+        try:
+            with tracer.start_as_current_span("redis PUBLISH"):
+                self.r.publish(channel, message)
+        except redis.RedisError:
+            redis_breaker.record_failure()
+            return
+        redis_breaker.record_success()
+
+    @traced("auth.verify_password")
     def verify_password(self, plain_password, hashed_password):
         """
         The verify_password function takes a plain-text password and a hashed
@@ -37,6 +198,7 @@ class Auth:
         """
         return self.pwd_context.verify(plain_password, hashed_password)
 
+    @traced("auth.get_password_hash")
     def get_password_hash(self, password: str):
         """
         The get_password_hash function takes a password as input and returns
@@ -120,6 +282,37 @@ class Auth:
 
 
 
+    async def load_user(self, email: str, db: Session):
+        """
+        The load_user function loads a user missing from the cache and caches
+        it. With singleflight_redis_lock only one worker loads a given user at
+        a time, the others wait for it to appear in the cache and load it
+        themselves only if it doesn't show up in time.
+
+        :param self: Represent the instance of the class
+        :param email: Email of the user
+        :param db: Pass the database session to the function
+        :return: The user object or None
+        """
+        key = f"user:{email}"
+        locked = settings.singleflight_redis_lock
+        if locked and not self.cache_lock(f"lock:{key}", settings.singleflight_lock_ttl):
+            deadline = asyncio.get_running_loop().time() + settings.singleflight_wait
+            while asyncio.get_running_loop().time() < deadline:
+                await asyncio.sleep(settings.singleflight_poll_interval)
+                user = self.cache_get(key)
+                if user is not None:
+                    return pickle.loads(user)
+            locked = False
+        try:
+            user = await repository_users.get_user_by_email(email, db)
+            if user is not None:
+                self.cache_set(key, pickle.dumps(user), 900)
+            return user
+        finally:
+            if locked:
+                self.cache_delete(f"lock:{key}")
+
     async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
         """
         The get_current_user is function to get user from token
@@ -146,15 +339,16 @@ class Auth:
                 raise credentials_exception
         except JWTError as e:
             raise credentials_exception
-        user = self.r.get(f"user:{email}")
+        user = self.cache_get(f"user:{email}")
         if user is None:
-            user = await repository_users.get_user_by_email(email, db)
+            # concurrent misses for the same user share one load
+            user = await self.user_loads.do(email, lambda: self.load_user(email, db))
             if user is None:
                 raise credentials_exception
-            self.r.set(f"user:{email}", pickle.dumps(user))
-            self.r.expire(f"user:{email}", 900)
         else:
             user = pickle.loads(user)
+        if user.disabled:
+            raise credentials_exception
         return user
 
 
@@ -0,0 +1,189 @@
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from src.conf.config import settings
+from src.database.models import User
+from src.repository import contacts as repository_contacts
+from src.services.singleflight import SingleFlight
+from src.services.versions import contacts_version
+
+AUTOCOMPLETE_FIELDS = ("id", "first_name", "last_name", "email")
+
+
+def contact_terms(first_name: Optional[str], last_name: Optional[str], email: Optional[str]) -> set:
+    """
+    The contact_terms function lists the lowercased strings a contact can be
+    found by: first name, last name, full name and email.
+
+    :param first_name: First name of the contact
+    :param last_name: Last name of the contact
+    :param email: Email of the contact
+    :return: A set of terms
+    """
+    first_name = (first_name or "").lower()
+    last_name = (last_name or "").lower()
+    terms = {first_name, last_name, f"{first_name} {last_name}".strip(), (email or "").lower()}
+    terms.discard("")
+    return terms
+
+
+class PrefixIndex:
+    """
+    The PrefixIndex class is a sorted array of (term, contact id) pairs of one
+    user; a prefix search is a binary search for the first term with the
+    prefix followed by a scan over the terms that still start with it.
+    """
+
+    def __init__(self, version: Optional[bytes] = None):
+        self.version = version
+        self.terms: List[str] = []
+        self.ids: List[int] = []
+        self.contacts = {}
+
+    @classmethod
+    def build(cls, contacts: Iterable, version: Optional[bytes] = None) -> "PrefixIndex":
+        """
+        The build function creates the index of a user's contacts with a
+        single sort.
+
+        :param contacts: Rows with id, first_name, last_name and email
+        :param version: Contacts version the rows were read at
+        :return: A PrefixIndex
+        """
+        index = cls(version)
+        pairs = []
+        for contact in contacts:
+            index.contacts[contact.id] = {field: getattr(contact, field) for field in AUTOCOMPLETE_FIELDS}
+            terms = contact_terms(contact.first_name, contact.last_name, contact.email)
+            pairs.extend((term, contact.id) for term in terms)
+        pairs.sort()
+        index.terms = [term for term, _ in pairs]
+        index.ids = [contact_id for _, contact_id in pairs]
+        return index
+
+    def add(self, contact) -> None:
+        """
+        The add function indexes a new contact or re-indexes a changed one.
+
+        :param contact: A contact or a row with id, first_name, last_name and email
+        :return: None
+        """
+        self.remove(contact.id)
+        self.contacts[contact.id] = {field: getattr(contact, field) for field in AUTOCOMPLETE_FIELDS}
+        for term in contact_terms(contact.first_name, contact.last_name, contact.email):
+            position = bisect_left(self.terms, term)
+            while position < len(self.terms) and self.terms[position] == term and self.ids[position] < contact.id:
+                position += 1
+            self.terms.insert(position, term)
+            self.ids.insert(position, contact.id)
+
+    def remove(self, contact_id: int) -> None:
+        """
+        The remove function drops a contact from the index.
+
+        :param contact_id: Id of the contact
+        :return: None
+        """
+        contact = self.contacts.pop(contact_id, None)
+        if contact is None:
+            return
+        for term in contact_terms(contact["first_name"], contact["last_name"], contact["email"]):
+            position = bisect_left(self.terms, term)
+            while position < len(self.terms) and self.terms[position] == term:
+                if self.ids[position] == contact_id:
+                    del self.terms[position]
+                    del self.ids[position]
+                    break
+                position += 1
+
+    def search(self, prefix: str, limit: int) -> List[dict]:
+        """
+        The search function returns up to limit contacts with a term starting
+        with prefix, in the alphabetical order of the matching terms.
+
+        :param prefix: Typed text
+        :param limit: Maximum number of contacts
+        :return: A list of dicts with id, first_name, last_name and email
+        """
+        prefix = prefix.lower()
+        found = {}
+        position = bisect_left(self.terms, prefix)
+        while position < len(self.terms) and len(found) < limit and self.terms[position].startswith(prefix):
+            contact_id = self.ids[position]
+            if contact_id not in found:
+                found[contact_id] = self.contacts[contact_id]
+            position += 1
+        return list(found.values())
+
+
+class AutocompleteIndexes:
+    """
+    The AutocompleteIndexes class keeps the prefix indexes of the most
+    recently active users, at most max_users of them. An index is built on
+    the first search of a user and rebuilt when the user's contacts version
+    shows a write that this worker didn't apply.
+    """
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self.indexes = OrderedDict()
+        self.builds = SingleFlight()
+
+    async def get(self, db: Session, user: User) -> PrefixIndex:
+        """
+        The get function returns the current index of a user, building it if
+        needed. Concurrent searches of a user share one build.
+
+        :param db: Access the database when the index is built
+        :param user: Owner of the contacts
+        :return: A PrefixIndex
+        """
+        version = contacts_version(user.id)
+        index = self.indexes.get(user.id)
+        if index is not None and (version is None or index.version == version):
+            self.indexes.move_to_end(user.id)
+            return index
+        return await self.builds.do(user.id, lambda: self._build(db, user.id, version))
+
+    async def _build(self, db: Session, user_id: int, version: Optional[bytes]) -> PrefixIndex:
+        rows = await repository_contacts.get_contacts_for_autocomplete(db, user_id)
+        index = PrefixIndex.build(rows, version)
+        self.indexes[user_id] = index
+        self.indexes.move_to_end(user_id)
+        while len(self.indexes) > self.max_users:
+            self.indexes.popitem(last=False)
+        return index
+
+    def contacts_changed(self, user_id: int, previous: Optional[bytes], version: bytes,
+                         upserted: Iterable = (), deleted: Iterable[int] = (), rebuild: bool = False) -> None:
+        """
+        The contacts_changed function applies a write to the user's index in
+        this worker. If the index missed an earlier write (its version isn't
+        the previous one) or the change can't be applied piecewise, the index
+        is dropped and built again on the next search.
+
+        :param user_id: Id of the user
+        :param previous: Contacts version before the write
+        :param version: Contacts version after the write
+        :param upserted: Created or updated contacts
+        :param deleted: Ids of deleted contacts
+        :param rebuild: Drop the index instead of updating it
+        :return: None
+        """
+        index = self.indexes.get(user_id)
+        if index is None:
+            return
+        if rebuild or index.version != previous:
+            del self.indexes[user_id]
+            return
+        for contact_id in deleted:
+            index.remove(contact_id)
+        for contact in upserted:
+            index.add(contact)
+        index.version = version
+
+
+autocomplete_indexes = AutocompleteIndexes(settings.autocomplete_max_users)
@@ -0,0 +1,98 @@
+"""
+Daily refresh of the upcoming_birthdays table and the birthday digest emails.
+
+Run it once a day, e.g. from cron shortly after midnight::
+
+    python -m src.services.birthdays --digest
+"""
+import argparse
+import asyncio
+import logging
+from datetime import date, timedelta
+
+from src.conf.config import settings
+from src.database.db import SessionLocal
+from src.repository import contacts as repository_contacts
+from src.repository import users as repository_users
+from src.services.email import send_birthday_digest
+
+logger = logging.getLogger(__name__)
+
+
+async def send_digests(users: list, digests: dict) -> int:
+    """
+    The send_digests function sends the digest emails of a chunk of users,
+    at most birthdays_digest_concurrency at a time. A failed email is logged
+    and doesn't stop the emails of the other users.
+
+    :param users: Rows with id, username, email and birthday_digest
+    :param digests: Upcoming birthdays by user id
+    :return: Number of sent emails
+    """
+    semaphore = asyncio.Semaphore(settings.birthdays_digest_concurrency)
+
+    async def send(user) -> bool:
+        async with semaphore:
+            try:
+                await send_birthday_digest(user.email, user.username, digests[user.id])
+            except Exception:
+                logger.exception("birthday digest to user %s failed", user.id)
+                return False
+            return True
+
+    recipients = [user for user in users if user.birthday_digest and digests.get(user.id)]
+    return sum(await asyncio.gather(*(send(user) for user in recipients)))
+
+
+async def refresh_birthdays(today: date = None, digest: bool = None, chunk_size: int = None) -> dict:
+    """
+    The refresh_birthdays function rebuilds the upcoming birthdays of all
+    users that are not disabled, a chunk of users at a time, and sends the
+    digest emails of each chunk before moving on, so memory use doesn't
+    grow with the number of users.
+
+    :param today: First day of the window, today by default
+    :param digest: Send digest emails to users who asked for them
+    :param chunk_size: Users per chunk
+    :return: Counts of users, stored birthdays and sent emails
+    """
+    today = today or date.today()
+    digest = settings.birthdays_digest_enabled if digest is None else digest
+    chunk_size = chunk_size or settings.birthdays_chunk_size
+    end = today + timedelta(days=settings.birthdays_window_days)
+    totals = {"users": 0, "birthdays": 0, "emails": 0}
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            users = await repository_users.get_active_users(db, after_id=last_id, limit=chunk_size)
+            if not users:
+                break
+            user_ids = [user.id for user in users]
+            totals["users"] += len(users)
+            totals["birthdays"] += await repository_contacts.refresh_upcoming_birthdays(
+                db, user_ids, today, settings.birthdays_window_days)
+            if digest and any(user.birthday_digest for user in users):
+                digests = await repository_contacts.get_digest_birthdays(db, user_ids, today, end)
+                totals["emails"] += await send_digests(users, digests)
+            last_id = user_ids[-1]
+            logger.info("birthdays refreshed up to user %s: %s", last_id, totals)
+    finally:
+        db.close()
+    return totals
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--date", type=date.fromisoformat, help="First day of the window, today by default")
+    parser.add_argument("--digest", action=argparse.BooleanOptionalAction, default=None,
+                        help="Send digest emails (birthdays_digest_enabled by default)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    totals = asyncio.run(refresh_birthdays(today=args.date, digest=args.digest))
+    print(totals)
+    return totals
+
+
+if __name__ == "__main__":
+    main()
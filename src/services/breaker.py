@@ -0,0 +1,62 @@
+import time
+
+from src.conf.config import settings
+from src.services.metrics import BREAKER_FAILURES, BREAKER_STATE
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+
+class CircuitBreaker:
+    """
+    The CircuitBreaker class stops calls to a failing dependency for a while,
+    so requests take their fallback path right away instead of waiting for
+    timeouts.
+    After failure_threshold consecutive failures the breaker opens. Once
+    reset_timeout seconds have passed, one trial call is let through
+    (half open). If it succeeds the breaker closes, otherwise it opens again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self._set_state(CLOSED)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        BREAKER_STATE.labels(self.name).set(_STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        """
+        The allow function tells whether the protected call may be made now.
+
+        :return: False while the breaker is open
+        """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._set_state(HALF_OPEN)
+            self.trial_running = False
+        if self.state == HALF_OPEN and not self.trial_running:
+            self.trial_running = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        BREAKER_FAILURES.labels(self.name).inc()
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+
+redis_breaker = CircuitBreaker("redis", settings.redis_breaker_failures, settings.redis_breaker_reset_timeout)
@@ -0,0 +1,38 @@
+from typing import Optional
+
+import orjson
+from sqlalchemy.orm import Session
+
+from src.conf.config import settings
+from src.database.models import User
+from src.repository import contacts as repository_contacts
+from src.services.auth import auth_service
+from src.services.phones import normalize_phone
+from src.services.versions import contacts_version
+
+
+async def lookup_caller(db: Session, user: User, phone: str) -> Optional[dict]:
+    """
+    The lookup_caller function resolves the number of an incoming call to one
+    of the user's contacts. Answers, including "unknown number", are cached in
+    Redis for callerid_cache_ttl seconds, so repeated calls from the same
+    number don't reach the database. A contact write changes the contacts
+    version and with it the cache keys.
+
+    :param db: Access the database on a cache miss
+    :param user: Owner of the contacts
+    :param phone: Number of the caller in any format
+    :return: A dict in the ContactResponse shape or None
+    """
+    phone_e164 = normalize_phone(phone)
+    if phone_e164 is None:
+        return None
+    version = contacts_version(user.id) or b"0"
+    key = f"callerid:{user.id}:{version.decode()}:{phone_e164}"
+    cached = auth_service.cache_get(key)
+    if cached is not None:
+        return orjson.loads(cached)
+    contact = await repository_contacts.get_contact_by_caller(db, user, phone_e164)
+    auth_service.cache_set(key, orjson.dumps(contact), settings.callerid_cache_ttl)
+    return contact
+
@@ -0,0 +1,68 @@
+"""
+Reconciliation of the per-user contact counters with the contacts table.
+
+The counters are changed in the transaction of every contact write, so they
+only drift after writes that bypass the repository (manual fixes, imports).
+Run it periodically, e.g. nightly from cron::
+
+    python -m src.services.counters
+"""
+import argparse
+import asyncio
+import logging
+
+from src.conf.config import settings
+from src.database.db import SessionLocal
+from src.repository import counters as repository_counters
+from src.repository import users as repository_users
+
+logger = logging.getLogger(__name__)
+
+
+async def reconcile_all(chunk_size: int = None, report_drift: bool = True) -> dict:
+    """
+    The reconcile_all function recounts the contacts of all users that are
+    not disabled, a chunk of users per transaction, and repairs the counters
+    that drifted.
+
+    :param chunk_size: Users per chunk
+    :param report_drift: Warn about every user whose counters drifted; off
+        when the counters are filled for the first time, e.g. after seeding
+    :return: Counts of checked users, users with drift and repaired counters
+    """
+    chunk_size = chunk_size or settings.counters_chunk_size
+    totals = {"users": 0, "drifted": 0, "repaired": 0}
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            users = await repository_users.get_active_users(db, after_id=last_id, limit=chunk_size)
+            if not users:
+                break
+            user_ids = [user.id for user in users]
+            repaired = await repository_counters.reconcile_counters(db, user_ids)
+            if report_drift:
+                for user_id, names in repaired.items():
+                    logger.warning("contact counters of user %s drifted: %s", user_id, names)
+            totals["users"] += len(users)
+            totals["drifted"] += len(repaired)
+            totals["repaired"] += sum(len(names) for names in repaired.values())
+            last_id = user_ids[-1]
+            logger.info("counters reconciled up to user %s: %s", last_id, totals)
+    finally:
+        db.close()
+    return totals
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, help="Users per transaction (counters_chunk_size by default)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    totals = asyncio.run(reconcile_all(chunk_size=args.chunk_size))
+    print(totals)
+    return totals
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Iterable, List, Optional
+
+import orjson
+
+from src.conf.config import settings
+from src.database.db import SessionLocal
+from src.repository import contacts as repository_contacts
+from src.services.auth import auth_service
+
+logger = logging.getLogger(__name__)
+
+_SOUNDEX_CODES = {}
+for _letters, _code in (("bfpv", "1"), ("cgjkqsxz", "2"), ("dt", "3"), ("l", "4"), ("mn", "5"), ("r", "6")):
+    for _letter in _letters:
+        _SOUNDEX_CODES[_letter] = _code
+
+
+def soundex(name: Optional[str]) -> str:
+    """
+    The soundex function returns the American Soundex code of a name, so
+    spellings that sound alike (Robert, Rupert) get the same code.
+    Letters outside a-z are ignored.
+
+    :param name: A first or last name
+    :return: A four character code or an empty string
+    """
+    letters = [letter for letter in (name or "").lower() if "a" <= letter <= "z"]
+    if not letters:
+        return ""
+    code = [letters[0].upper()]
+    last = _SOUNDEX_CODES.get(letters[0], "")
+    for letter in letters[1:]:
+        digit = _SOUNDEX_CODES.get(letter, "")
+        if digit and digit != last:
+            code.append(digit)
+            if len(code) == 4:
+                break
+        if letter not in "hw":
+            last = digit
+    return "".join(code).ljust(4, "0")
+
+
+def blocking_keys(contact) -> List[tuple]:
+    """
+    The blocking_keys function lists the keys a contact is grouped by: only
+    contacts sharing at least one key are compared with each other.
+
+    :param contact: A row with phone_e164, email, first_name and last_name
+    :return: A list of (kind, value) tuples
+    """
+    keys = []
+    if contact.phone_e164:
+        keys.append(("phone", contact.phone_e164))
+    if contact.email:
+        keys.append(("email", contact.email.lower()))
+    name = soundex(contact.first_name) + soundex(contact.last_name)
+    if name:
+        keys.append(("name", name))
+    return keys
+
+
+def score_pair(a, b, min_score: float = 0.0) -> tuple:
+    """
+    The score_pair function estimates how likely two contacts are the same
+    person: a shared phone number or email weighs most, a similar full name
+    and the same birthday add to it.
+    The name comparison is the expensive part and is skipped when the pair
+    can't reach min_score even with identical names.
+
+    :param a: A contact row
+    :param b: Another contact row
+    :param min_score: Score below which the exact value doesn't matter
+    :return: A (score, reasons) tuple, score between 0 and 1
+    """
+    score, reasons = 0.0, []
+    if a.phone_e164 and a.phone_e164 == b.phone_e164:
+        score += 0.5
+        reasons.append("phone")
+    if a.email and b.email and a.email.lower() == b.email.lower():
+        score += 0.4
+        reasons.append("email")
+    if a.birthday and a.birthday == b.birthday:
+        score += 0.25
+        reasons.append("birthday")
+    if score + 0.4 < min_score:
+        return score, reasons
+    name_a = f"{a.first_name or ''} {a.last_name or ''}".strip().lower()
+    name_b = f"{b.first_name or ''} {b.last_name or ''}".strip().lower()
+    if name_a and name_b:
+        ratio = SequenceMatcher(None, name_a, name_b).ratio()
+        if ratio >= 0.8:
+            score += 0.4 * ratio
+            reasons.append("name")
+    return min(score, 1.0), reasons
+
+
+def find_duplicates(contacts: Iterable, min_score: float = None, max_block: int = None) -> List[dict]:
+    """
+    The find_duplicates function finds likely duplicate pairs among the
+    contacts of one user. Contacts are grouped by their blocking keys and only
+    pairs within a group are scored, instead of every pair of the account.
+    Groups larger than max_block (a very common name) are skipped.
+
+    :param contacts: Rows with id, first_name, last_name, email, phone_e164 and birthday
+    :param min_score: Lowest score reported as a duplicate
+    :param max_block: Largest group that is compared pair by pair
+    :return: Candidate pairs, best first
+    """
+    min_score = settings.dedup_min_score if min_score is None else min_score
+    max_block = max_block or settings.dedup_max_block
+    blocks = defaultdict(list)
+    for contact in contacts:
+        for key in blocking_keys(contact):
+            blocks[key].append(contact)
+
+    seen, candidates = set(), []
+    for block in blocks.values():
+        if len(block) < 2 or len(block) > max_block:
+            continue
+        for i, a in enumerate(block):
+            for b in block[i + 1:]:
+                pair = (a.id, b.id) if a.id < b.id else (b.id, a.id)
+                if pair in seen:
+                    continue
+                seen.add(pair)
+                score, reasons = score_pair(a, b, min_score)
+                if score >= min_score:
+                    candidates.append({"ids": list(pair), "score": round(score, 3), "reasons": reasons})
+    candidates.sort(key=lambda candidate: (-candidate["score"], candidate["ids"]))
+    return candidates[:settings.dedup_max_candidates]
+
+
+def _key(user_id: int) -> str:
+    return f"dedup:{user_id}"
+
+
+def get_candidates(user_id: int) -> Optional[dict]:
+    """
+    The get_candidates function returns the last scan result of a user.
+
+    :param user_id: Id of the user
+    :return: A dict with state and candidates, None if there is no scan
+    """
+    cached = auth_service.cache_get(_key(user_id))
+    return orjson.loads(cached) if cached else None
+
+
+def _store(user_id: int, state: str, candidates: list) -> None:
+    auth_service.cache_set(_key(user_id), orjson.dumps({"state": state, "candidates": candidates}),
+                           settings.dedup_ttl)
+
+
+def mark_scanning(user_id: int) -> None:
+    """
+    The mark_scanning function records that a scan was scheduled, so the
+    next request doesn't schedule another one.
+
+    :param user_id: Id of the user
+    :return: None
+    """
+    _store(user_id, "scanning", [])
+
+
+def forget_contacts(user_id: int, contact_ids: Iterable[int]) -> None:
+    """
+    The forget_contacts function drops the stored candidates that refer to
+    contacts that no longer exist, e.g. after a merge.
+
+    :param user_id: Id of the user
+    :param contact_ids: Ids of removed contacts
+    :return: None
+    """
+    result = get_candidates(user_id)
+    if not result:
+        return
+    removed = set(contact_ids)
+    _store(user_id, result["state"],
+           [candidate for candidate in result["candidates"] if not removed.intersection(candidate["ids"])])
+
+
+async def scan_duplicates(user_id: int) -> int:
+    """
+    The scan_duplicates function runs the duplicate detection for one user
+    and stores the candidates in Redis under ``dedup:<user_id>``.
+    It runs as a background task with its own database session; the scoring
+    runs in a worker thread to keep the event loop responsive.
+
+    :param user_id: Id of the user to scan
+    :return: Number of candidate pairs found
+    """
+    db = SessionLocal()
+    try:
+        rows = await repository_contacts.get_contacts_for_dedup(db, user_id)
+    except Exception:
+        logger.exception("duplicate scan of user %s failed", user_id)
+        auth_service.cache_delete(_key(user_id))
+        return 0
+    finally:
+        db.close()
+    candidates = await asyncio.to_thread(find_duplicates, rows)
+    _store(user_id, "done", candidates)
+    logger.info("duplicate scan of user %s: %s contacts, %s candidates", user_id, len(rows), len(candidates))
+    return len(candidates)
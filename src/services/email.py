@@ -1,27 +1,44 @@
+import logging
+from functools import lru_cache
 from pathlib import Path
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
 from pydantic import EmailStr
 
 from src.conf.config import settings
 from src.services.auth import auth_service
+from src.services.tracing import traced
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.mail_username,
-    MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM=settings.mail_from,
-    MAIL_PORT=settings.mail_port,
-    MAIL_SERVER=settings.mail_server,
-    MAIL_FROM_NAME="Desired Name",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
-)
+logger = logging.getLogger(__name__)
 
 
+@lru_cache
+def get_mail():
+    """
+    The get_mail function creates the mail client once per worker, on first
+    use. fastapi_mail is imported here because it is slow to import and only
+    needed when an email is actually sent.
+
+    :return: A FastMail instance
+    """
+    from fastapi_mail import FastMail, ConnectionConfig
+
+    conf = ConnectionConfig(
+        MAIL_USERNAME=settings.mail_username,
+        MAIL_PASSWORD=settings.mail_password,
+        MAIL_FROM=settings.mail_from,
+        MAIL_PORT=settings.mail_port,
+        MAIL_SERVER=settings.mail_server,
+        MAIL_FROM_NAME="Desired Name",
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=True,
+        USE_CREDENTIALS=True,
+        VALIDATE_CERTS=True,
+        TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
+    )
+    return FastMail(conf)
+
+
+@traced("email.send_email")
 async def send_email(email: EmailStr, username: str, host: str):
     """
     The send_email function sends an email to the user with a link to verify
@@ -32,6 +49,9 @@ async def send_email(email: EmailStr, username: str, host: str):
     :param host: Pass the host name of the server to the email template
     :return: A coroutine object
     """
+    from fastapi_mail import MessageSchema, MessageType
+    from fastapi_mail.errors import ConnectionErrors
+
     try:
         token_verification = auth_service.create_email_token({"sub": email})
         message = MessageSchema(
@@ -41,8 +61,32 @@ async def send_email(email: EmailStr, username: str, host: str):
             subtype=MessageType.html
         )
 
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
+        await get_mail().send_message(message, template_name="email_template.html")
     except ConnectionErrors as err:
-        print(err)
+        logger.warning("confirmation email to %s failed: %s", email, err)
+
+
+
+@traced("email.send_birthday_digest")
+async def send_birthday_digest(email: EmailStr, username: str, contacts: list):
+    """
+    The send_birthday_digest function sends a user the list of their
+    contacts with a birthday in the coming days.
+
+    :param email: Pass the email address to send the email to user
+    :param username: Pass the username of the user to the email template
+    :param contacts: Dicts with first_name, last_name and next_birthday
+    :return: None, a failed send raises so the caller can count it
+    """
+    from fastapi_mail import MessageSchema, MessageType
+
+    message = MessageSchema(
+        subject="Upcoming birthdays",
+        recipients=[email],
+        template_body={"username": username,
+                       "contacts": [{**contact, "next_birthday": contact["next_birthday"].isoformat()}
+                                    for contact in contacts]},
+        subtype=MessageType.html
+    )
 
+    await get_mail().send_message(message, template_name="birthday_digest.html")
@@ -0,0 +1,182 @@
+import asyncio
+from typing import Dict, Iterable, Optional, Set
+
+import orjson
+import redis
+
+from src import schemas
+from src.conf.config import settings
+from src.services.auth import auth_service
+
+# Sent instead of the dropped events when a client falls behind or the
+# worker lost its Redis subscription: the client should reload its contacts.
+RESYNC = orjson.dumps({"type": "resync"}).decode()
+PING = orjson.dumps({"type": "ping"}).decode()
+
+
+def channel(user_id: int) -> str:
+    return f"contacts:{user_id}:events"
+
+
+def publish_contact_events(user_id: int, version: bytes, created=(), updated=(), deleted: Iterable[int] = (),
+                           resync: bool = False) -> None:
+    """
+    The publish_contact_events function sends the changes of one committed
+    contact write to the user's channel, where every worker with an open
+    event stream of the user picks them up.
+
+    :param user_id: Id of the user
+    :param version: Contacts version after the write
+    :param created: Created contacts
+    :param updated: Updated contacts
+    :param deleted: Ids of deleted contacts
+    :param resync: The write can't be described contact by contact
+    :return: None
+    """
+    version = version.decode()
+    if resync:
+        events = [{"type": "resync", "version": version}]
+    else:
+        events = [{"type": kind, "version": version,
+                   "contact": schemas.ContactResponse.model_validate(contact).model_dump(mode="json")}
+                  for kind, contacts in (("created", created), ("updated", updated)) for contact in contacts]
+        events += [{"type": "deleted", "version": version, "id": contact_id} for contact_id in deleted]
+    for event in events:
+        auth_service.publish(channel(user_id), orjson.dumps(event))
+
+
+class TooManyConnections(Exception):
+    pass
+
+
+class EventBroker:
+    """
+    The EventBroker class fans contact events out to the event streams open
+    in this worker. All streams share one Redis pub/sub connection, which is
+    subscribed to the channels of the users with at least one open stream.
+    Every stream has a bounded queue; a stream that doesn't keep up loses its
+    queued events and gets a resync event instead, so a slow client can't
+    grow the worker's memory.
+    """
+
+    def __init__(self):
+        self.pubsub = None
+        self.queues: Dict[int, Set[asyncio.Queue]] = {}
+        self.connections = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, client) -> None:
+        """
+        The start function starts listening for events. Called in lifespan.
+
+        :param client: Async Redis client
+        :return: None
+        """
+        self.pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """
+        The stop function stops listening and closes the pub/sub connection.
+
+        :return: None
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.pubsub is not None:
+            await self.pubsub.aclose()
+            self.pubsub = None
+
+    async def subscribe(self, user_id: int) -> asyncio.Queue:
+        """
+        The subscribe function opens an event stream of a user.
+
+        :param user_id: Id of the user
+        :return: The queue the user's events are put in
+        """
+        if self.pubsub is None:
+            raise ConnectionError("Event broker is not running")
+        if self.connections >= settings.events_max_connections:
+            raise TooManyConnections()
+        queue = asyncio.Queue(maxsize=settings.events_queue_size)
+        queues = self.queues.setdefault(user_id, set())
+        first = not queues
+        queues.add(queue)
+        self.connections += 1
+        if first:
+            try:
+                await self.pubsub.subscribe(channel(user_id))
+            except (redis.RedisError, OSError):
+                await self.unsubscribe(user_id, queue)
+                raise ConnectionError("Can't subscribe to contact events")
+        return queue
+
+    async def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        """
+        The unsubscribe function closes an event stream of a user.
+
+        :param user_id: Id of the user
+        :param queue: Queue returned by subscribe
+        :return: None
+        """
+        queues = self.queues.get(user_id)
+        if queues is None or queue not in queues:
+            return
+        queues.discard(queue)
+        self.connections -= 1
+        if not queues:
+            del self.queues[user_id]
+            try:
+                await self.pubsub.unsubscribe(channel(user_id))
+            except (redis.RedisError, OSError):
+                pass
+
+    def dispatch(self, user_id: int, data: str) -> None:
+        """
+        The dispatch function puts an event into the queues of a user's
+        streams. A full queue is emptied and gets a resync event.
+
+        :param user_id: Id of the user
+        :param data: Encoded event
+        :return: None
+        """
+        for queue in self.queues.get(user_id, ()):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    async def _listen(self) -> None:
+        lost = False
+        while True:
+            if not self.pubsub.subscribed:
+                await asyncio.sleep(1.0)
+                continue
+            try:
+                message = await self.pubsub.get_message(timeout=1.0)
+            except (redis.RedisError, OSError):
+                # the connection resubscribes on the next read; events
+                # published in between are lost
+                lost = True
+                await asyncio.sleep(1.0)
+                continue
+            if lost:
+                lost = False
+                for user_id in list(self.queues):
+                    self.dispatch(user_id, RESYNC)
+            if message is None or message["type"] != "message":
+                continue
+            name = message["channel"]
+            name = name.decode() if isinstance(name, bytes) else name
+            data = message["data"]
+            self.dispatch(int(name.split(":")[1]), data.decode() if isinstance(data, bytes) else data)
+
+
+event_broker = EventBroker()
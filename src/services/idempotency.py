@@ -0,0 +1,79 @@
+import hashlib
+from typing import Any, Awaitable, Callable, Optional
+
+import orjson
+from fastapi import HTTPException, Request, status
+from fastapi.responses import Response
+
+from src.conf.config import settings
+from src.services import serializers
+from src.services.auth import auth_service
+
+# A key is first taken with SET NX (value b"1") while the request runs and
+# then overwritten with the stored response, so a retry is answered by a
+# single GET. Only successful responses are kept: after an error the key is
+# released and a retry runs the request again.
+PENDING = b"1"
+
+
+def _key(user_id: int, idempotency_key: str) -> str:
+    return f"idempotency:{user_id}:{idempotency_key}"
+
+
+def request_fingerprint(request: Request, payload: bytes) -> str:
+    """
+    The request_fingerprint function identifies a request by its method, path
+    and body, so a key reused for a different request can be told apart from
+    a retry.
+
+    :param request: Incoming request
+    :param payload: Canonical request body
+    :return: Hex digest of the request
+    """
+    digest = hashlib.sha256(f"{request.method} {request.url.path}\n".encode())
+    digest.update(payload)
+    return digest.hexdigest()
+
+
+async def run_idempotent(request: Request, user_id: int, idempotency_key: Optional[str], payload: bytes,
+                         handler: Callable[[], Awaitable[Any]], status_code: int = 200) -> Response:
+    """
+    The run_idempotent function runs a write once per Idempotency-Key. The
+    first request takes the key, runs the handler and stores its response for
+    idempotency_ttl seconds; retries with the same key and body get the stored
+    response without touching the database. A retry while the first request
+    is still running gets 409, the same key with a different body gets 422.
+    Without a key, or if Redis can't be used, the handler just runs.
+
+    :param request: Incoming request, used for the fingerprint and content negotiation
+    :param user_id: Id of the user, keys are per user
+    :param idempotency_key: Value of the Idempotency-Key header
+    :param payload: Canonical request body
+    :param handler: Does the write and returns the response content
+    :param status_code: Status code of a successful response
+    :return: The new or the stored response
+    """
+    if not idempotency_key:
+        return serializers.render(request, await handler(), status_code)
+    key = _key(user_id, idempotency_key)
+    fingerprint = request_fingerprint(request, payload)
+    stored = auth_service.cache_get(key)
+    if stored is None and auth_service.cache_lock(key, settings.idempotency_lock_ttl):
+        try:
+            content = await handler()
+        except BaseException:
+            auth_service.cache_delete(key)
+            raise
+        record = {"fingerprint": fingerprint, "status_code": status_code, "content": content}
+        auth_service.cache_set(key, orjson.dumps(record), settings.idempotency_ttl)
+        return serializers.render(request, content, status_code)
+    if stored is None or stored == PENDING:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="A request with this Idempotency-Key is still in progress",
+                            headers={"Retry-After": "1"})
+    record = orjson.loads(stored)
+    if record["fingerprint"] != fingerprint:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail="Idempotency-Key was already used for a different request")
+    return serializers.render(request, record["content"], record["status_code"],
+                             headers={"Idempotent-Replayed": "true"})
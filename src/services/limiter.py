@@ -0,0 +1,89 @@
+import logging
+import time
+from math import ceil
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi_limiter import FastAPILimiter, default_identifier, http_default_callback
+from fastapi_limiter.depends import RateLimiter
+from redis.exceptions import RedisError
+
+from src.services.breaker import redis_breaker
+
+logger = logging.getLogger(__name__)
+
+LOCAL_MAX_KEYS = 10000
+
+
+async def init_limiter(r) -> None:
+    """
+    The init_limiter function initialises FastAPILimiter. If Redis is down at
+    startup the app still starts without the Lua script: ResilientRateLimiter
+    loads it on first use once Redis is back, until then the local limiter
+    is used.
+
+    :param r: Async Redis client
+    :return: None
+    """
+    try:
+        await FastAPILimiter.init(r)
+    except RedisError as e:
+        logger.warning("rate limiter Redis unavailable at startup: %s", e)
+        redis_breaker.record_failure()
+        FastAPILimiter.redis = r
+        FastAPILimiter.prefix = "fastapi-limiter"
+        FastAPILimiter.identifier = default_identifier
+        FastAPILimiter.http_callback = http_default_callback
+        FastAPILimiter.lua_sha = None
+
+
+class ResilientRateLimiter(RateLimiter):
+    """
+    The ResilientRateLimiter class is a RateLimiter that keeps working when
+    Redis is slow or down: while the Redis circuit breaker is open, requests
+    are counted in a fixed window in this worker's memory instead.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.windows = {}
+
+    async def _check(self, key):
+        # the script is missing if Redis was down when the app started
+        if FastAPILimiter.lua_sha is None:
+            FastAPILimiter.lua_sha = await FastAPILimiter.redis.script_load(FastAPILimiter.lua_script)
+        return await super()._check(key)
+
+    async def __call__(self, request: Request, response: Response):
+        if FastAPILimiter.redis is not None and redis_breaker.allow():
+            try:
+                result = await super().__call__(request, response)
+            except (RedisError, OSError):
+                redis_breaker.record_failure()
+            except HTTPException:
+                redis_breaker.record_success()
+                raise
+            else:
+                redis_breaker.record_success()
+                return result
+        await self.local_check(request)
+
+    async def local_check(self, request: Request) -> None:
+        """
+        The local_check function applies the limit with an in-memory fixed
+        window per client and path.
+
+        :param request: Incoming request
+        :return: None
+        """
+        identifier = self.identifier or FastAPILimiter.identifier or default_identifier
+        key = await identifier(request)
+        now = time.monotonic() * 1000
+        start, count = self.windows.get(key, (now, 0))
+        if now - start >= self.milliseconds:
+            start, count = now, 0
+        if count >= self.times:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too Many Requests",
+                                headers={"Retry-After": str(ceil((start + self.milliseconds - now) / 1000))})
+        if len(self.windows) >= LOCAL_MAX_KEYS:
+            self.windows = {k: v for k, v in self.windows.items() if now - v[0] < self.milliseconds}
+        self.windows[key] = (start, count + 1)
@@ -0,0 +1,174 @@
+import logging
+import re
+import time
+from collections import Counter as StatementCounter
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.responses import Response
+
+from src.conf.config import settings
+
+logger = logging.getLogger(__name__)
+
+_WHERE = re.compile(r"\sWHERE\s", re.IGNORECASE)
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Request latency by route",
+                            ["method", "route"])
+REQUESTS = Counter("http_requests_total", "Requests by route and status code",
+                   ["method", "route", "status"])
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled")
+SQL_QUERIES = Histogram("sql_queries_per_request", "SQL statements executed per request", ["route"],
+                        buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100))
+SQL_TIME = Histogram("sql_time_per_request_seconds", "Time spent in SQL statements per request", ["route"])
+SQL_REPEATED = Counter("sql_repeated_queries_total",
+                       "Statements repeating the shape of an earlier one in the same request (N+1 suspects)",
+                       ["route"])
+SHED_REQUESTS = Counter("shed_requests_total", "Requests rejected by load shedding", ["route_class"])
+CONCURRENCY_LIMIT = Gauge("concurrency_limit", "Current adaptive concurrency limit", ["route_class"])
+STARTUP_SECONDS = Gauge("app_startup_seconds", "Time from process import of main to the app being ready")
+BREAKER_STATE = Gauge("circuit_breaker_state", "Circuit breaker state: 0 closed, 1 open, 2 half open", ["name"])
+BREAKER_FAILURES = Counter("circuit_breaker_failures_total", "Failed calls seen by a circuit breaker", ["name"])
+
+
+class QueryStats:
+    """
+    The QueryStats class collects the SQL statements executed while handling
+    one request
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.shapes = StatementCounter()
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.time += elapsed
+        # Statements that differ only in their WHERE clause have the same shape,
+        # e.g. the email and phone lookups in create_contact
+        self.shapes[_WHERE.split(statement, 1)[0]] += 1
+
+    def repeated(self) -> dict:
+        return {shape: count for shape, count in self.shapes.items()
+                if count >= settings.metrics_repeated_query_threshold}
+
+
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+# (route, shape) -> when it was last logged
+_repeated_logged = {}
+
+
+def log_repeated(method: str, route: str, shape: str, count: int) -> None:
+    """
+    The log_repeated function warns about a statement shape repeated within
+    one request, at most once per route and shape every
+    metrics_repeated_query_log_interval seconds, so a route that always
+    repeats a statement doesn't log on every request.
+
+    :param method: HTTP method
+    :param route: Path template of the route
+    :param shape: Statement up to its WHERE clause
+    :param count: How many times it ran in the request
+    :return: None
+    """
+    now = time.monotonic()
+    last = _repeated_logged.get((route, shape))
+    if last is not None and now - last < settings.metrics_repeated_query_log_interval:
+        return
+    _repeated_logged[(route, shape)] = now
+    logger.warning("%s %s ran %s statements shaped like: %s", method, route, count, shape)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    The instrument_engine function registers SQLAlchemy event hooks that time
+    every statement and add it to the stats of the current request.
+    Instrumenting an engine again (another create_app) changes nothing.
+
+    :param engine: Engine to instrument
+    :return: None
+    """
+    for name, listener in (("before_cursor_execute", _before_cursor_execute),
+                           ("after_cursor_execute", _after_cursor_execute)):
+        if not event.contains(engine, name, listener):
+            event.listen(engine, name, listener)
+
+
+def route_name(scope: dict) -> str:
+    """
+    The route_name function returns the path template of the matched route,
+    so /api/contacts/1 and /api/contacts/2 share one label.
+
+    :param scope: ASGI scope after routing
+    :return: Path template or 'unmatched'
+    """
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    The MetricsMiddleware class records latency, status codes, in-flight
+    requests and SQL statement counts for every HTTP request
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            _query_stats.reset(token)
+            route = route_name(scope)
+            method = scope["method"]
+            REQUEST_LATENCY.labels(method, route).observe(elapsed)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+            SQL_QUERIES.labels(route).observe(stats.count)
+            SQL_TIME.labels(route).observe(stats.time)
+            for shape, count in stats.repeated().items():
+                SQL_REPEATED.labels(route).inc(count - 1)
+                log_repeated(method, route, shape, count)
+
+
+def metrics_response() -> Response:
+    """
+    The metrics_response function renders all metrics in the Prometheus text
+    format.
+
+    :return: A plain text response
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
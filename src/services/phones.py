@@ -0,0 +1,37 @@
+import re
+from typing import Optional
+
+from src.conf.config import settings
+
+_NOT_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone(phone: str, country_code: str = None) -> Optional[str]:
+    """
+    The normalize_phone function converts a phone number written in any
+    common way to E.164, so ``+380 50 123 4567``, ``(050) 123-45-67`` and
+    ``00380501234567`` all become ``+380501234567``.
+    Numbers without an international prefix are taken as national numbers of
+    phone_country_code, a leading trunk 0 is dropped.
+
+    :param phone: Phone number as entered
+    :param country_code: Country calling code for national numbers
+    :return: The number in E.164 or None if it can't be a phone number
+    """
+    if not phone:
+        return None
+    country_code = country_code or settings.phone_country_code
+    digits = _NOT_DIGITS.sub("", phone)
+    if phone.strip().startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith(country_code) and len(digits) > len(country_code) + 8:
+        pass
+    elif digits.startswith("0"):
+        digits = country_code + digits[1:]
+    else:
+        digits = country_code + digits
+    if not 8 <= len(digits) <= 15:
+        return None
+    return f"+{digits}"
@@ -0,0 +1,75 @@
+import cProfile
+import hmac
+import io
+import pstats
+import time
+from pathlib import Path
+from uuid import uuid4
+
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+from src.conf.config import settings
+
+
+def profiling_requested(request: Request) -> bool:
+    """
+    The profiling_requested function checks whether profiling is enabled and
+    the request carries the profiling token in the ``X-Profile`` header or the
+    ``profile`` query parameter.
+
+    :param request: Incoming request
+    :return: True if the request should be profiled
+    """
+    if not settings.profiling_enabled or not settings.profiling_token:
+        return False
+    token = request.headers.get("x-profile") or request.query_params.get("profile") or ""
+    return hmac.compare_digest(token.encode(), settings.profiling_token.encode())
+
+
+class ProfilingMiddleware:
+    """
+    The ProfilingMiddleware class runs authorised requests under cProfile and
+    stores the profile in profiling_dir as a pstats file. Its name is returned
+    in the ``X-Profile-File`` header. With ``profile_format=text`` the
+    response body is replaced by the top of the profile sorted by cumulative
+    time.
+    Only one request is profiled at a time, others run normally. The profiler
+    sees everything the event loop runs meanwhile, so profile on a quiet worker.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.busy = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.busy or not profiling_requested(Request(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        as_text = Request(scope).query_params.get("profile_format") == "text"
+        path = Path(settings.profiling_dir) / f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid4().hex[:8]}.pstats"
+
+        async def send_wrapper(message):
+            if as_text:
+                return
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-file", path.name.encode())]
+            await send(message)
+
+        self.busy = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            self.busy = False
+            path.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(path)
+
+        if as_text:
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(settings.profiling_text_lines)
+            response = PlainTextResponse(stream.getvalue(), headers={"X-Profile-File": path.name})
+            await response(scope, receive, send)
@@ -0,0 +1,142 @@
+"""
+Batched deletion of the contacts and rows of deleted (disabled) accounts.
+
+DELETE /api/users/me/ disables the account and starts purge_user as a
+background task. A purge cut short by a restart or an error leaves the user
+disabled, so the next sweep finishes it; every worker sweeps at startup
+(purge_on_startup) and it can also be run by hand::
+
+    python -m src.services.purge
+    python -m src.services.purge --status 42
+"""
+import argparse
+import asyncio
+import logging
+from typing import Optional
+
+import orjson
+
+from src.conf.config import settings
+from src.database.db import SessionLocal
+from src.repository import contacts as repository_contacts
+from src.repository import users as repository_users
+from src.services.auth import auth_service
+
+logger = logging.getLogger(__name__)
+
+
+def _key(user_id: int) -> str:
+    return f"purge:{user_id}"
+
+
+def report_progress(user_id: int, state: str, deleted: int) -> None:
+    """
+    The report_progress function logs the progress of an account purge and
+    stores it in Redis under ``purge:<user_id>`` for purge_status.
+
+    :param user_id: Id of the user being purged
+    :param state: running, done or failed
+    :param deleted: Number of contacts deleted so far
+    :return: None
+    """
+    logger.info("purge user %s: %s, %s contacts deleted", user_id, state, deleted)
+    auth_service.cache_set(_key(user_id), orjson.dumps({"state": state, "deleted": deleted}),
+                           settings.purge_status_ttl)
+
+
+def purge_status(user_id: int) -> Optional[dict]:
+    """
+    The purge_status function reads the last reported progress of a purge.
+
+    :param user_id: Id of the purged user
+    :return: A dict with state and deleted, None if unknown
+    """
+    cached = auth_service.cache_get(_key(user_id))
+    return orjson.loads(cached) if cached else None
+
+
+async def purge_user(user_id: int, batch_size: int = None, pause: float = None) -> int:
+    """
+    The purge_user function deletes a disabled user's contacts in bounded
+    batches, pausing between them so other requests get the table, and
+    deletes the user row when no contacts are left.
+    It runs as a background task with its own database session.
+
+    :param user_id: Id of the user to purge
+    :param batch_size: Contacts deleted per transaction
+    :param pause: Seconds to sleep between batches
+    :return: Number of deleted contacts
+    """
+    batch_size = batch_size or settings.purge_batch_size
+    pause = settings.purge_batch_pause if pause is None else pause
+    deleted = 0
+    db = SessionLocal()
+    try:
+        report_progress(user_id, "running", deleted)
+        while True:
+            count = await repository_contacts.purge_contacts_batch(db, user_id, batch_size)
+            if not count:
+                break
+            deleted += count
+            report_progress(user_id, "running", deleted)
+            await asyncio.sleep(pause)
+        await repository_users.delete_user(user_id, db)
+        report_progress(user_id, "done", deleted)
+    except Exception:
+        db.rollback()
+        report_progress(user_id, "failed", deleted)
+        logger.exception("purge user %s failed", user_id)
+    finally:
+        db.close()
+    return deleted
+
+
+async def purge_pending(batch_size: int = None, pause: float = None, chunk_size: int = 100) -> dict:
+    """
+    The purge_pending function finishes the purges that were interrupted:
+    it purges every user that is still disabled. A Redis lock per user keeps
+    two workers sweeping at the same time from purging the same account.
+
+    :param batch_size: Contacts deleted per transaction
+    :param pause: Seconds to sleep between batches
+    :param chunk_size: Users read per query
+    :return: Counts of purged users and deleted contacts
+    """
+    totals = {"users": 0, "contacts": 0}
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            user_ids = await repository_users.get_disabled_user_ids(db, after_id=last_id, limit=chunk_size)
+            if not user_ids:
+                break
+            for user_id in user_ids:
+                if not auth_service.cache_lock(f"{_key(user_id)}:lock", settings.purge_lock_ttl):
+                    continue
+                totals["contacts"] += await purge_user(user_id, batch_size=batch_size, pause=pause)
+                totals["users"] += 1
+            last_id = user_ids[-1]
+    finally:
+        db.close()
+    if totals["users"]:
+        logger.info("interrupted purges resumed: %s", totals)
+    return totals
+
+
+def main(argv=None) -> Optional[dict]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", type=int, metavar="USER_ID", help="Show the purge progress of a user")
+    parser.add_argument("--batch-size", type=int, help="Contacts per transaction (purge_batch_size by default)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    if args.status is not None:
+        status = purge_status(args.status)
+        print(status or f"no purge progress stored for user {args.status}")
+        return status
+    totals = asyncio.run(purge_pending(batch_size=args.batch_size))
+    print(totals)
+    return totals
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+from datetime import date, datetime
+from typing import Any
+
+from fastapi import Request
+from fastapi.responses import ORJSONResponse, Response
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, JSON is always available
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/x-msgpack", "application/msgpack")
+
+
+def _msgpack_default(obj: Any):
+    """
+    The _msgpack_default function converts values msgpack can't encode
+    natively (dates) into their ISO strings, the same shape orjson produces.
+
+    :param obj: Value that msgpack could not encode
+    :return: ISO formatted string
+    """
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not msgpack serializable")
+
+
+class MsgPackResponse(Response):
+    """
+    The MsgPackResponse class encodes the content with MessagePack
+    """
+    media_type = MSGPACK_MEDIA_TYPES[0]
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=_msgpack_default)
+
+
+def wants_msgpack(request: Request) -> bool:
+    """
+    The wants_msgpack function checks whether the client asked for MessagePack
+    in the Accept header and msgpack is installed.
+
+    :param request: Incoming request
+    :return: True if the response should be encoded with MessagePack
+    """
+    if msgpack is None:
+        return False
+    accept = request.headers.get("accept", "")
+    return any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+def render(request: Request, content: Any, status_code: int = 200, headers: dict = None) -> Response:
+    """
+    The render function encodes plain rows selected from the database without
+    passing them through the response model again. The rows are already in the
+    response shape, so they go straight to orjson (or msgpack if the client
+    negotiated it with the Accept header). The response carries
+    ``Vary: Accept`` so caches keep the two encodings apart.
+
+    :param request: Incoming request, used for content negotiation
+    :param content: Plain dicts (or a list of them) to encode
+    :param status_code: Response status code
+    :param headers: Extra response headers
+    :return: An encoded response
+    """
+    headers = dict(headers or {})
+    vary = headers.get("Vary")
+    headers["Vary"] = f"{vary}, Accept" if vary else "Accept"
+    if wants_msgpack(request):
+        return MsgPackResponse(content, status_code=status_code, headers=headers)
+    return ORJSONResponse(content, status_code=status_code, headers=headers)
@@ -0,0 +1,147 @@
+import asyncio
+import time
+from collections import deque
+
+from starlette.responses import JSONResponse
+
+from src.conf.config import settings
+from src.services.metrics import CONCURRENCY_LIMIT, SHED_REQUESTS
+
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+# event streams stay open for hours, they are limited by events_max_connections
+EXEMPT_PATHS = ("/metrics", "/api/events/")
+
+
+def route_class(scope: dict) -> str:
+    """
+    The route_class function sorts a request into the class whose limit it
+    counts against: auth (bcrypt bound), writes or reads.
+
+    :param scope: ASGI scope of the request
+    :return: auth, writes or reads
+    """
+    if scope["path"].startswith("/api/auth"):
+        return "auth"
+    if scope["method"] in WRITE_METHODS:
+        return "writes"
+    return "reads"
+
+
+class AdaptiveLimiter:
+    """
+    The AdaptiveLimiter class limits the number of concurrent requests of one
+    route class, with a bounded queue of waiting requests.
+    The configured limit is a ceiling, sized so all route classes together
+    don't hold more database connections than the pool has. Below it the limit
+    adapts to observed latency (AIMD): when the smoothed latency goes over the
+    target the limit is cut by a fraction, while it stays under the target the
+    limit grows back by about one per limit's worth of requests.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = float(limit)
+        self.min_limit = settings.shedding_min_limit
+        self.max_limit = float(limit)
+        self.in_flight = 0
+        self.waiters = deque()
+        self.latency = 0.0
+        CONCURRENCY_LIMIT.labels(name).set(self.limit)
+
+    async def acquire(self) -> bool:
+        """
+        The acquire function takes a slot, waiting in the queue for at most
+        shedding_queue_timeout seconds.
+
+        :return: True if a slot was taken, False if the request should be shed
+        """
+        if self.in_flight < int(self.limit) and not self.waiters:
+            self.in_flight += 1
+            return True
+        if len(self.waiters) >= settings.shedding_queue_size:
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), settings.shedding_queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            # release() may have handed over a slot just as the wait timed out
+            return not self._withdraw(waiter)
+        except asyncio.CancelledError:
+            if not self._withdraw(waiter):
+                self._free()
+            raise
+
+    def _withdraw(self, waiter: asyncio.Future) -> bool:
+        """
+        The _withdraw function takes a waiter whose wait ended out of the queue.
+
+        :param waiter: The waiter's future
+        :return: True if it was withdrawn, False if it had already been given a slot
+        """
+        if waiter.done() and not waiter.cancelled():
+            return False
+        waiter.cancel()
+        if waiter in self.waiters:
+            self.waiters.remove(waiter)
+        return True
+
+    def release(self, latency: float) -> None:
+        """
+        The release function frees a slot, adapts the limit and lets the
+        oldest waiting requests in while the limit allows.
+
+        :param latency: How long the finished request took
+        :return: None
+        """
+        self._adapt(latency)
+        self._free()
+
+    def _free(self) -> None:
+        self.in_flight -= 1
+        while self.waiters and self.in_flight < int(self.limit):
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                self.in_flight += 1
+
+    def _adapt(self, latency: float) -> None:
+        self.latency = latency if not self.latency else 0.2 * latency + 0.8 * self.latency
+        if self.latency > settings.shedding_target_latency:
+            self.limit = max(self.min_limit, self.limit * (1 - settings.shedding_backoff))
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        CONCURRENCY_LIMIT.labels(self.name).set(self.limit)
+
+
+class LoadSheddingMiddleware:
+    """
+    The LoadSheddingMiddleware class applies a concurrency limit per route
+    class and answers 503 with Retry-After right away when the limit and the
+    wait queue are full, instead of letting every request time out late
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.limiters = {name: AdaptiveLimiter(name, limit) for name, limit in settings.shedding_limits.items()}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.shedding_enabled or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        name = route_class(scope)
+        limiter = self.limiters[name]
+        if not await limiter.acquire():
+            SHED_REQUESTS.labels(name).inc()
+            response = JSONResponse({"detail": "Server is overloaded, retry later"}, status_code=503,
+                                    headers={"Retry-After": str(settings.shedding_retry_after)})
+            await response(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - start)
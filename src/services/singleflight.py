@@ -0,0 +1,44 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    The SingleFlight class makes concurrent loads of the same key share one
+    call: the first caller runs the loader, callers that arrive while it runs
+    await its result (or its exception) instead of running the loader again.
+    """
+
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        The do function returns the result of loader for key, running it at
+        most once at a time per key in this process.
+
+        :param key: Key identifying the loaded value
+        :param loader: Coroutine function loading the value
+        :return: The loaded value
+        """
+        call = self.calls.get(key)
+        if call is not None:
+            return await asyncio.shield(call)
+
+        call = asyncio.get_running_loop().create_future()
+        # don't warn about an exception nobody else was waiting for
+        call.add_done_callback(lambda future: future.cancelled() or future.exception())
+        self.calls[key] = call
+        try:
+            result = await loader()
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except Exception as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            self.calls.pop(key, None)
@@ -0,0 +1,150 @@
+import functools
+import inspect
+
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.conf.config import settings
+from src.services.metrics import route_name
+
+# Proxy tracer: spans are no-ops until setup_tracing installs a provider
+tracer = trace.get_tracer("contacts-api")
+
+
+def _exporter():
+    """
+    The _exporter function creates the span exporter chosen in settings:
+    ``file`` appends one JSON span per line to tracing_file, ``console`` prints
+    spans and ``otlp`` sends them to an OTLP/HTTP collector.
+
+    :return: A span exporter
+    """
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+    if settings.tracing_exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint)
+    if settings.tracing_exporter == "console":
+        return ConsoleSpanExporter()
+    return ConsoleSpanExporter(out=open(settings.tracing_file, "a"),
+                               formatter=lambda span: span.to_json(indent=None) + "\n")
+
+
+def setup_tracing() -> None:
+    """
+    The setup_tracing function installs the tracer provider if tracing is
+    enabled, sampling root spans with tracing_sample_ratio.
+
+    :return: None
+    """
+    if not settings.tracing_enabled:
+        return
+    # the SDK is only imported when tracing is on
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.tracing_service_name}),
+        sampler=ParentBased(TraceIdRatioBased(settings.tracing_sample_ratio)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(_exporter()))
+    trace.set_tracer_provider(provider)
+
+
+def traced(name: str = None):
+    """
+    The traced function is a decorator that runs a function (sync or async)
+    inside a span. By default the span is named after the function, e.g.
+    ``repository.contacts.get_contact``.
+
+    :param name: Span name
+    :return: The decorator
+    """
+    def decorator(func):
+        span_name = name or f"{func.__module__.removeprefix('src.')}.{func.__name__}"
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with tracer.start_as_current_span(span_name):
+                    return await func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with tracer.start_as_current_span(span_name):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    span = tracer.start_span(f"sql {statement.split(None, 1)[0].upper()}", kind=SpanKind.CLIENT)
+    span.set_attribute("db.system", conn.dialect.name)
+    span.set_attribute("db.statement", statement)
+    conn.info.setdefault("query_spans", []).append(span)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_spans"].pop().end()
+
+
+def _handle_error(exception_context):
+    spans = exception_context.connection.info.get("query_spans") if exception_context.connection else None
+    if spans:
+        span = spans.pop()
+        span.set_status(Status(StatusCode.ERROR, str(exception_context.original_exception)))
+        span.end()
+
+
+def trace_engine(engine: Engine) -> None:
+    """
+    The trace_engine function gives every SQL statement a span, a child of
+    the repository function that runs it. Tracing an engine again changes
+    nothing.
+
+    :param engine: Engine to trace
+    :return: None
+    """
+    for name, listener in (("before_cursor_execute", _before_cursor_execute),
+                           ("after_cursor_execute", _after_cursor_execute),
+                           ("handle_error", _handle_error)):
+        if not event.contains(engine, name, listener):
+            event.listen(engine, name, listener)
+
+
+class TracingMiddleware:
+    """
+    The TracingMiddleware class wraps every HTTP request, including the route
+    handler and its dependencies, in a server span named after the route
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        method = scope["method"]
+        with tracer.start_as_current_span(f"{method} {scope['path']}", kind=SpanKind.SERVER) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = route_name(scope)
+                span.update_name(f"{method} {route}")
+                span.set_attribute("http.method", method)
+                span.set_attribute("http.route", route)
+                span.set_attribute("http.status_code", status_code)
@@ -0,0 +1,37 @@
+import time
+from typing import Optional, Tuple
+
+from src.services.auth import auth_service
+
+# Caches derived from a user's contacts (caller lookups, autocomplete
+# indexes) remember the version they were built from. Every contact write
+# sets a new version, which makes those caches stale in every worker at
+# once. The key outlives the caches that depend on it.
+VERSION_TTL = 24 * 60 * 60
+
+
+def _key(user_id: int) -> str:
+    return f"contacts:{user_id}:version"
+
+
+def contacts_version(user_id: int) -> Optional[bytes]:
+    """
+    The contacts_version function returns the current version of a user's
+    contacts.
+
+    :param user_id: Id of the user
+    :return: The version or None if it isn't set or Redis can't be used
+    """
+    return auth_service.cache_get(_key(user_id))
+
+
+def bump_contacts_version(user_id: int) -> Tuple[Optional[bytes], bytes]:
+    """
+    The bump_contacts_version function records that a user's contacts
+    changed.
+
+    :param user_id: Id of the user
+    :return: The previous and the new version
+    """
+    version = str(time.time_ns()).encode()
+    return auth_service.cache_swap(_key(user_id), version, VERSION_TTL), version
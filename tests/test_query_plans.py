@@ -0,0 +1,142 @@
+import asyncio
+import os
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database.explain import capture_statements, check_plans
+from src.database.models import Base, Contact, User
+from src.repository import contacts as repository_contacts
+from src.repository import users as repository_users
+from src.repository import tags as repository_tags
+from src.repository import counters as repository_counters
+from src.schemas import ContactBase, ContactUpdate, ContactOperations, TagModel
+
+WATCHED_TABLES = ("contacts", "users", "upcoming_birthdays", "tags", "contact_tags", "contact_counters")
+
+
+def _engine(name):
+    if name == "sqlite":
+        return create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    url = os.environ.get("QUERY_PLAN_POSTGRES_URL")
+    if not url:
+        pytest.skip("QUERY_PLAN_POSTGRES_URL is not set")
+    return create_engine(url)
+
+
+@pytest.fixture(scope="module", params=["sqlite", "postgres"])
+def plan_engine(request):
+    engine = _engine(request.param)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": user_id, "username": f"user{user_id}", "email": f"user{user_id}@example.com", "password": "hash"}
+            for user_id in range(1, 6)
+        ])
+        conn.execute(insert(Contact), [
+            {"first_name": f"First{index % 20}", "last_name": f"Last{index % 30}",
+             "email": f"contact{index}@example.com", "phone_number": f"+1{index:010d}",
+             "phone_e164": f"+1{index:010d}",
+             "birthday": date(1970, 1, 1) + timedelta(days=index * 37), "user_id": index % 5 + 1}
+            for index in range(2000)
+        ])
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+def contact_body(number: int) -> dict:
+    return dict(first_name="Plan", last_name="Check", email=f"plan{number}@example.com",
+                phone_number=f"+9{number:010d}", birthday=date(1990, 5, 17))
+
+
+async def contacts_workload(db, user):
+    today = date.today()
+    await repository_contacts.get_contact(db, user, 1)
+    await repository_contacts.get_contact_by_email(db, user, "contact1@example.com")
+    await repository_contacts.get_contact_by_phone(db, user, "+10000000001")
+    await repository_contacts.get_contact_by_caller(db, user, "+10000000001")
+    await repository_contacts.get_contacts_for_dedup(db, user.id)
+    await repository_contacts.get_contacts_for_autocomplete(db, user.id)
+    await repository_contacts.get_contacts(db, user, skip=10, limit=10)
+    await repository_contacts.get_contacts_rows(db, user, skip=10, limit=10, fields=["first_name"])
+    await repository_contacts.get_contacts_by_ids(db, user, [1, 6, 11])
+    await repository_contacts.search_contacts(db, user, first_name="First1", last_name="Last1")
+    await repository_contacts.refresh_upcoming_birthdays(db, [1, 2], today, 7)
+    await repository_contacts.get_upcoming_birthdays(db, user, today, today + timedelta(days=7))
+    await repository_contacts.get_digest_birthdays(db, [1, 2], today, today + timedelta(days=7))
+    contact = await repository_contacts.create_contact(db, user, ContactBase(**contact_body(1)))
+    await repository_contacts.update_contact(db, user, contact, ContactUpdate(completed=True, **contact_body(2)))
+    await repository_contacts.delete_contact(db, user, contact.id)
+    operations = ContactOperations(operations=[
+        {"op": "create", "contact": contact_body(3)},
+        {"op": "update", "id": 6, "contact": contact_body(4)},
+        {"op": "delete", "id": 11},
+    ]).operations
+    await repository_contacts.apply_contact_operations(db, user, operations)
+    await repository_contacts.purge_contacts_batch(db, 5, 10)
+
+
+async def tags_workload(db, user):
+    family = await repository_tags.create_tag(db, user, TagModel(name="family"))
+    work = await repository_tags.create_tag(db, user, TagModel(name="work"))
+    await repository_tags.get_tags(db, user)
+    await repository_tags.get_tag(db, user, family.id)
+    await repository_tags.assign_tag(db, user, family, [1, 6, 11, 16])
+    await repository_tags.assign_tag(db, user, work, [6, 16])
+    await repository_contacts.get_contacts_rows(db, user, all_tags=[family.id, work.id])
+    await repository_contacts.get_contacts_rows(db, user, any_tags=[family.id, work.id])
+    await repository_contacts.search_contacts(db, user, last_name="Last1", all_tags=[family.id], any_tags=[work.id])
+    await repository_contacts.merge_contacts(db, user, 1, [6])
+    await repository_tags.unassign_tag(db, user, family, [1])
+    await repository_tags.delete_tag(db, work)
+
+
+async def counters_workload(db, user):
+    await repository_contacts.create_contact(db, user, ContactBase(**contact_body(901)))
+    await repository_counters.get_total(db, user)
+    await repository_counters.get_counters(db, user)
+    await repository_counters.reconcile_counters(db, [user.id, 3])
+
+
+async def users_workload(db, user):
+    await repository_users.get_user_by_email(user.email, db)
+    await repository_users.get_active_users(db, after_id=0, limit=2)
+    await repository_users.update_token(user, "token", db)
+    await repository_users.confirmed_email(user.email, db)
+    await repository_users.update_avatar(user.email, "https://example.com/avatar.png", db)
+    await repository_users.disable_user(user, db)
+    await repository_users.delete_user(4, db)
+
+
+@pytest.mark.parametrize("workload", [contacts_workload, tags_workload, counters_workload, users_workload])
+def test_repository_queries_use_indexes(plan_engine, workload):
+    db = sessionmaker(autocommit=False, autoflush=False, bind=plan_engine)()
+    try:
+        user = db.get(User, 1)
+        with capture_statements(plan_engine) as statements:
+            asyncio.run(workload(db, user))
+    finally:
+        db.close()
+    assert statements
+    problems = check_plans(plan_engine, statements, WATCHED_TABLES)
+    assert not problems, "\n\n".join(f"{p['tables']} scanned by:\n{p['statement']}\n{p['plan']}" for p in problems)
+
+
+@pytest.mark.parametrize("sort", ["first_name", "-last_name", "birthday", "-created"])
+def test_sorted_pages_read_indexes_in_order(plan_engine, sort):
+    db = sessionmaker(autocommit=False, autoflush=False, bind=plan_engine)()
+    try:
+        user = db.get(User, 2)
+        with capture_statements(plan_engine) as statements:
+            asyncio.run(repository_contacts.get_contacts_rows(db, user, skip=20, limit=10, sort=sort,
+                                                              filters=["last_name:startswith:Last"]))
+    finally:
+        db.close()
+    problems = check_plans(plan_engine, statements, WATCHED_TABLES, no_sorts=True)
+    assert not problems, "\n\n".join(f"{p['statement']}\n{p['plan']}" for p in problems)
+
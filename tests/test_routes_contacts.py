@@ -0,0 +1,41 @@
+import unittest
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from src.database.models import Contact, User
+from src.routes.contacts import update_contact
+from src.schemas import ContactUpdate
+
+
+class TestUpdateContact(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.session = MagicMock(spec=Session)
+        self.user = User(id=1)
+        self.db_contact = Contact(id=1, first_name="A", last_name="B", email="a@example.com",
+                                  phone_number="0501234567", birthday=date(1990, 5, 17), user_id=1)
+        self.body = ContactUpdate(first_name="A", last_name="C", email="a@example.com",
+                                  phone_number="+380 50 123 4567", birthday=date(1990, 5, 17), completed=True)
+
+    async def update(self, duplicate):
+        with patch("src.routes.contacts.contacts.get_contact", AsyncMock(return_value=self.db_contact)), \
+                patch("src.routes.contacts.contacts.get_contact_by_phone", AsyncMock(return_value=duplicate)), \
+                patch("src.routes.contacts.contacts.update_contact", AsyncMock(return_value=self.db_contact)), \
+                patch("src.routes.contacts._contacts_changed"):
+            return await update_contact(1, self.body, db=self.session, current_user=self.user)
+
+    async def test_same_number_in_another_format(self):
+        self.assertIs(await self.update(self.db_contact), self.db_contact)
+
+    async def test_number_of_another_contact(self):
+        self.body.phone_number = "+380 50 765 4321"
+        with self.assertRaises(HTTPException) as error:
+            await self.update(Contact(id=2))
+        self.assertEqual(error.exception.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
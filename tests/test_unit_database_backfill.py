@@ -0,0 +1,69 @@
+import unittest
+from unittest.mock import patch
+
+import sqlalchemy as sa
+from sqlalchemy.pool import StaticPool
+
+from src.database.backfill import BACKFILLS, Backfill, get_progress, reset_progress, run_backfill
+from src.database.models import Base, Contact, User
+
+
+class TestRunBackfill(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = sa.create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(self.engine)
+        with self.engine.begin() as conn:
+            conn.execute(sa.insert(User), [{"id": 1, "username": "u", "email": "u@example.com", "password": "x"}])
+            conn.execute(sa.insert(Contact), [
+                {"id": index, "first_name": "A", "last_name": "B", "email": f"c{index}@example.com",
+                 "phone_number": f"050 123 {index:04d}", "user_id": 1}
+                for index in range(1, 26)
+            ])
+        self.backfill = BACKFILLS["contacts_phone_e164"]
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def filled(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.scalar(sa.select(sa.func.count(Contact.phone_e164)))
+
+    def test_resumes_after_last_batch(self):
+        self.assertEqual(run_backfill(self.engine, self.backfill, batch_size=10, pause=0, max_batches=2), 20)
+        with self.engine.connect() as conn:
+            progress = get_progress(conn, "contacts_phone_e164")
+        self.assertEqual((progress.last_key, progress.rows, progress.done), (20, 20, False))
+        self.assertEqual(run_backfill(self.engine, self.backfill, batch_size=10, pause=0), 5)
+        self.assertEqual(self.filled(), 25)
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.scalar(sa.select(Contact.phone_e164).where(Contact.id == 7)), "+380501230007")
+            self.assertTrue(get_progress(conn, "contacts_phone_e164").done)
+
+    def test_done_backfill_is_skipped_until_reset(self):
+        run_backfill(self.engine, self.backfill, pause=0)
+        with self.engine.begin() as conn:
+            conn.execute(sa.update(Contact).values(phone_e164=None))
+        self.assertEqual(run_backfill(self.engine, self.backfill, pause=0), 0)
+        reset_progress(self.engine, "contacts_phone_e164")
+        self.assertEqual(run_backfill(self.engine, self.backfill, pause=0), 25)
+
+    def test_rows_already_done_are_not_rewritten(self):
+        with self.engine.begin() as conn:
+            conn.execute(sa.update(Contact).where(Contact.id <= 20).values(created_at=sa.func.now()))
+            conn.execute(sa.update(Contact).where(Contact.id > 20).values(created_at=None))
+        self.assertEqual(run_backfill(self.engine, BACKFILLS["contacts_created_at"], pause=0, track_progress=False), 5)
+        with self.engine.connect() as conn:
+            self.assertIsNone(get_progress(conn, "contacts_created_at"))
+
+    def test_slow_batches_shrink(self):
+        with patch("src.database.backfill.settings.backfill_batch_seconds", 0):
+            self.assertEqual(run_backfill(self.engine, self.backfill, batch_size=8, pause=0, max_batches=4), 15)
+
+    def test_backfill_must_implement_apply(self):
+        with self.assertRaises(TypeError):
+            Backfill("incomplete", sa.table("contacts", sa.column("id", sa.Integer)))
+
+
+if __name__ == '__main__':
+    unittest.main()
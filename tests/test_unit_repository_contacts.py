@@ -3,11 +3,14 @@ import unittest
 from unittest.mock import MagicMock
 from datetime import datetime, date, timedelta
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
 
-from src.repository.contacts import get_contacts, get_contact, get_contact_by_phone, get_contact_by_email, create_contact,update_contact, delete_contact, get_contacts_by_birthday, search_contacts
-from src.schemas import ContactBase, ContactUpdate
-from src.database.models import Contact, User
+from src.repository.contacts import get_contacts, get_contacts_rows, get_contacts_by_ids, apply_contact_operations, merge_contacts, purge_contacts_batch, get_contact, get_contact_by_phone, get_contact_by_caller, get_contact_by_email, create_contact,update_contact, delete_contact, search_contacts, contact_columns, CONTACT_COLUMNS, next_birthday, get_upcoming_birthdays, refresh_upcoming_birthdays
+from src.services.phones import normalize_phone
+from src.schemas import ContactBase, ContactUpdate, ContactOperations
+from src.database.models import Base, Contact, User
 
 
 class TestContacts(unittest.IsolatedAsyncioTestCase):
@@ -30,6 +33,41 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             db=self.session, user=self.user, skip=0, limit=10
         )
         self.assertEqual(contacts, contacts_item)
+
+    async def test_get_contacts_rows(self):
+        row = {"id": 1, "first_name": "Bob", "last_name": "Black", "email": "bob@example.com",
+               "phone_number": "12345678910", "birthday": date(year=1999, month=5, day=12)}
+        self.session.execute().mappings.return_value = [row]
+        contacts = await get_contacts_rows(
+            db=self.session, user=self.user, skip=0, limit=10
+        )
+        self.assertEqual(contacts, [row])
+        self.assertIsInstance(contacts[0], dict)
+
+    async def test_get_contacts_rows_fields(self):
+        row = {"id": 1, "first_name": "Bob"}
+        self.session.execute().mappings.return_value = [row]
+        contacts = await get_contacts_rows(
+            db=self.session, user=self.user, skip=0, limit=10, fields=["first_name"]
+        )
+        self.assertEqual(contacts, [row])
+
+    async def test_get_contacts_by_ids(self):
+        rows = [{"id": 1, "first_name": "Bob"}, {"id": 3, "first_name": "Ann"}]
+        self.session.execute().mappings.return_value = rows
+        contacts = await get_contacts_by_ids(
+            db=self.session, user=self.user, contact_ids=[3, 2, 1, 3]
+        )
+        self.assertEqual([contact["id"] for contact in contacts], [3, 1])
+
+    async def test_get_contacts_by_ids_empty(self):
+        contacts = await get_contacts_by_ids(db=self.session, user=self.user, contact_ids=[])
+        self.assertEqual(contacts, [])
+
+    def test_contact_columns(self):
+        columns = contact_columns(["first_name", "last_name"])
+        self.assertEqual([column.key for column in columns], ["first_name", "last_name", "id"])
+        self.assertEqual(contact_columns(), CONTACT_COLUMNS)
     
 
     async def test_get_contact(self):
@@ -60,6 +98,16 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             db=self.session, user=self.user, phone_number = "12345678910")
         self.assertEqual(contacts, None)
 
+    async def test_get_contact_by_caller(self):
+        self.session.execute().mappings().first.return_value = {"id": 1, "first_name": "Bob"}
+        contact = await get_contact_by_caller(db=self.session, user=self.user, phone_e164="+380501234567")
+        self.assertEqual(contact, {"id": 1, "first_name": "Bob"})
+
+    async def test_get_contact_by_caller_None(self):
+        self.session.execute().mappings().first.return_value = None
+        contact = await get_contact_by_caller(db=self.session, user=self.user, phone_e164="+380501234567")
+        self.assertIsNone(contact)
+
     async def test_get_contact_by_email(self):
         contact = Contact()
         self.session.query().filter().first.return_value = contact
@@ -86,6 +134,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(new_contact.first_name, contact_data.first_name)
         self.assertEqual(new_contact.email, contact_data.email)
         self.assertEqual(new_contact.phone_number, contact_data.phone_number)
+        self.assertEqual(new_contact.phone_e164, normalize_phone(contact_data.phone_number))
         self.assertTrue(hasattr(new_contact, "id"))
 
     async def test_update_contact(self):
@@ -117,20 +166,128 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         self.assertIsNone(contacts)
 
     async def test_delete_contact(self):
-        get_contact.return_value = Contact()
+        self.session.query().filter().first.return_value = Contact(id=1, birthday=date(year=1999, month=5, day=12))
         res = await delete_contact(
             contact_id=1, user=self.user, db=self.session
         )
         self.assertIsNone(res)
 
 
-    async def test_get_contacts_by_birthday(self):
-        contacts_item = [Contact(), Contact(), Contact()]
-        self.session.query().where().all.return_value = contacts_item
+    async def test_apply_contact_operations(self):
+        contact_data = dict(first_name="Bob", last_name="Black", email="bob@example.com",
+                            phone_number="12345678910", birthday=date(year=1999, month=5, day=12))
+        operations = ContactOperations(operations=[
+            {"op": "create", "contact": contact_data},
+            {"op": "create", "contact": contact_data},
+            {"op": "delete", "id": 1},
+            {"op": "delete", "id": 2},
+        ]).operations
+        inserted = MagicMock()
+        inserted.all.return_value = [5]
+        self.session.execute.return_value.all.return_value = [(1, date(year=1980, month=1, day=2))]
+        self.session.scalars.return_value = inserted
+        results = await apply_contact_operations(db=self.session, user=self.user, operations=operations)
+        self.assertEqual([result["status"] for result in results], [201, 400, 204, 404])
+        self.assertEqual(results[0]["id"], 5)
+        self.session.commit.assert_called_once()
+
+    async def test_merge_contacts(self):
+        keep = Contact(id=1, first_name="Bob", last_name="Black", email="bob@example.com",
+                       phone_number=None, phone_e164=None, birthday=None, user_id=1)
+        duplicate = Contact(id=2, first_name="Bobby", last_name="Black", email="bobby@example.com",
+                            phone_number="0501234567", phone_e164=None,
+                            birthday=date(year=1999, month=5, day=12), user_id=1)
+        self.session.scalars.return_value = [keep, duplicate]
+        merged = await merge_contacts(db=self.session, user=self.user, keep_id=1, merge_ids=[2])
+        self.assertIs(merged, keep)
+        self.assertEqual(merged.first_name, "Bob")
+        self.assertEqual(merged.phone_e164, "+380501234567")
+        self.assertEqual(merged.birthday, date(year=1999, month=5, day=12))
+        self.session.commit.assert_called_once()
+
+    async def test_merge_contacts_not_found(self):
+        self.session.scalars.return_value = [Contact(id=1, user_id=1)]
+        with self.assertRaises(HTTPException) as context:
+            await merge_contacts(db=self.session, user=self.user, keep_id=1, merge_ids=[2])
+        self.assertEqual(context.exception.status_code, status.HTTP_404_NOT_FOUND)
+        self.session.commit.assert_not_called()
+
+    async def test_purge_contacts_batch(self):
+        self.session.execute().all.return_value = [Contact(id=contact_id, birthday=None) for contact_id in (1, 2, 3)]
+        deleted = await purge_contacts_batch(db=self.session, user_id=1, batch_size=3)
+        self.assertEqual(deleted, 3)
+        self.session.commit.assert_called_once()
+
+    async def test_purge_contacts_batch_empty(self):
+        self.session.execute().all.return_value = []
+        deleted = await purge_contacts_batch(db=self.session, user_id=1, batch_size=3)
+        self.assertEqual(deleted, 0)
+        self.session.commit.assert_not_called()
+
+    async def test_next_birthday(self):
+        today = date(year=2026, month=12, day=30)
+        self.assertEqual(next_birthday(date(year=1999, month=12, day=31), today), date(year=2026, month=12, day=31))
+        self.assertEqual(next_birthday(date(year=1999, month=12, day=30), today), today)
+        self.assertEqual(next_birthday(date(year=1999, month=1, day=2), today), date(year=2027, month=1, day=2))
+        self.assertEqual(next_birthday(date(year=2000, month=2, day=29), today), date(year=2027, month=3, day=1))
+        self.assertIsNone(next_birthday(None, today))
+
+    async def test_get_upcoming_birthdays(self):
+        row = {"id": 1, "first_name": "Bob"}
+        self.session.execute().mappings.return_value = [row]
         today = date.today()
-        week_later = today + timedelta(days=7)
-        birthdays =  await get_contacts_by_birthday(user=self.user, db=self.session, start_date=today, end_date=week_later)
-        self.assertEqual(contacts_item, birthdays)
+        birthdays = await get_upcoming_birthdays(db=self.session, user=self.user, start_date=today,
+                                                 end_date=today + timedelta(days=7))
+        self.assertEqual(birthdays, [row])
+
+    async def test_refresh_upcoming_birthdays(self):
+        today = date(year=2026, month=12, day=30)
+        Row = type("Row", (), {})
+        rows = []
+        for contact_id, birthday in ((1, date(year=1990, month=1, day=2)), (2, date(year=1990, month=6, day=1))):
+            row = Row()
+            row.id, row.user_id, row.birthday = contact_id, 1, birthday
+            rows.append(row)
+        self.session.execute.side_effect = [rows, None, None]
+        stored = await refresh_upcoming_birthdays(db=self.session, user_ids=[1], today=today, days=7)
+        self.assertEqual(stored, 1)
+        self.assertEqual(self.session.execute.call_args.args[1],
+                         [{"contact_id": 1, "user_id": 1, "next_birthday": date(year=2027, month=1, day=2)}])
+        self.session.commit.assert_called_once()
+
+
+class TestApplyContactOperationsPhones(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.session.execute(insert(User), [{"id": 1, "username": "u", "email": "u@example.com", "password": "x"}])
+        self.session.execute(insert(Contact), [
+            {"id": 1, "first_name": "A", "last_name": "B", "email": "a@example.com", "phone_number": "call me later",
+             "phone_e164": None, "user_id": 1},
+            {"id": 2, "first_name": "C", "last_name": "D", "email": "c@example.com", "phone_number": "0501234567",
+             "phone_e164": "+380501234567", "user_id": 1},
+        ])
+        self.session.commit()
+        self.user = User(id=1)
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    async def test_phone_duplicates_are_reported_per_operation(self):
+        contact = dict(first_name="E", last_name="F", birthday=date(year=1999, month=5, day=12))
+        operations = ContactOperations(operations=[
+            {"op": "create", "contact": {**contact, "email": "e@example.com", "phone_number": "call me later"}},
+            {"op": "create", "contact": {**contact, "email": "f@example.com", "phone_number": "+380 50 123 4567"}},
+            {"op": "create", "contact": {**contact, "email": "g@example.com", "phone_number": "0509876543"}},
+        ]).operations
+        results = await apply_contact_operations(db=self.session, user=self.user, operations=operations)
+        self.assertEqual([result["status"] for result in results], [400, 400, 201])
+        self.assertEqual(results[0]["detail"], "Phone number already registered")
+        self.assertEqual(len(self.session.scalars(select(Contact.id)).all()), 3)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from collections import Counter
+from datetime import date
+
+from sqlalchemy import create_engine, insert, update, delete
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database.models import Base, Contact, ContactCounter, User
+from src.repository.counters import (TOTAL, change_birthday, count_contacts, get_counters, get_total,
+                                     reconcile_counters, stage_counters)
+
+
+class TestCounterChanges(unittest.TestCase):
+
+    def test_count_contacts(self):
+        deltas = count_contacts(Counter(), [date(1990, 5, 17), None])
+        count_contacts(deltas, [date(1985, 5, 1)], sign=-1)
+        self.assertEqual(+deltas, Counter({TOTAL: 1}))
+
+    def test_change_birthday(self):
+        deltas = change_birthday(Counter(), date(1990, 5, 17), date(1990, 7, 1))
+        change_birthday(deltas, None, date(1990, 7, 2))
+        self.assertEqual(deltas, Counter({"birthdays:05": -1, "birthdays:07": 2}))
+
+
+class TestCounters(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.session.execute(insert(User), [{"id": 1, "username": "u", "email": "u@example.com", "password": "x"},
+                                            {"id": 2, "username": "v", "email": "v@example.com", "password": "x"}])
+        self.session.execute(insert(Contact), [
+            {"id": index, "first_name": "A", "last_name": "B", "email": f"c{index}@example.com",
+             "phone_number": f"+38050123{index:04d}", "birthday": date(1990, index % 2 + 1, 1), "user_id": 1}
+            for index in range(1, 6)
+        ])
+        self.session.commit()
+        self.user = User(id=1)
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    async def test_stage_counters_adds_up(self):
+        stage_counters(self.session, 1, Counter({TOTAL: 2, "birthdays:01": 1, "birthdays:02": 0}))
+        stage_counters(self.session, 1, Counter({TOTAL: -1}))
+        self.session.commit()
+        self.assertEqual(await get_counters(self.session, self.user), {TOTAL: 1, "birthdays:01": 1})
+        self.assertEqual(await get_total(self.session, self.user), 1)
+        self.assertEqual(await get_total(self.session, User(id=2)), 0)
+
+    async def test_reconcile_repairs_drift(self):
+        repaired = await reconcile_counters(self.session, [1, 2])
+        self.assertEqual(repaired, {1: {TOTAL: (0, 5), "birthdays:01": (0, 2), "birthdays:02": (0, 3)}})
+        self.session.execute(update(ContactCounter).where(ContactCounter.name == TOTAL).values(value=9))
+        self.session.execute(delete(Contact).where(Contact.id == 2))
+        self.session.commit()
+        self.assertEqual(await reconcile_counters(self.session, [1, 2]),
+                         {1: {TOTAL: (9, 4), "birthdays:01": (2, 1)}})
+        self.assertEqual(await reconcile_counters(self.session, [1, 2]), {})
+        self.assertEqual(await get_counters(self.session, self.user),
+                         {TOTAL: 4, "birthdays:01": 1, "birthdays:02": 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from sqlalchemy.dialects import sqlite
+
+from src.database.models import Contact
+from src.repository.filters import compile_filter, compile_filters, compile_sort
+
+
+def sql(condition) -> str:
+    return str(condition.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+class TestCompileSort(unittest.TestCase):
+
+    def test_no_sort(self):
+        self.assertEqual(compile_sort(None), [])
+
+    def test_ascending_breaks_ties_by_id(self):
+        self.assertEqual([sql(clause) for clause in compile_sort("last_name")],
+                         ["contacts.last_name", "contacts.id"])
+
+    def test_descending(self):
+        self.assertEqual([sql(clause) for clause in compile_sort("-created")],
+                         ["contacts.created_at DESC", "contacts.id DESC"])
+
+    def test_unknown_key(self):
+        with self.assertRaises(ValueError):
+            compile_sort("password")
+
+
+class TestCompileFilter(unittest.TestCase):
+
+    def test_startswith_escapes_wildcards(self):
+        self.assertEqual(sql(compile_filter("last_name:startswith:50%_off")),
+                         "lower(contacts.last_name) LIKE lower('50\\%\\_off%') ESCAPE '\\'")
+
+    def test_value_may_contain_colons(self):
+        self.assertIn("'a:b'", sql(compile_filter("email:eq:a:b")))
+
+    def test_range_value_is_parsed(self):
+        self.assertEqual(sql(compile_filter("birthday:gte:1990-01-01")), "contacts.birthday >= '1990-01-01'")
+
+    def test_phone_is_normalized(self):
+        self.assertEqual(sql(compile_filter("phone:eq:+1 (415) 555-2671")), "contacts.phone_e164 = '+14155552671'")
+
+    def test_invalid_expressions(self):
+        for expression in ["password:eq:x", "last_name:gt:A", "birthday:lt:yesterday", "phone:eq:12",
+                           "first_name:eq:", "first_name"]:
+            with self.subTest(expression=expression):
+                with self.assertRaises(ValueError):
+                    compile_filter(expression)
+
+    def test_compile_filters(self):
+        self.assertEqual(compile_filters(None), [])
+        conditions = compile_filters(["first_name:eq:Anna", "birthday:lt:2000-01-01"])
+        self.assertEqual(len(conditions), 2)
+        self.assertIs(conditions[0].left.table, Contact.__table__)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import MagicMock
+
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.database.models import Tag, User
+from src.repository.tags import get_tags, get_tag, create_tag, delete_tag, assign_tag, unassign_tag, tag_conditions
+from src.schemas import TagModel
+
+
+class TestTags(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.session = MagicMock(spec=Session)
+        self.user = User(id=1)
+        self.tag = Tag(id=1, user_id=1, name="family")
+
+    async def test_get_tags(self):
+        self.session.scalars().all.return_value = [self.tag]
+        tags = await get_tags(db=self.session, user=self.user)
+        self.assertEqual(tags, [self.tag])
+
+    async def test_get_tag_None(self):
+        self.session.scalars().first.return_value = None
+        tag = await get_tag(db=self.session, user=self.user, tag_id=2)
+        self.assertIsNone(tag)
+
+    async def test_create_tag(self):
+        tag = await create_tag(db=self.session, user=self.user, body=TagModel(name="work"))
+        self.assertEqual(tag.name, "work")
+        self.assertEqual(tag.user_id, 1)
+        self.session.commit.assert_called_once()
+
+    async def test_create_tag_exists(self):
+        self.session.commit.side_effect = IntegrityError("INSERT", {}, Exception())
+        with self.assertRaises(HTTPException) as context:
+            await create_tag(db=self.session, user=self.user, body=TagModel(name="family"))
+        self.assertEqual(context.exception.status_code, status.HTTP_409_CONFLICT)
+        self.session.rollback.assert_called_once()
+
+    async def test_delete_tag(self):
+        await delete_tag(db=self.session, tag=self.tag)
+        self.assertEqual(self.session.execute.call_count, 2)
+        self.session.commit.assert_called_once()
+
+    async def test_assign_tag(self):
+        self.session.execute().rowcount = 2
+        count = await assign_tag(db=self.session, user=self.user, tag=self.tag, contact_ids=[1, 2, 2])
+        self.assertEqual(count, 2)
+        self.session.commit.assert_called_once()
+
+    async def test_unassign_tag(self):
+        self.session.execute().rowcount = 1
+        count = await unassign_tag(db=self.session, user=self.user, tag=self.tag, contact_ids=[1])
+        self.assertEqual(count, 1)
+
+    async def test_tag_conditions(self):
+        self.assertEqual(tag_conditions(1), [])
+        self.assertEqual(len(tag_conditions(1, all_tags=[1, 2, 2])), 2)
+        self.assertEqual(len(tag_conditions(1, all_tags=[1], any_tags=[3, 4])), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,7 @@ from unittest.mock import MagicMock
 
 from sqlalchemy.orm import Session
 
-from src.repository.users import get_user_by_email, create_user, update_token, confirmed_email, update_avatar
+from src.repository.users import get_user_by_email, create_user, update_token, confirmed_email, update_avatar, disable_user, delete_user
 from src.schemas import UserModel
 from src.database.models import User
 
@@ -48,6 +48,17 @@ class TestUsers(unittest.IsolatedAsyncioTestCase):
         )
         user_from_email = await get_user_by_email(self.email, self.session)
         self.assertEqual(res, user_from_email)
+    async def test_disable_user(self):
+        res = await disable_user(user=self.user, db=self.session)
+        self.assertIsNone(res)
+        self.assertTrue(self.user.disabled)
+        self.assertIsNone(self.user.refresh_token)
+
+    async def test_delete_user(self):
+        res = await delete_user(user_id=1, db=self.session)
+        self.assertIsNone(res)
+        self.session.execute.assert_called_once()
+        self.session.commit.assert_called_once()
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
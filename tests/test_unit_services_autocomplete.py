@@ -0,0 +1,71 @@
+import unittest
+from collections import namedtuple
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.database.models import User
+from src.services.autocomplete import PrefixIndex, AutocompleteIndexes
+
+Row = namedtuple("Row", "id first_name last_name email")
+
+ROWS = [
+    Row(1, "Bob", "Black", "bob@example.com"),
+    Row(2, "Bobby", "White", "bw@example.com"),
+    Row(3, "Alice", "Bobrova", "alice@example.com"),
+]
+
+
+class TestPrefixIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = PrefixIndex.build(ROWS)
+
+    def test_search(self):
+        self.assertEqual([contact["id"] for contact in self.index.search("bob", 10)], [1, 2, 3])
+        self.assertEqual([contact["id"] for contact in self.index.search("Bob B", 10)], [1])
+        self.assertEqual([contact["id"] for contact in self.index.search("ali", 10)], [3])
+        self.assertEqual(self.index.search("zed", 10), [])
+
+    def test_search_limit(self):
+        self.assertEqual(len(self.index.search("b", 2)), 2)
+
+    def test_add_and_remove(self):
+        self.index.add(Row(4, "Boris", "Brown", "boris@example.com"))
+        self.index.add(Row(1, "Robert", "Black", "robert@example.com"))
+        self.index.remove(2)
+        self.assertEqual([contact["id"] for contact in self.index.search("bo", 10)], [3, 4])
+        self.assertEqual(self.index.search("rob", 10)[0]["first_name"], "Robert")
+        self.assertEqual(self.index.terms, sorted(self.index.terms))
+
+
+class TestAutocompleteIndexes(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.indexes = AutocompleteIndexes(max_users=1)
+        self.db = MagicMock()
+
+    @patch("src.services.autocomplete.contacts_version", return_value=b"1")
+    @patch("src.services.autocomplete.repository_contacts.get_contacts_for_autocomplete", new_callable=AsyncMock)
+    async def test_built_once_per_version(self, load, version):
+        load.return_value = ROWS
+        await self.indexes.get(self.db, User(id=1))
+        await self.indexes.get(self.db, User(id=1))
+        self.assertEqual(load.await_count, 1)
+        version.return_value = b"2"
+        await self.indexes.get(self.db, User(id=1))
+        self.assertEqual(load.await_count, 2)
+
+    @patch("src.services.autocomplete.contacts_version", return_value=b"1")
+    @patch("src.services.autocomplete.repository_contacts.get_contacts_for_autocomplete", new_callable=AsyncMock)
+    async def test_least_recently_used_user_is_dropped(self, load, version):
+        load.return_value = ROWS
+        await self.indexes.get(self.db, User(id=1))
+        await self.indexes.get(self.db, User(id=2))
+        self.assertEqual(list(self.indexes.indexes), [2])
+
+    async def test_contacts_changed(self):
+        self.indexes.indexes[1] = PrefixIndex.build(ROWS, version=b"1")
+        self.indexes.contacts_changed(1, b"1", b"2", deleted=[3])
+        self.assertEqual(self.indexes.indexes[1].version, b"2")
+        self.assertEqual(self.indexes.indexes[1].search("ali", 10), [])
+        self.indexes.contacts_changed(1, b"5", b"6", deleted=[2])
+        self.assertNotIn(1, self.indexes.indexes)
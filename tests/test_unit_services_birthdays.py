@@ -0,0 +1,36 @@
+import unittest
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi_mail.errors import ConnectionErrors
+
+from src.services.birthdays import send_digests
+
+
+class TestSendDigests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_failed_email_does_not_stop_the_others(self):
+        users = [SimpleNamespace(id=index, username=f"u{index}", email=f"u{index}@example.com", birthday_digest=True)
+                 for index in range(1, 4)]
+        users.append(SimpleNamespace(id=4, username="u4", email="u4@example.com", birthday_digest=False))
+        digests = {1: ["a"], 2: ["b"], 3: ["c"], 4: ["d"]}
+        send = AsyncMock(side_effect=[None, ConnectionError("smtp down"), None])
+        with patch("src.services.birthdays.send_birthday_digest", send), \
+                self.assertLogs("src.services.birthdays", "ERROR") as logs:
+            self.assertEqual(await send_digests(users, digests), 2)
+        self.assertEqual(send.await_count, 3)
+        self.assertIn("user 2", logs.output[0])
+
+    async def test_smtp_error_is_not_counted_as_sent(self):
+        users = [SimpleNamespace(id=1, username="u1", email="u1@example.com", birthday_digest=True)]
+        digests = {1: [{"first_name": "A", "last_name": "B", "next_birthday": date(2026, 5, 17)}]}
+        mail = MagicMock()
+        mail.send_message = AsyncMock(side_effect=ConnectionErrors("smtp down"))
+        with patch("src.services.email.get_mail", return_value=mail), \
+                self.assertLogs("src.services.birthdays", "ERROR"):
+            self.assertEqual(await send_digests(users, digests), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from unittest.mock import patch
+
+from src.services.breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10)
+
+    def test_opens_after_threshold(self):
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_success_resets_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_half_open_allows_one_trial(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        with patch("src.services.breaker.time.monotonic", return_value=self.breaker.opened_at + 11):
+            self.assertTrue(self.breaker.allow())
+            self.assertEqual(self.breaker.state, HALF_OPEN)
+            self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_trial_opens_again(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        with patch("src.services.breaker.time.monotonic", return_value=self.breaker.opened_at + 11):
+            self.breaker.allow()
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+
+
+if __name__ == '__main__':
+    unittest.main()
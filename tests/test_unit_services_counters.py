@@ -0,0 +1,46 @@
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database.models import Base, Contact, User
+from src.services.counters import reconcile_all
+
+
+class TestReconcileAll(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(self.engine)
+        with self.engine.begin() as conn:
+            conn.execute(insert(User), [{"id": user_id, "username": f"u{user_id}", "email": f"u{user_id}@example.com",
+                                         "password": "x"} for user_id in (1, 2, 3)])
+            conn.execute(insert(Contact), [
+                {"id": index, "first_name": "A", "last_name": "B", "email": f"c{index}@example.com",
+                 "phone_number": f"+38050123{index:04d}", "user_id": index % 2 + 1}
+                for index in range(1, 6)
+            ])
+        patcher = patch("src.services.counters.SessionLocal", sessionmaker(bind=self.engine))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    async def test_drift_is_reported(self):
+        with self.assertLogs("src.services.counters", "WARNING") as logs:
+            totals = await reconcile_all(chunk_size=2)
+        self.assertEqual(totals, {"users": 3, "drifted": 2, "repaired": 2})
+        self.assertEqual(len(logs.output), 2)
+
+    async def test_first_fill_is_quiet(self):
+        with self.assertNoLogs("src.services.counters", "WARNING"):
+            totals = await reconcile_all(report_drift=False)
+        self.assertEqual(totals["drifted"], 2)
+        self.assertEqual(await reconcile_all(), {"users": 3, "drifted": 0, "repaired": 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
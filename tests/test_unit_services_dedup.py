@@ -0,0 +1,37 @@
+import unittest
+from collections import namedtuple
+from datetime import date
+
+from src.services.dedup import soundex, blocking_keys, find_duplicates
+
+Row = namedtuple("Row", "id first_name last_name email phone_e164 birthday")
+
+
+class TestDedup(unittest.TestCase):
+
+    def test_soundex(self):
+        self.assertEqual(soundex("Robert"), "R163")
+        self.assertEqual(soundex("Rupert"), "R163")
+        self.assertEqual(soundex("Ashcraft"), "A261")
+        self.assertEqual(soundex("Tymczak"), "T522")
+        self.assertEqual(soundex(""), "")
+
+    def test_blocking_keys(self):
+        row = Row(1, "Bob", "Black", "Bob@Example.com", "+380501234567", None)
+        self.assertEqual(blocking_keys(row), [("phone", "+380501234567"), ("email", "bob@example.com"),
+                                              ("name", "B100B420")])
+
+    def test_find_duplicates(self):
+        rows = [
+            Row(1, "Bob", "Black", "bob@example.com", "+380501234567", date(1990, 1, 1)),
+            Row(2, "Bobby", "Black", "BOB@example.com", "+380991112233", date(1990, 1, 1)),
+            Row(3, "Bob", "Black", "other@example.com", "+380671112233", date(1985, 2, 2)),
+            Row(4, "Alice", "White", "alice@example.com", "+380501234567", None),
+        ]
+        candidates = find_duplicates(rows, min_score=0.6, max_block=10)
+        self.assertEqual([candidate["ids"] for candidate in candidates], [[1, 2]])
+        self.assertEqual(candidates[0]["reasons"], ["email", "birthday", "name"])
+
+    def test_large_blocks_are_skipped(self):
+        rows = [Row(index, "Bob", "Black", "bob@example.com", None, None) for index in range(5)]
+        self.assertEqual(find_duplicates(rows, min_score=0.6, max_block=4), [])
@@ -0,0 +1,76 @@
+import asyncio
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+import fakeredis
+import fakeredis.aioredis
+import orjson
+
+from src.database.models import Contact
+from src.services.auth import auth_service
+from src.services.events import EventBroker, RESYNC, TooManyConnections, publish_contact_events
+
+
+class TestEventBroker(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        server = fakeredis.FakeServer()
+        self.previous_redis = auth_service._redis
+        auth_service.r = fakeredis.FakeRedis(server=server)
+        self.broker = EventBroker()
+        await self.broker.start(fakeredis.aioredis.FakeRedis(server=server))
+
+    async def asyncTearDown(self):
+        await self.broker.stop()
+        auth_service.r = self.previous_redis
+
+    async def next_event(self, queue: asyncio.Queue) -> dict:
+        return orjson.loads(await asyncio.wait_for(queue.get(), 3))
+
+    async def test_events_reach_the_users_streams(self):
+        first = await self.broker.subscribe(1)
+        second = await self.broker.subscribe(1)
+        other = await self.broker.subscribe(2)
+        contact = Contact(id=5, first_name="Anna", last_name="Koval", email="anna@example.com",
+                          phone_number="0501234567", birthday=date(1990, 5, 17))
+        publish_contact_events(1, b"7", created=[contact], deleted=[3])
+        for queue in (first, second):
+            created = await self.next_event(queue)
+            self.assertEqual((created["type"], created["version"], created["contact"]["id"]), ("created", "7", 5))
+            self.assertEqual(await self.next_event(queue), {"type": "deleted", "version": "7", "id": 3})
+        self.assertTrue(other.empty())
+
+    async def test_slow_stream_gets_resync(self):
+        queue = await self.broker.subscribe(1)
+        with patch("src.services.events.settings.events_queue_size", 2):
+            slow = await self.broker.subscribe(2)
+        for number in range(3):
+            self.broker.dispatch(2, f"event {number}")
+        self.assertEqual(slow.qsize(), 1)
+        self.assertEqual(slow.get_nowait(), RESYNC)
+        self.assertTrue(queue.empty())
+
+    async def test_last_stream_unsubscribes_the_channel(self):
+        first = await self.broker.subscribe(1)
+        second = await self.broker.subscribe(1)
+        await self.broker.unsubscribe(1, first)
+        self.assertIn(b"contacts:1:events", self.broker.pubsub.channels)
+        await self.broker.unsubscribe(1, second)
+        await self.broker.unsubscribe(1, second)
+        self.assertEqual((self.broker.queues, self.broker.connections), ({}, 0))
+
+    async def test_connection_limit(self):
+        with patch("src.services.events.settings.events_max_connections", 1):
+            await self.broker.subscribe(1)
+            with self.assertRaises(TooManyConnections):
+                await self.broker.subscribe(2)
+
+    async def test_bulk_write_publishes_resync(self):
+        queue = await self.broker.subscribe(1)
+        publish_contact_events(1, b"8", resync=True)
+        self.assertEqual(await self.next_event(queue), {"type": "resync", "version": "8"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from unittest.mock import MagicMock
+
+import fakeredis
+import orjson
+from fastapi import HTTPException
+
+from src.services.auth import auth_service
+from src.services.idempotency import run_idempotent
+
+
+def make_request(path="/api/contacts/"):
+    request = MagicMock()
+    request.method = "POST"
+    request.url.path = path
+    request.headers = {}
+    return request
+
+
+class TestRunIdempotent(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.previous_redis = auth_service._redis
+        auth_service.r = fakeredis.FakeRedis()
+        self.calls = 0
+
+    def tearDown(self):
+        auth_service.r = self.previous_redis
+
+    async def handler(self):
+        self.calls += 1
+        return {"id": self.calls}
+
+    async def failing_handler(self):
+        self.calls += 1
+        raise HTTPException(status_code=400, detail="already registered")
+
+    async def test_retry_gets_stored_response(self):
+        first = await run_idempotent(make_request(), 1, "key", b"{}", self.handler, status_code=201)
+        retry = await run_idempotent(make_request(), 1, "key", b"{}", self.handler, status_code=201)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual((retry.status_code, orjson.loads(retry.body)), (201, {"id": 1}))
+        self.assertEqual(retry.body, first.body)
+        self.assertEqual(retry.headers["Idempotent-Replayed"], "true")
+
+    async def test_without_key_runs_every_time(self):
+        await run_idempotent(make_request(), 1, None, b"{}", self.handler)
+        await run_idempotent(make_request(), 1, None, b"{}", self.handler)
+        self.assertEqual(self.calls, 2)
+
+    async def test_keys_are_per_user(self):
+        await run_idempotent(make_request(), 1, "key", b"{}", self.handler)
+        await run_idempotent(make_request(), 2, "key", b"{}", self.handler)
+        self.assertEqual(self.calls, 2)
+
+    async def test_key_reused_for_different_request(self):
+        await run_idempotent(make_request(), 1, "key", b"{}", self.handler)
+        for request, payload in [(make_request(), b'{"a":1}'), (make_request("/api/contacts/bulk"), b"{}")]:
+            with self.subTest(path=request.url.path, payload=payload):
+                with self.assertRaises(HTTPException) as error:
+                    await run_idempotent(request, 1, "key", payload, self.handler)
+                self.assertEqual(error.exception.status_code, 422)
+        self.assertEqual(self.calls, 1)
+
+    async def test_request_in_progress(self):
+        auth_service.cache_lock("idempotency:1:key", 30000)
+        with self.assertRaises(HTTPException) as error:
+            await run_idempotent(make_request(), 1, "key", b"{}", self.handler)
+        self.assertEqual(error.exception.status_code, 409)
+        self.assertEqual(self.calls, 0)
+
+    async def test_failed_request_releases_key(self):
+        with self.assertRaises(HTTPException):
+            await run_idempotent(make_request(), 1, "key", b"{}", self.failing_handler)
+        self.assertIsNone(auth_service.cache_get("idempotency:1:key"))
+        await run_idempotent(make_request(), 1, "key", b"{}", self.handler)
+        self.assertEqual(self.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
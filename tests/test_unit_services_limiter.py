@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import HTTPException
+from fastapi_limiter import FastAPILimiter
+from redis.exceptions import ConnectionError
+
+from src.services.breaker import CircuitBreaker
+from src.services.limiter import ResilientRateLimiter, init_limiter
+
+
+def make_request():
+    request = MagicMock()
+    request.app.routes = []
+    request.scope = {"path": "/api/contacts/"}
+    request.headers = {}
+    request.client.host = "127.0.0.1"
+    return request
+
+
+class TestResilientRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10)
+        patcher = patch("src.services.limiter.redis_breaker", self.breaker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.saved = {name: getattr(FastAPILimiter, name) for name in ("redis", "prefix", "lua_sha", "identifier",
+                                                                        "http_callback")}
+        self.addCleanup(lambda: [setattr(FastAPILimiter, name, value) for name, value in self.saved.items()])
+
+    async def test_redis_down_at_startup_then_back(self):
+        redis = AsyncMock()
+        redis.script_load.side_effect = ConnectionError("down")
+        with self.assertLogs("src.services.limiter", "WARNING"):
+            await init_limiter(redis)
+        self.assertIsNone(FastAPILimiter.lua_sha)
+        limiter = ResilientRateLimiter(times=1, seconds=60)
+
+        redis.script_load.side_effect = None
+        redis.script_load.return_value = "sha"
+        redis.evalsha.return_value = 0
+        await limiter(make_request(), MagicMock())
+        redis.evalsha.assert_awaited_once()
+        self.assertEqual(redis.evalsha.await_args.args[0], "sha")
+        self.assertEqual(self.breaker.failures, 0)
+
+        redis.evalsha.return_value = 1000
+        with self.assertRaises(HTTPException) as error:
+            await limiter(make_request(), MagicMock())
+        self.assertEqual(error.exception.status_code, 429)
+        redis.script_load.assert_awaited()
+        self.assertEqual(redis.script_load.await_count, 2)
+
+    async def test_falls_back_to_local_window_while_redis_fails(self):
+        redis = AsyncMock()
+        redis.script_load.return_value = "sha"
+        redis.evalsha.side_effect = ConnectionError("down")
+        await init_limiter(redis)
+        limiter = ResilientRateLimiter(times=1, seconds=60)
+        await limiter(make_request(), MagicMock())
+        with self.assertRaises(HTTPException) as error:
+            await limiter(make_request(), MagicMock())
+        self.assertEqual(error.exception.status_code, 429)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from main import app as main_app
+from src.services.metrics import MetricsMiddleware, QueryStats, _query_stats, _repeated_logged, instrument_engine
+
+
+class TestInstrumentEngine(unittest.TestCase):
+
+    def test_statements_are_recorded_once(self):
+        engine = create_engine("sqlite://")
+        instrument_engine(engine)
+        instrument_engine(engine)
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        finally:
+            _query_stats.reset(token)
+            engine.dispose()
+        self.assertEqual(stats.count, 1)
+
+
+class TestMetricsMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        instrument_engine(self.engine)
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/items/{item_id}")
+        def read_item(item_id: int):
+            with self.engine.connect() as conn:
+                for _ in range(6):
+                    conn.execute(text("SELECT :id WHERE 1 = 1"), {"id": item_id})
+            return {"id": item_id}
+
+        self.client = TestClient(app)
+        _repeated_logged.clear()
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_and_statements_are_recorded(self):
+        labels = {"method": "GET", "route": "/items/{item_id}"}
+        requests = self.sample("http_requests_total", status="200", **labels)
+        queries = self.sample("sql_queries_per_request_sum", route=labels["route"])
+        repeated = self.sample("sql_repeated_queries_total", route=labels["route"])
+        with self.assertLogs("src.services.metrics", "WARNING") as logs:
+            self.assertEqual(self.client.get("/items/1").status_code, 200)
+            self.assertEqual(self.client.get("/items/2").status_code, 200)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("ran 6 statements", logs.output[0])
+        self.assertEqual(self.sample("http_requests_total", status="200", **labels) - requests, 2)
+        self.assertEqual(self.sample("sql_queries_per_request_sum", route=labels["route"]) - queries, 12)
+        self.assertEqual(self.sample("sql_repeated_queries_total", route=labels["route"]) - repeated, 10)
+
+    def test_shapes_repeated_twice_are_counted(self):
+        stats = QueryStats()
+        stats.record("SELECT contacts.id FROM contacts WHERE contacts.email = ?", 0.001)
+        stats.record("SELECT contacts.id FROM contacts WHERE contacts.phone_e164 = ?", 0.001)
+        stats.record("INSERT INTO contacts (first_name) VALUES (?)", 0.001)
+        self.assertEqual(stats.repeated(), {"SELECT contacts.id FROM contacts": 2})
+
+    def test_unmatched_route_shares_one_label(self):
+        before = self.sample("http_requests_total", method="GET", route="unmatched", status="404")
+        self.client.get("/nothing/1")
+        self.client.get("/nothing/2")
+        self.assertEqual(self.sample("http_requests_total", method="GET", route="unmatched", status="404") - before, 2)
+
+    def test_metrics_endpoint(self):
+        response = TestClient(main_app).get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn("http_requests_total", response.text)
+        self.assertIn("sql_queries_per_request", response.text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,18 @@
+import unittest
+
+from src.services.phones import normalize_phone
+
+
+class TestNormalizePhone(unittest.TestCase):
+
+    def test_same_number_in_different_formats(self):
+        for phone in ["+380 50 123 4567", "0501234567", "(050) 123-45-67", "00380501234567", "380501234567"]:
+            with self.subTest(phone=phone):
+                self.assertEqual(normalize_phone(phone, country_code="380"), "+380501234567")
+
+    def test_international_number_keeps_its_country(self):
+        self.assertEqual(normalize_phone("+1 (415) 555-2671", country_code="380"), "+14155552671")
+
+    def test_not_a_phone_number(self):
+        self.assertIsNone(normalize_phone("12", country_code="380"))
+        self.assertIsNone(normalize_phone("", country_code="380"))
@@ -0,0 +1,59 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.services.profiling import ProfilingMiddleware
+
+
+class TestProfilingMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        patcher = patch.multiple("src.services.profiling.settings", profiling_enabled=True,
+                                 profiling_token="secret", profiling_dir=self.dir.name, profiling_text_lines=10)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        app = FastAPI()
+        app.add_middleware(ProfilingMiddleware)
+
+        @app.get("/search")
+        def search():
+            return {"contacts": sorted(range(1000), reverse=True)[:3]}
+
+        self.client = TestClient(app)
+
+    def profiles(self):
+        return list(Path(self.dir.name).glob("*.pstats"))
+
+    def test_not_profiled_without_token(self):
+        for headers in ({}, {"X-Profile": "wrong"}):
+            response = self.client.get("/search", headers=headers)
+            self.assertEqual(response.json(), {"contacts": [999, 998, 997]})
+            self.assertNotIn("x-profile-file", response.headers)
+        self.assertEqual(self.profiles(), [])
+
+    def test_not_profiled_when_disabled(self):
+        with patch("src.services.profiling.settings.profiling_enabled", False):
+            response = self.client.get("/search", headers={"X-Profile": "secret"})
+        self.assertNotIn("x-profile-file", response.headers)
+        self.assertEqual(self.profiles(), [])
+
+    def test_profile_is_stored(self):
+        response = self.client.get("/search", headers={"X-Profile": "secret"})
+        self.assertEqual(response.json(), {"contacts": [999, 998, 997]})
+        self.assertEqual([path.name for path in self.profiles()], [response.headers["x-profile-file"]])
+
+    def test_profile_as_text(self):
+        response = self.client.get("/search", params={"profile": "secret", "profile_format": "text"})
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn("cumulative", response.text)
+        self.assertEqual(len(self.profiles()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
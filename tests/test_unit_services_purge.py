@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import patch
+
+import fakeredis
+from sqlalchemy import create_engine, insert, select, func
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database.models import Base, Contact, User
+from src.services.auth import auth_service
+from src.services.purge import purge_pending, purge_status, purge_user
+
+
+class TestPurge(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.session.execute(insert(User), [
+            {"id": 1, "username": "u", "email": "u@example.com", "password": "x", "disabled": True},
+            {"id": 2, "username": "v", "email": "v@example.com", "password": "x", "disabled": False},
+        ])
+        self.session.execute(insert(Contact), [
+            {"id": index, "first_name": "A", "last_name": "B", "email": f"c{index}@example.com",
+             "phone_number": f"+38050123{index:04d}", "user_id": 1 if index <= 5 else 2}
+            for index in range(1, 8)
+        ])
+        self.session.commit()
+        patcher = patch("src.services.purge.SessionLocal", sessionmaker(bind=self.engine))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.previous_redis = auth_service._redis
+        auth_service.r = fakeredis.FakeRedis()
+
+    def tearDown(self):
+        auth_service.r = self.previous_redis
+        self.session.close()
+        self.engine.dispose()
+
+    def count(self, model, user_id):
+        return self.session.scalar(select(func.count()).select_from(model).where(
+            (Contact.user_id if model is Contact else User.id) == user_id))
+
+    async def test_purge_user_reports_progress(self):
+        self.assertEqual(await purge_user(1, batch_size=2, pause=0), 5)
+        self.assertEqual(purge_status(1), {"state": "done", "deleted": 5})
+        self.assertEqual((self.count(Contact, 1), self.count(User, 1)), (0, 0))
+        self.assertEqual(self.count(Contact, 2), 2)
+
+    async def test_failed_purge_is_resumed(self):
+        with patch("src.services.purge.repository_users.delete_user", side_effect=RuntimeError("db gone")):
+            await purge_user(1, batch_size=2, pause=0)
+        self.assertEqual(purge_status(1), {"state": "failed", "deleted": 5})
+        self.assertEqual(self.count(User, 1), 1)
+        self.assertEqual(await purge_pending(pause=0), {"users": 1, "contacts": 0})
+        self.assertEqual(self.count(User, 1), 0)
+        self.assertEqual(purge_status(1)["state"], "done")
+        self.assertEqual(self.count(Contact, 2), 2)
+
+    async def test_locked_user_is_left_to_the_other_worker(self):
+        auth_service.r.set("purge:1:lock", 1)
+        self.assertEqual(await purge_pending(pause=0), {"users": 0, "contacts": 0})
+        self.assertEqual(self.count(Contact, 1), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from datetime import date
+
+import msgpack
+import orjson
+from starlette.requests import Request
+
+from src.services import serializers
+
+
+def make_request(accept: str = None) -> Request:
+    headers = [(b"accept", accept.encode())] if accept else []
+    return Request({"type": "http", "method": "GET", "path": "/api/contacts/", "headers": headers})
+
+
+class TestRender(unittest.TestCase):
+
+    rows = [{"id": 1, "first_name": "Bob", "birthday": date(1990, 5, 17)}]
+
+    def test_json_by_default(self):
+        response = serializers.render(make_request("application/json"), self.rows, headers={"X-Total-Count": "1"})
+        self.assertEqual(response.media_type, "application/json")
+        self.assertEqual(orjson.loads(response.body), [{"id": 1, "first_name": "Bob", "birthday": "1990-05-17"}])
+        self.assertEqual(response.headers["vary"], "Accept")
+        self.assertEqual(response.headers["x-total-count"], "1")
+
+    def test_msgpack_when_accepted(self):
+        response = serializers.render(make_request("application/x-msgpack"), self.rows)
+        self.assertEqual(response.media_type, "application/x-msgpack")
+        self.assertEqual(msgpack.unpackb(response.body), [{"id": 1, "first_name": "Bob", "birthday": "1990-05-17"}])
+        self.assertEqual(response.headers["vary"], "Accept")
+
+    def test_json_when_msgpack_is_not_installed(self):
+        previous, serializers.msgpack = serializers.msgpack, None
+        try:
+            response = serializers.render(make_request("application/msgpack"), self.rows)
+        finally:
+            serializers.msgpack = previous
+        self.assertEqual(response.media_type, "application/json")
+        self.assertEqual(response.headers["vary"], "Accept")
+
+    def test_existing_vary_is_kept(self):
+        response = serializers.render(make_request(), self.rows, headers={"Vary": "Origin"})
+        self.assertEqual(response.headers["vary"], "Origin, Accept")
+
+
+if __name__ == '__main__':
+    unittest.main()
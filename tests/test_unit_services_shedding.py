@@ -0,0 +1,87 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from src.services.shedding import AdaptiveLimiter, route_class
+
+
+class TestAdaptiveLimiter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        patcher = patch.multiple("src.services.shedding.settings", shedding_queue_size=1,
+                                 shedding_queue_timeout=0.05, shedding_target_latency=0.5,
+                                 shedding_min_limit=1, shedding_backoff=0.5)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.limiter = AdaptiveLimiter("test", 1)
+
+    async def test_acquire_within_limit(self):
+        self.assertTrue(await self.limiter.acquire())
+        self.assertEqual(self.limiter.in_flight, 1)
+
+    async def test_shed_when_queue_is_full(self):
+        await self.limiter.acquire()
+        waiting = asyncio.create_task(self.limiter.acquire())
+        await asyncio.sleep(0)
+        self.assertFalse(await self.limiter.acquire())
+        self.assertFalse(await waiting)
+
+    async def test_release_hands_slot_to_waiter(self):
+        await self.limiter.acquire()
+        waiting = asyncio.create_task(self.limiter.acquire())
+        await asyncio.sleep(0)
+        self.limiter.release(0.01)
+        self.assertTrue(await waiting)
+        self.assertEqual(self.limiter.in_flight, 1)
+
+    async def test_slot_handed_over_as_the_wait_times_out(self):
+        await self.limiter.acquire()
+
+        async def wait_for(awaitable, timeout):
+            awaitable.cancel()
+            self.limiter.release(0.01)
+            raise asyncio.TimeoutError
+
+        with patch("src.services.shedding.asyncio.wait_for", wait_for):
+            self.assertTrue(await self.limiter.acquire())
+        self.assertEqual((self.limiter.in_flight, len(self.limiter.waiters)), (1, 0))
+
+    async def test_cancelled_waiter_gives_back_its_slot(self):
+        await self.limiter.acquire()
+
+        async def wait_for(awaitable, timeout):
+            awaitable.cancel()
+            self.limiter.release(0.01)
+            raise asyncio.CancelledError
+
+        with patch("src.services.shedding.asyncio.wait_for", wait_for), self.assertRaises(asyncio.CancelledError):
+            await self.limiter.acquire()
+        self.assertEqual((self.limiter.in_flight, len(self.limiter.waiters)), (0, 0))
+
+    async def test_cancelled_waiter_leaves_the_queue(self):
+        await self.limiter.acquire()
+        waiting = asyncio.create_task(self.limiter.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual((self.limiter.in_flight, len(self.limiter.waiters)), (1, 0))
+
+    def test_limit_adapts_to_latency(self):
+        limiter = AdaptiveLimiter("test", 2)
+        limiter.in_flight = 1
+        limiter.release(10)
+        self.assertEqual(limiter.limit, 1)
+        for _ in range(20):
+            limiter.in_flight = 1
+            limiter.release(0.01)
+        self.assertEqual(limiter.limit, 2)
+
+    def test_route_class(self):
+        self.assertEqual(route_class({"path": "/api/auth/login", "method": "POST"}), "auth")
+        self.assertEqual(route_class({"path": "/api/contacts/", "method": "POST"}), "writes")
+        self.assertEqual(route_class({"path": "/api/contacts/", "method": "GET"}), "reads")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import asyncio
+import unittest
+
+from src.services.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.calls = 0
+
+    async def loader(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return self.calls
+
+    async def failing_loader(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def test_concurrent_calls_share_one_load(self):
+        results = await asyncio.gather(*(self.flight.do("key", self.loader) for _ in range(10)))
+        self.assertEqual(results, [1] * 10)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flight.calls, {})
+
+    async def test_different_keys_load_separately(self):
+        await asyncio.gather(self.flight.do("a", self.loader), self.flight.do("b", self.loader))
+        self.assertEqual(self.calls, 2)
+
+    async def test_sequential_calls_load_again(self):
+        await self.flight.do("key", self.loader)
+        await self.flight.do("key", self.loader)
+        self.assertEqual(self.calls, 2)
+
+    async def test_exception_is_shared(self):
+        results = await asyncio.gather(*(self.flight.do("key", self.failing_loader) for _ in range(3)),
+                                       return_exceptions=True)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(self.calls, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
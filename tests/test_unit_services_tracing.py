@@ -0,0 +1,76 @@
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from sqlalchemy import create_engine, text
+
+from src.services.tracing import TracingMiddleware, trace_engine, traced
+
+exporter = InMemorySpanExporter()
+
+
+def setUpModule():
+    provider = trace.get_tracer_provider()
+    if not isinstance(provider, TracerProvider):
+        provider = TracerProvider()
+        trace.set_tracer_provider(provider)
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        trace_engine(self.engine)
+        trace_engine(self.engine)
+
+        @traced("repository.items.get_item")
+        def get_item(item_id: int):
+            with self.engine.connect() as conn:
+                return conn.execute(text("SELECT :id"), {"id": item_id}).scalar()
+
+        app = FastAPI()
+        app.add_middleware(TracingMiddleware)
+
+        @app.get("/items/{item_id}")
+        def read_item(item_id: int):
+            return {"id": get_item(item_id)}
+
+        @app.get("/broken")
+        def broken():
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT * FROM missing"))
+
+        self.client = TestClient(app, raise_server_exceptions=False)
+        exporter.clear()
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def spans(self):
+        return {span.name: span for span in exporter.get_finished_spans()}
+
+    def test_request_span_has_repository_and_sql_children(self):
+        self.assertEqual(self.client.get("/items/7").json(), {"id": 7})
+        spans = self.spans()
+        self.assertEqual(set(spans), {"GET /items/{item_id}", "repository.items.get_item", "sql SELECT"})
+        request, repository, sql = spans["GET /items/{item_id}"], spans["repository.items.get_item"], spans["sql SELECT"]
+        self.assertEqual(request.attributes["http.route"], "/items/{item_id}")
+        self.assertEqual(request.attributes["http.status_code"], 200)
+        self.assertEqual(repository.parent.span_id, request.context.span_id)
+        self.assertEqual(sql.parent.span_id, repository.context.span_id)
+        self.assertEqual(sql.attributes["db.statement"], "SELECT ?")
+
+    def test_failed_statement_ends_its_span(self):
+        self.assertEqual(self.client.get("/broken").status_code, 500)
+        sql = self.spans()["sql SELECT"]
+        self.assertEqual(sql.status.status_code, trace.StatusCode.ERROR)
+        self.assertEqual(sql.parent.span_id, self.spans()["GET /broken"].context.span_id)
+
+
+if __name__ == '__main__':
+    unittest.main()